@@ -0,0 +1,137 @@
+from typing import List, Sequence, Tuple
+from itertools import accumulate
+
+#Codificação das ocorrências do índice final: os doc_ids (ordenados) são armazenados
+#como a diferença (gap) para o doc_id anterior e, assim como as frequências,
+#codificados em variable-byte (7 bits por byte; o bit mais significativo indica
+#que o número continua no próximo byte).
+#As ocorrências de um termo são divididas em blocos de BLOCK_POSTINGS ocorrências:
+#   [qtd de ocorrências][tamanho dos gaps][tamanho das freqs][gaps][freqs]
+#precedidos por uma tabela de saltos (skip data) com o maior doc_id de cada bloco
+#(como gap para o maior doc_id do bloco anterior) e o tamanho em bytes do bloco:
+#   [qtd de blocos][maior doc_id, tamanho do bloco]...[bloco 1][bloco 2]...
+#Dessa forma, é possível pular blocos inteiros sem decodifica-los
+
+BLOCK_POSTINGS = 128
+
+
+def vbyte_encode(numbers:Sequence[int], out:bytearray) -> bytearray:
+    for number in numbers:
+        while number >= 0x80:
+            out.append((number & 0x7f) | 0x80)
+            number >>= 7
+        out.append(number)
+    return out
+
+
+def vbyte_decode(data:bytes) -> List[int]:
+    #caso comum: todos os números são menores que 128 e cada byte já é um número
+    if data.isascii():
+        return list(data)
+    numbers = []
+    number = 0
+    shift = 0
+    for byte in data:
+        if byte & 0x80:
+            number |= (byte & 0x7f) << shift
+            shift += 7
+        else:
+            numbers.append(number | (byte << shift))
+            number = 0
+            shift = 0
+    return numbers
+
+
+def vbyte_read(data:bytes, pos:int) -> Tuple[int,int]:
+    """
+        Lê um único número a partir da posição pos, retornando o número e a posição seguinte
+    """
+    number = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        number |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return number, pos
+        shift += 7
+
+
+def encode_block(doc_ids:Sequence[int], term_freqs:Sequence[int], last_doc_id:int) -> bytearray:
+    lst_prev_doc_ids = [last_doc_id]
+    lst_prev_doc_ids += doc_ids[:-1]
+    gaps = vbyte_encode([doc_id-prev_doc_id for doc_id,prev_doc_id in zip(doc_ids,lst_prev_doc_ids)], bytearray())
+    freqs = vbyte_encode(term_freqs, bytearray())
+
+    block = vbyte_encode((len(doc_ids), len(gaps), len(freqs)), bytearray())
+    block += gaps
+    block += freqs
+    return block
+
+
+def decode_block(data:bytes, pos:int, last_doc_id:int) -> Tuple[List[int],List[int],int]:
+    """
+        Decodifica o bloco que inicia em pos, retornando os doc_ids, as frequências e
+        a posição do próximo bloco
+    """
+    _, pos = vbyte_read(data, pos)
+    int_gaps_len, pos = vbyte_read(data, pos)
+    int_freqs_len, pos = vbyte_read(data, pos)
+    int_freqs_start = pos+int_gaps_len
+    int_end = int_freqs_start+int_freqs_len
+
+    doc_ids = list(accumulate(vbyte_decode(data[pos:int_freqs_start]), initial=last_doc_id))[1:]
+    term_freqs = vbyte_decode(data[int_freqs_start:int_end])
+    return doc_ids, term_freqs, int_end
+
+
+def encode_postings(doc_ids:Sequence[int], term_freqs:Sequence[int]) -> bytearray:
+    blocks = bytearray()
+    lst_skip_data = []
+    last_doc_id = 0
+    for i in range(0, len(doc_ids), BLOCK_POSTINGS):
+        block_doc_ids = doc_ids[i:i+BLOCK_POSTINGS]
+        block = encode_block(block_doc_ids, term_freqs[i:i+BLOCK_POSTINGS], last_doc_id)
+        lst_skip_data.append(block_doc_ids[-1]-last_doc_id)
+        lst_skip_data.append(len(block))
+        blocks += block
+        last_doc_id = block_doc_ids[-1]
+
+    data = vbyte_encode([len(lst_skip_data)//2]+lst_skip_data, bytearray())
+    data += blocks
+    return data
+
+
+def decode_skip_data(data:bytes) -> Tuple[List[int],List[int]]:
+    """
+        Decodifica a tabela de saltos, retornando o maior doc_id e a posição inicial
+        (em data) de cada bloco
+    """
+    int_blocks, pos = vbyte_read(data, 0)
+    lst_max_doc_ids = []
+    lst_block_starts = []
+    max_doc_id = 0
+    lst_block_len = []
+    for _ in range(int_blocks):
+        gap, pos = vbyte_read(data, pos)
+        block_len, pos = vbyte_read(data, pos)
+        max_doc_id += gap
+        lst_max_doc_ids.append(max_doc_id)
+        lst_block_len.append(block_len)
+    for block_len in lst_block_len:
+        lst_block_starts.append(pos)
+        pos += block_len
+    return lst_max_doc_ids, lst_block_starts
+
+
+def decode_postings(data:bytes) -> Tuple[List[int],List[int]]:
+    doc_ids = []
+    term_freqs = []
+    last_doc_id = 0
+    lst_max_doc_ids, lst_block_starts = decode_skip_data(data)
+    for max_doc_id, pos in zip(lst_max_doc_ids, lst_block_starts):
+        block_doc_ids, block_term_freqs, _ = decode_block(data, pos, last_doc_id)
+        doc_ids += block_doc_ids
+        term_freqs += block_term_freqs
+        last_doc_id = max_doc_id
+    return doc_ids, term_freqs
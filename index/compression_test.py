@@ -0,0 +1,46 @@
+from .structure import *
+from .compression import *
+from .reader import FileIndexReader
+import os
+import tempfile
+import unittest
+
+
+class CompressionTest(unittest.TestCase):
+    def test_vbyte(self):
+        arr_numbers = [0,1,127,128,300,16383,16384,2**32-1]
+        data = vbyte_encode(arr_numbers, bytearray())
+        self.assertListEqual(vbyte_decode(bytes(data)),arr_numbers)
+        self.assertListEqual(vbyte_decode(bytes(vbyte_encode([5,0,127], bytearray()))),[5,0,127])
+
+    def test_encode_postings(self):
+        #mais de um bloco, com gaps pequenos e grandes
+        doc_ids = [i*3 for i in range(BLOCK_POSTINGS)]+[10**6+i for i in range(BLOCK_POSTINGS+7)]
+        term_freqs = [i%200+1 for i in range(len(doc_ids))]
+        data = encode_postings(doc_ids, term_freqs)
+        self.assertTupleEqual(decode_postings(bytes(data)),(doc_ids,term_freqs))
+        self.assertLess(len(data),len(doc_ids)*OCCURRENCE.size/3,"As ocorrências comprimidas deveriam ser bem menores que as de tamanho fixo")
+
+    def test_compressed_index(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        os.mkdir(os.path.join(tmp_dir.name,"comprimido"))
+        index = FileIndex(str_idx_dir=tmp_dir.name)
+        compressed_index = FileIndex(compressed=True,str_idx_dir=os.path.join(tmp_dir.name,"comprimido"))
+        for doc_id in range(1,300):
+            for term in ["casa","verde","prédio","amarelo"][doc_id%4:]:
+                index.index(term,doc_id,doc_id%5+1)
+                compressed_index.index(term,doc_id,doc_id%5+1)
+        index.finish_indexing()
+        compressed_index.finish_indexing()
+        self.assertLess(os.path.getsize(compressed_index.str_idx_file_name),os.path.getsize(index.str_idx_file_name))
+
+        with FileIndexReader(compressed_index) as reader:
+            for term in index.vocabulary:
+                lst_expected = [(o.doc_id,o.term_freq) for o in index.get_occurrence_list(term)]
+                self.assertListEqual([(o.doc_id,o.term_freq) for o in compressed_index.get_occurrence_list(term)],lst_expected)
+                self.assertListEqual([(o.doc_id,o.term_freq) for o in reader.get_occurrence_list(term)],lst_expected)
+                self.assertEqual(compressed_index.document_count_with_term(term),len(lst_expected))
+
+if __name__ == "__main__":
+    unittest.main()
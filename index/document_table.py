@@ -0,0 +1,172 @@
+from typing import Iterable, List, Mapping
+from array import array
+from bisect import bisect_left
+import math
+import struct
+import sys
+
+#Tabela de documentos: os doc_ids (ordenados) como inteiros de 32 bits em little-endian
+DOCUMENTS_MAGIC = b"TPDC"
+DOCUMENTS_VERSION = 1
+DOCUMENTS_HEADER = struct.Struct("<4sBxxxI")
+
+
+def write_documents(str_file_name:str, doc_ids:Iterable[int]):
+    arr_doc_ids = array("I", sorted(doc_ids))
+    if sys.byteorder == "big":
+        arr_doc_ids.byteswap()
+    with open(str_file_name, "wb") as doc_file:
+        doc_file.write(DOCUMENTS_HEADER.pack(DOCUMENTS_MAGIC, DOCUMENTS_VERSION, len(arr_doc_ids)))
+        arr_doc_ids.tofile(doc_file)
+
+
+def read_documents(str_file_name:str) -> array:
+    with open(str_file_name, "rb") as doc_file:
+        magic, version, int_docs = DOCUMENTS_HEADER.unpack(doc_file.read(DOCUMENTS_HEADER.size))
+        if magic != DOCUMENTS_MAGIC or version != DOCUMENTS_VERSION:
+            raise ValueError(f"O arquivo {str_file_name} não é uma tabela de documentos válida")
+        arr_doc_ids = array("I")
+        arr_doc_ids.fromfile(doc_file, int_docs)
+    if sys.byteorder == "big":
+        arr_doc_ids.byteswap()
+    return arr_doc_ids
+
+
+def write_arrays(stats_file, lst_arrays:Iterable[array]):
+    """
+        Grava os arrays, um após o outro, em little-endian
+    """
+    for arr_values in lst_arrays:
+        if sys.byteorder == "big":
+            arr_values = array(arr_values.typecode, arr_values)
+            arr_values.byteswap()
+        arr_values.tofile(stats_file)
+
+
+def read_arrays(stats_file, str_typecodes:str, int_count:int) -> List[array]:
+    """
+        Lê int_count valores de cada um dos arrays (um por typecode) gravados por write_arrays
+    """
+    lst_arrays = []
+    for str_typecode in str_typecodes:
+        arr_values = array(str_typecode)
+        arr_values.fromfile(stats_file, int_count)
+        if sys.byteorder == "big":
+            arr_values.byteswap()
+        lst_arrays.append(arr_values)
+    return lst_arrays
+
+
+#Estatísticas por documento: para cada doc_id (ordenado), o tamanho do documento
+#(soma das frequências dos termos) e a norma do vetor de pesos tf-idf
+DOCUMENT_STATS_MAGIC = b"TPDS"
+DOCUMENT_STATS_VERSION = 1
+DOCUMENT_STATS_HEADER = struct.Struct("<4sBxxxI")
+
+
+class DocumentStats:
+    """
+        Tamanho e norma de cada documento em arrays compactos alinhados aos doc_ids ordenados
+    """
+    def __init__(self, doc_ids:array, lengths:array, norms:array):
+        self.doc_ids = doc_ids
+        self.lengths = lengths
+        self.norms = norms
+
+    @staticmethod
+    def from_sums(dic_lengths:Mapping[int,int], dic_norm_sums:Mapping[int,float]) -> "DocumentStats":
+        """
+            Cria as estatísticas a partir do tamanho e da soma dos quadrados dos pesos de cada documento
+        """
+        arr_doc_ids = array("I", sorted(dic_lengths.keys()))
+        return DocumentStats(arr_doc_ids,
+                             array("I", [dic_lengths[doc_id] for doc_id in arr_doc_ids]),
+                             array("d", [math.sqrt(dic_norm_sums.get(doc_id, 0)) for doc_id in arr_doc_ids]))
+
+    def position(self, doc_id:int) -> int:
+        pos = bisect_left(self.doc_ids, doc_id)
+        if pos == len(self.doc_ids) or self.doc_ids[pos] != doc_id:
+            raise KeyError(doc_id)
+        return pos
+
+    def length(self, doc_id:int) -> int:
+        return self.lengths[self.position(doc_id)]
+
+    def norm(self, doc_id:int) -> float:
+        return self.norms[self.position(doc_id)]
+
+    def write(self, str_file_name:str):
+        with open(str_file_name, "wb") as stats_file:
+            stats_file.write(DOCUMENT_STATS_HEADER.pack(DOCUMENT_STATS_MAGIC, DOCUMENT_STATS_VERSION, len(self.doc_ids)))
+            write_arrays(stats_file, [self.doc_ids, self.lengths, self.norms])
+
+    @staticmethod
+    def read(str_file_name:str) -> "DocumentStats":
+        with open(str_file_name, "rb") as stats_file:
+            magic, version, int_docs = DOCUMENT_STATS_HEADER.unpack(stats_file.read(DOCUMENT_STATS_HEADER.size))
+            if magic != DOCUMENT_STATS_MAGIC or version != DOCUMENT_STATS_VERSION:
+                raise ValueError(f"O arquivo {str_file_name} não possui estatísticas de documentos válidas")
+            return DocumentStats(*read_arrays(stats_file, "IId", int_docs))
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+
+#Estatísticas por termo: para cada term_id (ordenado), o maior peso normalizado (1+log2 f)/norma
+#do termo entre os documentos, a maior frequência do termo e o tamanho do menor documento que
+#o contém, usados nos limites superiores da pontuação do termo
+TERM_STATS_MAGIC = b"TPTS"
+TERM_STATS_VERSION = 2
+TERM_STATS_HEADER = struct.Struct("<4sBxxxI")
+
+
+class TermStats:
+    """
+        Maior peso normalizado, maior frequência e menor tamanho de documento de cada termo
+        em arrays compactos alinhados aos term_ids ordenados
+    """
+    def __init__(self, term_ids:array, max_weights:array, max_term_freqs:array, min_lengths:array):
+        self.term_ids = term_ids
+        self.max_weights = max_weights
+        self.max_term_freqs = max_term_freqs
+        self.min_lengths = min_lengths
+
+    @staticmethod
+    def from_dicts(dic_max_weights:Mapping[int,float], dic_max_term_freqs:Mapping[int,int],
+                   dic_min_lengths:Mapping[int,int]) -> "TermStats":
+        arr_term_ids = array("I", sorted(dic_max_term_freqs.keys()))
+        return TermStats(arr_term_ids,
+                         array("d", [dic_max_weights.get(term_id, 0) for term_id in arr_term_ids]),
+                         array("I", [dic_max_term_freqs[term_id] for term_id in arr_term_ids]),
+                         array("I", [dic_min_lengths[term_id] for term_id in arr_term_ids]))
+
+    def position(self, term_id:int) -> int:
+        pos = bisect_left(self.term_ids, term_id)
+        if pos == len(self.term_ids) or self.term_ids[pos] != term_id:
+            raise KeyError(term_id)
+        return pos
+
+    def max_weight(self, term_id:int) -> float:
+        return self.max_weights[self.position(term_id)]
+
+    def max_term_freq(self, term_id:int) -> int:
+        return self.max_term_freqs[self.position(term_id)]
+
+    def min_length(self, term_id:int) -> int:
+        return self.min_lengths[self.position(term_id)]
+
+    def write(self, str_file_name:str):
+        with open(str_file_name, "wb") as stats_file:
+            stats_file.write(TERM_STATS_HEADER.pack(TERM_STATS_MAGIC, TERM_STATS_VERSION, len(self.term_ids)))
+            write_arrays(stats_file, [self.term_ids, self.max_weights, self.max_term_freqs, self.min_lengths])
+
+    @staticmethod
+    def read(str_file_name:str) -> "TermStats":
+        with open(str_file_name, "rb") as stats_file:
+            magic, version, int_terms = TERM_STATS_HEADER.unpack(stats_file.read(TERM_STATS_HEADER.size))
+            if magic != TERM_STATS_MAGIC or version != TERM_STATS_VERSION:
+                raise ValueError(f"O arquivo {str_file_name} não possui estatísticas de termos válidas")
+            return TermStats(*read_arrays(stats_file, "IdII", int_terms))
+
+    def __len__(self):
+        return len(self.term_ids)
@@ -1,4 +1,8 @@
 from .structure import *
+from .posting_file import HEADER, OCCURRENCE, read_header
+from .lexicon import Lexicon
+import os
+import tempfile
 import unittest
 from .index_structure_test import StructureTest
 from .performance_test import PerformanceTest
@@ -6,6 +10,11 @@ from .performance_test import PerformanceTest
 
 
 class FileIndexTest(unittest.TestCase):
+    def setUp(self):
+        #os arquivos do índice são criados em um diretório temporário
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.str_dir = tmp_dir.name
 
     def check_idx_file(self, obj_index, set_occurrences):
         #verifica a ordem das ocorrencias
@@ -28,7 +37,7 @@ class FileIndexTest(unittest.TestCase):
     def test_save_tmp_occurrences(self):
 
         #testa a primeira vez (adicionando tudo na primeira vez)
-        self.index = FileIndex()
+        self.index = FileIndex(str_idx_dir=self.str_dir)
         set_occurrences = []
         self.index.lst_occurrences_tmp = [TermOccurrence(2,4,5),
                                         TermOccurrence(2,2,1),
@@ -36,6 +45,7 @@ class FileIndexTest(unittest.TestCase):
                                         TermOccurrence(1,1,3)]
         set_occurrences = set(self.index.lst_occurrences_tmp)
         self.index.save_tmp_occurrences()
+        self.index.merge_runs()
         self.check_idx_file(self.index, set_occurrences)
         print("Primeira execução (criação inicial do indice) [ok]")
 
@@ -44,6 +54,7 @@ class FileIndexTest(unittest.TestCase):
                                         TermOccurrence(2,3,4)]
         set_occurrences = set_occurrences | set(self.index.lst_occurrences_tmp)
         self.index.save_tmp_occurrences()
+        self.index.merge_runs()
         self.check_idx_file(self.index, set_occurrences)
         print("Inserção de alguns itens - teste 1/2 [ok]")
 
@@ -58,11 +69,159 @@ class FileIndexTest(unittest.TestCase):
         #checa ordenação do arquivo e verifica todas as ocorrencias existem
         set_occurrences = set_occurrences|set(self.index.lst_occurrences_tmp)
         self.index.save_tmp_occurrences()
+        self.index.merge_runs()
         self.check_idx_file(self.index, set_occurrences)
         print("Inserção de alguns itens - teste 2/2 [ok]")
 
+    def test_binary_format(self):
+        self.index = FileIndex(str_idx_dir=self.str_dir)
+        self.index.lst_occurrences_tmp = [TermOccurrence(2,4,5),
+                                        TermOccurrence(1,1,3),
+                                        TermOccurrence(3,1,70000)]
+        self.index.save_tmp_occurrences()
+        self.index.merge_runs()
+
+        #cabeçalho + uma ocorrência de tamanho fixo por registro
+        int_size = os.path.getsize(self.index.str_idx_file_name)
+        self.assertEqual(int_size, HEADER.size+3*OCCURRENCE.size, "O arquivo deveria possuir apenas o cabeçalho e as ocorrências")
+        with open(self.index.str_idx_file_name,"rb") as idx_file:
+            occur = self.index.next_from_file(idx_file)
+        self.assertEqual((occur.term_id,occur.doc_id,occur.term_freq),(1,1,3))
+
+        #arquivos que não seguem o formato devem ser rejeitados
+        with open(os.path.join(self.str_dir,"teste_file.idx"),"wb") as file:
+            file.write(b"\x00"*HEADER.size)
+        with open(os.path.join(self.str_dir,"teste_file.idx"),"rb") as file:
+            self.assertRaises(ValueError, read_header, file)
+
+    def test_get_occurrence_list(self):
+        self.index = FileIndex(str_idx_dir=self.str_dir)
+        self.index.TMP_OCCURRENCES_LIMIT = 7
+        dic_expected = {}
+        for doc_id in range(1,20):
+            for term in ["casa","verde","prédio","amarelo"][doc_id%4:]:
+                self.index.index(term,doc_id,doc_id%3+1)
+                dic_expected.setdefault(term,{})[doc_id] = doc_id%3+1
+        self.index.finish_indexing()
+
+        for term,dic_doc_freq in dic_expected.items():
+            dic_resp = {occur.doc_id:occur.term_freq for occur in self.index.get_occurrence_list(term)}
+            self.assertDictEqual(dic_resp,dic_doc_freq,f"Ocorrências inesperadas do termo {term}")
+
+        #a quantidade de documentos por termo não deve depender do arquivo de indice
+        os.remove(self.index.str_idx_file_name)
+        for term,dic_doc_freq in dic_expected.items():
+            self.assertEqual(self.index.document_count_with_term(term),len(dic_doc_freq))
+        self.assertEqual(self.index.document_count_with_term("xuxu"),0)
+
+    def test_merge_runs(self):
+        #com poucos runs por intercalação, são necessárias várias passadas
+        self.index = FileIndex(str_idx_dir=self.str_dir)
+        self.index.TMP_OCCURRENCES_LIMIT = 3
+        self.index.MERGE_FAN_IN = 2
+        set_occurrences = set()
+        for doc_id in range(10,0,-1):
+            for term_id in range(doc_id%3,4):
+                self.index.lst_occurrences_tmp.append(TermOccurrence(doc_id,term_id,doc_id))
+                set_occurrences.add(TermOccurrence(doc_id,term_id,doc_id))
+                if len(self.index.lst_occurrences_tmp) >= self.index.TMP_OCCURRENCES_LIMIT:
+                    self.index.save_tmp_occurrences()
+        self.index.save_tmp_occurrences()
+        lst_runs = list(self.index.lst_run_files)
+        self.assertGreater(len(lst_runs),self.index.MERGE_FAN_IN**2)
+
+        self.index.merge_runs()
+        self.check_idx_file(self.index, set_occurrences)
+        self.assertListEqual(self.index.lst_run_files,[self.index.str_idx_file_name])
+        for str_run in lst_runs:
+            self.assertFalse(os.path.exists(str_run),f"O run {str_run} deveria ter sido removido após a intercalação")
+
+    def test_save_open(self):
+        for bol_compressed in [False,True]:
+            tmp_dir = tempfile.TemporaryDirectory()
+            self.addCleanup(tmp_dir.cleanup)
+            self.index = FileIndex(compressed=bol_compressed,str_idx_dir=tmp_dir.name)
+            for doc_id in range(1,50):
+                for term in ["casa","verde","prédio","amarelo"][doc_id%4:]:
+                    self.index.index(term,doc_id,doc_id%3+1)
+            self.index.finish_indexing()
+            str_dir = os.path.join(tmp_dir.name,"salvo")
+            self.index.save(str_dir)
+
+            index_aberto = FileIndex.open(str_dir)
+            self.addCleanup(index_aberto.dic_index.close)
+            self.assertIsInstance(index_aberto.dic_index,Lexicon,"O vocabulário não deveria ser carregado em memória")
+            self.assertEqual(index_aberto.codec,self.index.codec)
+            self.assertSetEqual(index_aberto.set_documents,self.index.set_documents)
+            self.assertSetEqual(set(index_aberto.vocabulary),set(self.index.vocabulary))
+            for term in self.index.vocabulary:
+                self.assertEqual(index_aberto.get_term_id(term),self.index.get_term_id(term))
+                self.assertEqual(index_aberto.document_count_with_term(term),self.index.document_count_with_term(term))
+                self.assertListEqual([(o.doc_id,o.term_freq) for o in index_aberto.get_occurrence_list(term)],
+                                     [(o.doc_id,o.term_freq) for o in self.index.get_occurrence_list(term)])
+            #o índice reaberto já está finalizado
+            index_aberto.finish_indexing()
+
+    def test_finish_indexing_again(self):
+        with tempfile.TemporaryDirectory() as str_dir:
+            self.index = FileIndex(str_idx_dir=str_dir)
+            self.index.index("casa",1,2)
+            self.index.index("verde",1,1)
+            self.index.finish_indexing()
+            str_old_lexicon = self.index.str_lexicon_file_name
+            self.index.index("casa",2,1)
+            self.index.index("azul",2,3)
+            self.index.finish_indexing()
+            #apenas o léxico e o arquivo de ocorrências atuais permanecem no diretório
+            self.assertNotEqual(self.index.str_lexicon_file_name,str_old_lexicon)
+            self.assertFalse(os.path.exists(str_old_lexicon),f"O léxico {str_old_lexicon} deveria ter sido removido")
+            self.assertListEqual(sorted(os.listdir(str_dir)),sorted([os.path.basename(self.index.str_idx_file_name),
+                                                                     os.path.basename(self.index.str_lexicon_file_name)]))
+            self.assertListEqual([(o.doc_id,o.term_freq) for o in self.index.get_occurrence_list("casa")],[(1,2),(2,1)])
+            self.assertListEqual([(o.doc_id,o.term_freq) for o in self.index.get_occurrence_list("azul")],[(2,3)])
+
+    def test_positional_index(self):
+        from .reader import FileIndexReader
+        dic_docs = {doc_id:[["casa","verde","prédio","amarelo"][(doc_id*i)%7%4] for i in range(doc_id%9+1)]
+                        for doc_id in range(1,60)}
+        for bol_compressed in [False,True]:
+            tmp_dir = tempfile.TemporaryDirectory()
+            self.addCleanup(tmp_dir.cleanup)
+            self.index = FileIndex(compressed=bol_compressed,str_idx_dir=tmp_dir.name,positional=True)
+            #vários runs (e várias passadas de intercalação): as posições devem acompanhar as ocorrências
+            self.index.TMP_OCCURRENCES_LIMIT = 10
+            self.index.MERGE_FAN_IN = 3
+            dic_expected = {}
+            for doc_id,lst_words in dic_docs.items():
+                dic_positions = {}
+                for position,word in enumerate(lst_words):
+                    dic_positions.setdefault(word,[]).append(position)
+                self.index.index_document(doc_id,{word:len(lst_positions) for word,lst_positions in dic_positions.items()},dic_positions)
+                for word,lst_positions in dic_positions.items():
+                    dic_expected[(word,doc_id)] = lst_positions
+            self.index.finish_indexing()
+            with self.assertRaises(Exception,msg="O índice posicional requer as posições dos termos"):
+                FileIndex(positional=True).index_document(1,{"casa":1})
+
+            str_dir = os.path.join(tmp_dir.name,"salvo")
+            self.index.save(str_dir)
+            index_aberto = FileIndex.open(str_dir)
+            self.addCleanup(index_aberto.dic_index.close)
+            self.assertTrue(index_aberto.positional)
+            with FileIndexReader(index_aberto) as reader:
+                for index in [self.index,index_aberto,reader]:
+                    for term in ["casa","verde","prédio","amarelo"]:
+                        positions = index.get_positions(term)
+                        for doc_id in range(1,60):
+                            self.assertListEqual(positions.positions(doc_id),dic_expected.get((term,doc_id),[]),
+                                                 msg=f"Posições incorretas do termo '{term}' no documento {doc_id}")
+                    self.assertListEqual(index.get_positions("inexistente").positions(1),[])
+
+        #índices não posicionais não possuem as posições
+        self.assertIsNone(FileIndex().get_positions("casa"))
+
     def test_finish_indexing(self):
-        self.index = FileIndex()
+        self.index = FileIndex(str_idx_dir=self.str_dir)
         self.index.lst_occurrences_tmp = [
                                         TermOccurrence(1,1,3),
                                         TermOccurrence(2,1,2),
@@ -81,7 +240,7 @@ class FileIndexTest(unittest.TestCase):
             print(f"{occ}")
         x = 100
         int_size_of_occur = None
-        with open("teste_file.idx","wb") as file:
+        with open(os.path.join(self.str_dir,"teste_file.idx"),"wb") as file:
             self.index.lst_occurrences_tmp[0].write(file)
             int_size_of_occur = file.tell()
 
@@ -1,5 +1,6 @@
 from index.structure import *
 
+import tempfile
 import unittest
 
 class StructureTest(unittest.TestCase):
@@ -59,9 +60,95 @@ class StructureTest(unittest.TestCase):
         list_occur = self.index.get_occurrence_list('xuxu')
         self.assertListEqual(list_occur,[],"O termo xuxu não existe, deveria retornar lista vazia")
 
+    def test_index_document(self):
+        if isinstance(self.index, FileIndex):
+            tmp_dir = tempfile.TemporaryDirectory()
+            self.addCleanup(tmp_dir.cleanup)
+            index = FileIndex(compressed=self.index.codec == CODEC_VBYTE,str_idx_dir=tmp_dir.name)
+        else:
+            index = type(self.index)()
+        index.index_documents([(1,{"casa":10,"vermelho":3,"verde":1}),
+                               (2,{"vermelho":1,"casa":3}),
+                               (3,{"vermelho":1})])
+        index.finish_indexing()
+
+        self.assertEqual(index.document_count,self.index.document_count)
+        self.assertCountEqual(index.vocabulary,self.index.vocabulary)
+        self.assertEqual(len({index.get_term_id(term) for term in index.vocabulary}),3, "Cada termo deveria ter um id diferente")
+        for term in self.index.vocabulary:
+            self.assertListEqual(sorted((occur.doc_id,occur.term_freq) for occur in index.get_occurrence_list(term)),
+                                 sorted((occur.doc_id,occur.term_freq) for occur in self.index.get_occurrence_list(term)))
+
+    def test_delete_document(self):
+        self.index.delete_document(2)
+        self.assertEqual(2,self.index.document_count)
+        self.assertSetEqual({1,3},self.index.set_documents)
+        self.assertListEqual([1],[occur.doc_id for occur in self.index.get_occurrence_list("casa")])
+        self.assertListEqual([1,3],sorted(occur.doc_id for occur in self.index.get_occurrence_list("vermelho")))
+        if isinstance(self.index, FileIndex):
+            #nos índices em disco, a quantidade do léxico (limite superior) inclui os documentos removidos
+            self.assertEqual(2,self.index.document_count_with_term("casa"))
+        else:
+            self.assertEqual(1,self.index.document_count_with_term("casa"), f"Casa deveria aparecer apenas no doc. 1")
+
+    def test_update_document(self):
+        if isinstance(self.index, FileIndex):
+            #o documento não é alterado (as atualizações em disco são feitas por meio do SegmentedIndex)
+            with self.assertRaises(NotImplementedError):
+                self.index.update_document(1,{"casa":2,"azul":1})
+            self.assertSetEqual({1,2,3},self.index.set_documents)
+            self.assertEqual(0,len(self.index.deleted_docs))
+            self.assertListEqual([1,2],sorted(occur.doc_id for occur in self.index.get_occurrence_list("casa")))
+            return
+        lst_vermelho = self.index.dic_index["vermelho"]
+        self.index.update_document(1,{"casa":2,"azul":1})
+        self.assertIs(lst_vermelho,self.index.dic_index["vermelho"], "Apenas as listas dos termos do novo conteúdo deveriam ser alteradas")
+        for _ in range(2):
+            self.assertEqual(3,self.index.document_count)
+            self.assertListEqual([(1,2),(2,3)],sorted((occur.doc_id,occur.term_freq) for occur in self.index.get_occurrence_list("casa")))
+            self.assertListEqual([2,3],sorted(occur.doc_id for occur in self.index.get_occurrence_list("vermelho")))
+            self.assertListEqual([],list(self.index.get_occurrence_list("verde")), "Verde só ocorria na versão anterior do doc. 1")
+            self.assertEqual(1,self.index.document_count_with_term("azul"))
+            self.assertEqual(0,len(self.index.deleted_docs))
+            #as ocorrências da versão anterior são expurgadas apenas em purge_deleted
+            self.index.purge_deleted()
+        self.assertNotIn("verde",self.index.vocabulary)
+        #nova atualização (com o termo da versão original) e remoção após a atualização
+        self.index.update_document(1,{"verde":4})
+        self.assertListEqual([(1,4)],[(occur.doc_id,occur.term_freq) for occur in self.index.get_occurrence_list("verde")])
+        self.assertListEqual([2],[occur.doc_id for occur in self.index.get_occurrence_list("casa")])
+        self.assertListEqual([],list(self.index.get_occurrence_list("azul")))
+        self.index.delete_document(1)
+        self.assertListEqual([],list(self.index.get_occurrence_list("verde")))
+        self.assertSetEqual({2,3},self.index.set_documents)
+        #os ids dos termos não são reutilizados
+        self.assertEqual(len({self.index.get_term_id(term) for term in self.index.vocabulary}),len(self.index.vocabulary))
+
 class FileStructureTest(StructureTest):
     def setUp(self):
-        self.index = FileIndex()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.index = FileIndex(str_idx_dir=tmp_dir.name)
+        self.create_terms()
+
+class LexiconFileStructureTest(StructureTest):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.index = FileIndex(str_idx_dir=tmp_dir.name)
+        self.create_terms()
+        self.index.open_lexicon()
+
+class CompactStructureTest(StructureTest):
+    def setUp(self):
+        self.index = CompactHashIndex()
+        self.create_terms()
+
+class CompressedFileStructureTest(StructureTest):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.index = FileIndex(compressed=True,str_idx_dir=tmp_dir.name)
         self.create_terms()
 
 if __name__ == "__main__":
@@ -1,22 +1,137 @@
-from nltk.stem.snowball import SnowballStemmer
-from bs4 import BeautifulSoup
 import string
-from nltk.tokenize import word_tokenize
 import os
-from nltk.corpus import stopwords
-import nltk
 from datetime import datetime
+from functools import lru_cache
+from html.parser import HTMLParser
+from itertools import repeat
+import codecs
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+from index.structure import FileIndex, CompactHashIndex
+from index.posting_file import OccurrenceWriter, read_header, read_occurrences
+from util.lru_cache import LRUCache
+
+#tokens: palavras (possivelmente com hífen, apóstrofo ou ponto internos) ou um sinal de pontuação
+TOKEN_REGEX = re.compile(r"\w+(?:[-'.]\w+)*|[^\w\s]")
+#sequência final de caracteres que não são espaços (pode continuar no próximo trecho de texto)
+TRAILING_TEXT_REGEX = re.compile(r"\S*$")
+#tamanho dos trechos lidos do arquivo HTML
+HTML_CHUNK_SIZE = 64*1024
+
+
+def text_tokens(str_text:str) -> List[str]:
+    lst_tokens = []
+    for str_word in str_text.split():
+        #a maioria das palavras não possui pontuação: a expressão regular só é usada nas demais
+        if str_word.isalnum():
+            lst_tokens.append(str_word)
+        else:
+            lst_tokens += TOKEN_REGEX.findall(str_word)
+    return lst_tokens
+
+
+class HTMLTextParser(HTMLParser):
+    """
+        Extrai, de forma incremental, o texto de um HTML ignorando o conteúdo das tags script e style
+    """
+    SKIPPED_TAGS = {"script","style"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lst_text = []
+        self.int_skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HTMLTextParser.SKIPPED_TAGS:
+            self.int_skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in HTMLTextParser.SKIPPED_TAGS and self.int_skip_depth > 0:
+            self.int_skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.int_skip_depth == 0:
+            self.lst_text.append(data)
+
+    def pop_text(self) -> str:
+        str_text = "".join(self.lst_text)
+        self.lst_text = []
+        return str_text
+
+
+def html_chunks(html_doc) -> Iterator[str]:
+    """
+        Trechos do HTML, que pode ser uma string, bytes (utf-8) ou um arquivo aberto
+    """
+    if isinstance(html_doc, str):
+        yield html_doc
+        return
+    if isinstance(html_doc, bytes):
+        yield html_doc.decode("utf-8", errors="replace")
+        return
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        chunk = html_doc.read(HTML_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+    yield decoder.decode(b"", final=True)
+
+
+#diretório raiz do projeto, onde fica o arquivo de stop words (stopwords.txt)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+#Os recursos do Cleaner (stop words, stemmer e tokenizador) são carregados apenas quando
+#usados pela primeira vez e compartilhados por todas as instâncias do processo.
+#Nada é baixado: são usados apenas arquivos locais
+@lru_cache(maxsize=None)
+def load_stop_words(str_file:str, language:str) -> Set[str]:
+    """
+        Stop words do arquivo str_file (procurado também em ROOT_DIR) ou, caso ele
+        não exista, do corpus de stop words do nltk instalado localmente
+    """
+    for str_file_name in [str_file, os.path.join(ROOT_DIR,str_file)]:
+        if os.path.exists(str_file_name):
+            return frozenset(Cleaner.read_stop_words(str_file_name))
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words(language))
+
+
+@lru_cache(maxsize=None)
+def load_stemmer(language:str):
+    from nltk.stem.snowball import SnowballStemmer
+    return SnowballStemmer(language)
+
+
+@lru_cache(maxsize=None)
+def load_word_tokenizer():
+    """
+        word_tokenize do nltk. Caso o modelo punkt (usado para dividir o texto em sentenças)
+        não esteja instalado, o texto é tokenizado sem ser dividido em sentenças
+    """
+    from nltk.tokenize import word_tokenize
+    try:
+        word_tokenize("teste")
+        return word_tokenize
+    except LookupError:
+        return lambda str_text: word_tokenize(str_text, preserve_line=True)
+
 
 class Cleaner:
+    #arquivo (no diretório do índice) com os termos normalizados em cache
+    CACHE_FILE = "normalization_cache.json"
+
     def __init__(self,stop_words_file:str,language:str,
                         perform_stop_words_removal:bool,perform_accents_removal:bool,
-                        perform_stemming:bool):
-        #self.set_stop_words = self.read_stop_words(stop_words_file)
-  
-        nltk.download('stopwords')
-        nltk.download('punkt')
-        self.set_stop_words = set(stopwords.words('portuguese'))
-        self.stemmer = SnowballStemmer(language)
+                        perform_stemming:bool,cache_size:int=100000):
+        #as stop words e o stemmer só são carregados quando usados (ver load_stop_words e load_stemmer)
+        self.stop_words_file = stop_words_file
+        self.language = language
+        self.obj_stemmer = None
         in_table =  "áéíóúâêôçãẽõü!?.:;,"
         out_table = "aeiouaeocaeou      "
         #altere a linha abaixo para remoção de acentos (Atividade 11)
@@ -28,16 +143,94 @@ class Cleaner:
         self.perform_accents_removal = perform_accents_removal
         self.perform_stemming = perform_stemming
 
+        #cache token -> termo normalizado (preprocess_word). Cada configuração possui o seu próprio cache
+        self.cache = LRUCache(cache_size)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def shared(stop_words_file:str,language:str,
+                    perform_stop_words_removal:bool,perform_accents_removal:bool,
+                    perform_stemming:bool) -> "Cleaner":
+        """
+            Instância única (por processo) do Cleaner com esta configuração
+        """
+        return Cleaner(stop_words_file,language,perform_stop_words_removal,perform_accents_removal,perform_stemming)
+
+    @property
+    def config(self) -> Dict:
+        """
+            Configuração que determina a normalização dos termos (ver save_cache)
+        """
+        return {"stop_words_file":self.stop_words_file,
+                "language":self.language,
+                "perform_stop_words_removal":self.perform_stop_words_removal,
+                "perform_accents_removal":self.perform_accents_removal,
+                "perform_stemming":self.perform_stemming}
+
+    def save_cache(self,str_dir:str):
+        """
+            Grava o cache de normalização no diretório str_dir (por exemplo, o diretório do índice)
+        """
+        with open(os.path.join(str_dir,Cleaner.CACHE_FILE),"w",encoding="utf-8") as cache_file:
+            json.dump({"config":self.config,"terms":list(self.cache.items())},cache_file,ensure_ascii=False)
+
+    def load_cache(self,str_dir:str) -> bool:
+        """
+            Carrega o cache gravado por save_cache. O cache só é carregado caso exista
+            e tenha sido gerado com a mesma configuração. Retorna se o cache foi carregado
+        """
+        str_file_name = os.path.join(str_dir,Cleaner.CACHE_FILE)
+        if not os.path.exists(str_file_name):
+            return False
+        with open(str_file_name,"r",encoding="utf-8") as cache_file:
+            dic_cache = json.load(cache_file)
+        if dic_cache["config"] != self.config:
+            return False
+        for term, str_normalized in dic_cache["terms"]:
+            self.cache.put(term,str_normalized)
+        return True
+
+    @property
+    def set_stop_words(self) -> Set[str]:
+        return load_stop_words(self.stop_words_file,self.language)
+
+    @property
+    def stemmer(self):
+        if self.obj_stemmer is None:
+            self.obj_stemmer = load_stemmer(self.language)
+        return self.obj_stemmer
+
     def html_to_plain_text(self,html_doc:str) ->str:
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_doc, 'html.parser')
         return soup.get_text()
 
-    def read_stop_words(self,str_file):
+    def html_tokens(self,html_doc) -> Iterator[str]:
+        """
+            Extrai os tokens do HTML de forma incremental, sem montar o texto completo do documento.
+            Os tokens são os mesmos de word_tokenize sobre html_to_plain_text apenas para textos simples
+            (palavras e sinais de pontuação isolados): aspas duplas, números com vírgula ("3,50"), reticências,
+            "--" e contrações ("it's", "don't") são separados de outra forma. Por isso, não é o padrão do HTMLIndexer
+        """
+        parser = HTMLTextParser()
+        str_pending = ""
+        for str_chunk in html_chunks(html_doc):
+            parser.feed(str_chunk)
+            str_text = str_pending+parser.pop_text()
+            #a última palavra pode continuar no próximo trecho (ex.: "ca<b>sa</b>")
+            int_cut = TRAILING_TEXT_REGEX.search(str_text).start()
+            str_pending = str_text[int_cut:]
+            yield from text_tokens(str_text[:int_cut])
+        parser.close()
+        yield from text_tokens(str_pending+parser.pop_text())
+
+    @staticmethod
+    def read_stop_words(str_file):
         set_stop_words = set()
-        with open(str_file, "r") as stop_words_file:
+        with open(str_file, "r", encoding="utf-8") as stop_words_file:
             for line in stop_words_file:
-                arr_words = line.split(",")
-                [set_stop_words.add(word) for word in arr_words]
+                arr_words = line.strip().split(",")
+                [set_stop_words.add(word.strip()) for word in arr_words if word.strip() != ""]
         return set_stop_words
     
     def is_stop_word(self,term:str):
@@ -55,6 +248,14 @@ class Cleaner:
 
 
     def preprocess_word(self,term:str) -> str:
+        #a distribuição dos tokens é bastante desigual: a maioria é normalizada apenas uma vez
+        str_normalized = self.cache.get(term)
+        if str_normalized is None:
+            str_normalized = self.normalize_word(term)
+            self.cache.put(term,str_normalized)
+        return str_normalized
+
+    def normalize_word(self,term:str) -> str:
         term = term.lower()
         if self.perform_stop_words_removal is True and self.is_stop_word(term):
             term = ""
@@ -68,20 +269,24 @@ class Cleaner:
         return term
 
 class HTMLIndexer:
-    
+    #máximo de arquivos indexados por tarefa na indexação paralela
+    PARALLEL_BATCH_FILES = 500
+
     cleaner = Cleaner(stop_words_file="stopwords.txt",
                         language="portuguese",
                         perform_stop_words_removal=False,
                         perform_accents_removal=True,
                         perform_stemming=True)
     
-    def __init__(self,index):
+    def __init__(self,index,streaming:bool=False):
         self.index = index
+        #streaming: usa o tokenizador incremental (Cleaner.html_tokens) no lugar de BeautifulSoup e word_tokenize.
+        #É mais rápido, mas alguns tokens diferem dos de word_tokenize (ver Cleaner.html_tokens)
+        self.streaming = streaming
 
-    def text_word_count(self,plain_text:str):
-        text_tokenized = nltk.word_tokenize(plain_text)
+    def word_count(self,words:Iterable[str]) -> Dict[str,int]:
         dic_word_count = {}
-        for word in text_tokenized:
+        for word in words:
             word = self.cleaner.preprocess_word(word)
             if word != "" and word != " ":
                 if word in dic_word_count:
@@ -89,27 +294,146 @@ class HTMLIndexer:
                 else:
                     dic_word_count[word] = 1
         return dic_word_count
-    
+
+    def word_positions(self,words:Iterable[str]) -> Dict[str,List[int]]:
+        """
+            Posições de cada palavra. As posições são contadas apenas entre as palavras indexadas
+            (as stop words removidas não ocupam posições), assim como os termos de uma frase na consulta
+        """
+        dic_word_positions = {}
+        int_position = 0
+        for word in words:
+            word = self.cleaner.preprocess_word(word)
+            if word != "" and word != " ":
+                if word in dic_word_positions:
+                    dic_word_positions[word].append(int_position)
+                else:
+                    dic_word_positions[word] = [int_position]
+                int_position += 1
+        return dic_word_positions
+
+    def text_word_count(self,plain_text:str):
+        return self.word_count(load_word_tokenizer()(plain_text))
+
+    def text_word_positions(self,plain_text:str) -> Dict[str,List[int]]:
+        return self.word_positions(load_word_tokenizer()(plain_text))
+
+    def html_words(self,text_html) -> Iterable[str]:
+        if self.streaming:
+            return HTMLIndexer.cleaner.html_tokens(text_html)
+        return load_word_tokenizer()(HTMLIndexer.cleaner.html_to_plain_text(text_html))
+
+    def html_word_count(self,text_html) -> Dict[str,int]:
+        return self.word_count(self.html_words(text_html))
+
     def index_text(self,doc_id:int, text_html:str):
-        text_plain = HTMLIndexer.cleaner.html_to_plain_text(text_html)
-        dic_text = self.text_word_count(text_plain)
-        for term in dic_text:
-            self.index.index(term,doc_id,dic_text[term])
+        if self.index.positional:
+            dic_word_positions = self.word_positions(self.html_words(text_html))
+            self.index.index_document(doc_id,{word:len(lst_positions) for word,lst_positions in dic_word_positions.items()},
+                                      dic_word_positions)
+        else:
+            self.index.index_document(doc_id,self.html_word_count(text_html))
         
+    def update_document(self,doc_id:int, text_html:str):
+        """
+            Substitui, no índice, o documento doc_id pelo novo conteúdo text_html.
+            Retorna as frequências dos termos do novo conteúdo. O FileIndex não permite atualizações
+            (NotImplementedError): nos índices em disco, utilize um SegmentedIndex
+        """
+        dic_text = self.html_word_count(text_html)
+        self.index.update_document(doc_id,dic_text)
+        return dic_text
+
+    def delete_document(self,doc_id:int):
+        self.index.delete_document(doc_id)
 
-    def index_text_dir(self,path:str):
+
+    def index_text_dir(self,path:str,int_processes:int=1,str_times_file:str="tempos.txt"):
+        """
+            Indexa os arquivos de cada subdiretório de path. Com int_processes > 1, os arquivos
+            são indexados em paralelo (ver index_text_dir_parallel). Na indexação sequencial, o tempo
+            gasto em cada arquivo é acrescentado a str_times_file (None: os tempos não são gravados)
+        """
+        if int_processes > 1:
+            self.index_text_dir_parallel(path,int_processes)
+            return
         for str_sub_dir in os.listdir(path):
             path_sub_dir = f"{path}/{str_sub_dir}"
             for str_file in os.listdir(path_sub_dir):
                 filename = f"{path_sub_dir}/{str_file}"
                 with open(filename,"rb") as file:
                     time_first = datetime.now()
-                    self.index_text(int((str_file.split("."))[0]),file)
+                    self.index_text(doc_id_from_file(str_file),file)
                     time_end = datetime.now()
                     tempo_gasto = time_end-time_first
-                with open("tempos.txt","a",encoding="utf-8") as file:
-                    file.write(str_file+":")
-                    file.write(f"{tempo_gasto.total_seconds()}\n")
-                
+                if str_times_file is not None:
+                    with open(str_times_file,"a",encoding="utf-8") as file:
+                        file.write(str_file+":")
+                        file.write(f"{tempo_gasto.total_seconds()}\n")
+
+    def index_text_dir_parallel(self,path:str,int_processes:int):
+        """
+            Divide os arquivos em lotes (de no máximo PARALLEL_BATCH_FILES arquivos de um mesmo
+            subdiretório) indexados por int_processes processos. Cada lote gera um run ordenado
+            cujo term_id é a posição do termo no vocabulário (ordenado) do lote. Como o id global
+            é a posição do termo no vocabulário de todos os lotes, o remapeamento preserva a ordem
+            dos runs, que são então intercalados pelo FileIndex (em finish_indexing)
+        """
+        if not isinstance(self.index,FileIndex) or len(self.index.dic_index) > 0:
+            raise Exception("A indexação paralela só pode ser feita em um FileIndex vazio")
+        lst_batches = []
+        for str_sub_dir in sorted(os.listdir(path)):
+            path_sub_dir = f"{path}/{str_sub_dir}"
+            lst_files = [f"{path_sub_dir}/{str_file}" for str_file in sorted(os.listdir(path_sub_dir))]
+            for i in range(0,len(lst_files),self.PARALLEL_BATCH_FILES):
+                lst_batches.append(lst_files[i:i+self.PARALLEL_BATCH_FILES])
+        lst_batch_runs = [os.path.join(self.index.str_idx_dir,f"batch_run_{i}.idx") for i in range(len(lst_batches))]
+        lst_run_files = [self.index.next_idx_file_name() for _ in lst_batches]
+
+        with ProcessPoolExecutor(max_workers=int_processes) as executor:
+            lst_results = list(executor.map(index_files_run,lst_batches,lst_batch_runs,repeat(self.streaming)))
+            lst_terms = sorted(set().union(*[lst_batch_terms for lst_batch_terms,_ in lst_results]))
+            dic_term_ids = {term:term_id for term_id,term in enumerate(lst_terms)}
+            lst_term_ids = [array("I",[dic_term_ids[term] for term in lst_batch_terms]) for lst_batch_terms,_ in lst_results]
+            list(executor.map(remap_run,lst_batch_runs,lst_run_files,lst_term_ids))
+
+        self.index.add_runs(lst_terms,lst_run_files,set().union(*[set_batch_docs for _,set_batch_docs in lst_results]))
+
+
+def doc_id_from_file(str_file:str) -> int:
+    return int((str_file.split("."))[0])
+
+
+def index_files_run(lst_files:List[str],str_run_file_name:str,streaming:bool=False) -> Tuple[List[str],Set[int]]:
+    """
+        Indexa (em memória) os arquivos e grava suas ocorrências, ordenadas por (term_id, doc_id),
+        no run str_run_file_name, usando como term_id a posição do termo no vocabulário ordenado.
+        Retorna o vocabulário ordenado e os documentos indexados
+    """
+    index = CompactHashIndex()
+    html_indexer = HTMLIndexer(index,streaming)
+    for filename in lst_files:
+        with open(filename,"rb") as file:
+            html_indexer.index_text(doc_id_from_file(os.path.basename(filename)),file)
+    lst_terms = sorted(index.vocabulary)
+    with open(str_run_file_name,"wb") as run_file:
+        writer = OccurrenceWriter(run_file)
+        for term_id,term in enumerate(lst_terms):
+            posting_list = index.get_occurrence_list(term)
+            for doc_id,term_freq in sorted(zip(posting_list.doc_ids,posting_list.term_freqs)):
+                writer.write(term_id,doc_id,term_freq)
+        writer.flush()
+    return lst_terms,index.set_documents
+
 
-                    
+def remap_run(str_run_file_name:str,str_new_file_name:str,arr_term_ids:array):
+    """
+        Regrava o run substituindo cada term_id local por arr_term_ids[term_id]
+    """
+    with open(str_run_file_name,"rb") as run_file, open(str_new_file_name,"wb") as new_file:
+        read_header(run_file)
+        writer = OccurrenceWriter(new_file)
+        for term_id,doc_id,term_freq in read_occurrences(run_file):
+            writer.write(arr_term_ids[term_id],doc_id,term_freq)
+        writer.flush()
+    os.remove(str_run_file_name)
@@ -1,12 +1,20 @@
 from index.indexer import *
 from index.structure import *
+from index.segments import SegmentedIndex
+import os
+import tempfile
 import unittest
 
 class IndexerTest(unittest.TestCase):
     def test_indexer(self):
         obj_index = HashIndex()
         html_indexer = HTMLIndexer(obj_index)
-        html_indexer.index_text_dir("index/docs_test")
+        with tempfile.TemporaryDirectory() as str_dir:
+            #o tempo de indexação de cada arquivo é gravado fora do diretório atual
+            str_times_file = os.path.join(str_dir,"tempos.txt")
+            html_indexer.index_text_dir("index/docs_test",str_times_file=str_times_file)
+            with open(str_times_file,"r",encoding="utf-8") as file:
+                self.assertEqual(len(file.readlines()),sum(len(os.listdir(f"index/docs_test/{str_sub_dir}")) for str_sub_dir in os.listdir("index/docs_test")))
         set_vocab = set(obj_index.vocabulary)
         set_expected_vocab = set(['a', 'cas', 'ser', 'verd', 'ou', 'nao', 'eis', 'questa'])
 
@@ -22,5 +30,118 @@ class IndexerTest(unittest.TestCase):
                 self.assertTrue(occur.doc_id in dic_expected,f"O docid número {occur.doc_id} não deveria existir ou não deveria indexar o termo 'cas'")
                 self.assertEqual(dic_expected[occur.doc_id].term_freq,occur.term_freq, f"A frequencia do termo 'cas' no documento {occur.doc_id} deveria ser {occur.term_freq}")
 
+    def test_cleaner(self):
+        cleaner = Cleaner.shared(stop_words_file="stopwords.txt",language="portuguese",
+                                 perform_stop_words_removal=True,perform_accents_removal=True,
+                                 perform_stemming=True)
+        self.assertIsNone(cleaner.obj_stemmer, "O stemmer só deveria ser carregado quando usado")
+        self.assertIs(cleaner,Cleaner.shared(stop_words_file="stopwords.txt",language="portuguese",
+                                             perform_stop_words_removal=True,perform_accents_removal=True,
+                                             perform_stemming=True))
+        #as stop words são lidas do arquivo local stopwords.txt
+        self.assertSetEqual(cleaner.set_stop_words,Cleaner.read_stop_words("stopwords.txt"))
+        self.assertEqual(cleaner.preprocess_word("Ser"),"")
+        self.assertEqual(cleaner.preprocess_word("Casa"),"cas")
+
+    def test_normalization_cache(self):
+        cleaner = Cleaner(stop_words_file="stopwords.txt",language="portuguese",
+                          perform_stop_words_removal=False,perform_accents_removal=True,
+                          perform_stemming=True,cache_size=2)
+        self.assertListEqual([cleaner.preprocess_word(word) for word in ["Casa","casa","Casa","verde"]],["cas","cas","cas","verd"])
+        self.assertEqual((cleaner.cache.hits,cleaner.cache.misses),(1,3))
+        #o token usado há mais tempo ("casa") é descartado
+        cleaner.preprocess_word("Será")
+        self.assertListEqual([term for term,_ in cleaner.cache.items()],["verde","Será"])
+
+        with tempfile.TemporaryDirectory() as str_dir:
+            cleaner.save_cache(str_dir)
+            new_cleaner = Cleaner(stop_words_file="stopwords.txt",language="portuguese",
+                                  perform_stop_words_removal=False,perform_accents_removal=True,
+                                  perform_stemming=True)
+            self.assertTrue(new_cleaner.load_cache(str_dir))
+            self.assertEqual(new_cleaner.preprocess_word("Será"),"ser")
+            self.assertEqual(new_cleaner.cache.hits,1)
+
+            #o cache não é compartilhado entre configurações diferentes
+            other_cleaner = Cleaner(stop_words_file="stopwords.txt",language="portuguese",
+                                    perform_stop_words_removal=False,perform_accents_removal=False,
+                                    perform_stemming=False)
+            self.assertFalse(other_cleaner.load_cache(str_dir))
+            self.assertEqual(other_cleaner.preprocess_word("Será"),"será")
+
+    def test_default_tokenizer(self):
+        #por padrão, os tokens são os de word_tokenize sobre o texto extraído pelo BeautifulSoup
+        html_indexer = HTMLIndexer(HashIndex())
+        self.assertFalse(html_indexer.streaming)
+        str_html = "<html><body><p>Ele disse \"olá\": custa 3,50... it's <b>don't</b> -- ok</p></body></html>"
+        self.assertListEqual(list(html_indexer.html_words(str_html)),
+                             ["Ele","disse","``","olá","''",":","custa","3,50","...","it","'s","do","n't","--","ok"])
+        self.assertDictEqual(html_indexer.html_word_count(str_html),
+                             html_indexer.text_word_count(html_indexer.cleaner.html_to_plain_text(str_html)))
+
+    def test_streaming_tokenizer(self):
+        html_indexer = HTMLIndexer(HashIndex(),streaming=True)
+        for str_sub_dir in os.listdir("index/docs_test"):
+            for str_file in os.listdir(f"index/docs_test/{str_sub_dir}"):
+                with open(f"index/docs_test/{str_sub_dir}/{str_file}","rb") as file:
+                    str_html = file.read()
+                dic_expected = html_indexer.text_word_count(html_indexer.cleaner.html_to_plain_text(str_html))
+                self.assertDictEqual(html_indexer.html_word_count(str_html),dic_expected,
+                                     f"O tokenizador incremental deveria gerar os mesmos termos no arquivo {str_file}")
+
+        str_html = "<html><head><style>p {color:red}</style><script>var casa = '<p>';</script></head>"+\
+                   "<body><p>Ca<b>sa</b> verde &amp; guarda-chuva!</p><!-- comentário --></body></html>"
+        self.assertListEqual(list(html_indexer.cleaner.html_tokens(str_html)),["Casa","verde","&","guarda-chuva","!"])
+
+    def test_positional_indexer(self):
+        with tempfile.TemporaryDirectory() as str_dir:
+            index = FileIndex(str_idx_dir=str_dir,positional=True)
+            html_indexer = HTMLIndexer(index)
+            html_indexer.index_text(1,"<html><body><p>Casa verde, <b>casa</b> amarela</p></body></html>")
+            index.finish_indexing()
+            #as posições são contadas apenas entre os tokens indexados
+            self.assertDictEqual(html_indexer.word_positions(["Casa","verde",",","casa","amarela"]),
+                                 {"cas":[0,2],"verd":[1],"amarel":[3]})
+            self.assertListEqual(index.get_positions("cas").positions(1),[0,2])
+            self.assertListEqual(index.get_positions("amarel").positions(1),[3])
+            self.assertListEqual([(o.doc_id,o.term_freq) for o in index.get_occurrence_list("cas")],[(1,2)])
+
+    def test_update_document(self):
+        str_html = "<html><body><p>Casa verde</p></body></html>"
+        str_new_html = "<html><body><p>Casa amarela, casa azul</p></body></html>"
+        with tempfile.TemporaryDirectory() as str_dir:
+            #o FileIndex não permite atualizações: nos índices em disco, elas são feitas por meio do SegmentedIndex
+            file_index = FileIndex(str_idx_dir=str_dir)
+            HTMLIndexer(file_index).index_text(1,str_html)
+            file_index.finish_indexing()
+            with self.assertRaises(NotImplementedError):
+                HTMLIndexer(file_index).update_document(1,str_new_html)
+
+            index = SegmentedIndex(f"{str_dir}/segmentos",background_merge=False)
+            html_indexer = HTMLIndexer(index)
+            html_indexer.index_text(1,str_html)
+            index.flush()
+            self.assertDictEqual(html_indexer.update_document(1,str_new_html),{"cas":2,"amarel":1,"azul":1})
+            index.flush()
+            self.assertListEqual([(o.doc_id,o.term_freq) for o in index.get_occurrence_list("cas")],[(1,2)])
+            self.assertListEqual(list(index.get_occurrence_list("verd")),[])
+
+    def test_parallel_indexer(self):
+        obj_expected_index = HashIndex()
+        HTMLIndexer(obj_expected_index).index_text_dir("index/docs_test",str_times_file=None)
+        with tempfile.TemporaryDirectory() as str_dir:
+            obj_index = FileIndex(str_idx_dir=str_dir)
+            html_indexer = HTMLIndexer(obj_index)
+            html_indexer.PARALLEL_BATCH_FILES = 1
+            html_indexer.index_text_dir("index/docs_test",int_processes=2)
+            obj_index.finish_indexing()
+
+            self.assertSetEqual(obj_index.set_documents,obj_expected_index.set_documents)
+            self.assertSetEqual(set(obj_index.vocabulary),set(obj_expected_index.vocabulary))
+            for term in obj_expected_index.vocabulary:
+                self.assertListEqual([(o.doc_id,o.term_freq) for o in obj_index.get_occurrence_list(term)],
+                                     sorted((o.doc_id,o.term_freq) for o in obj_expected_index.get_occurrence_list(term)),
+                                     f"As ocorrências do termo {term} deveriam ser as mesmas da indexação sequencial")
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,144 @@
+from typing import Iterable, Iterator, Tuple
+from collections.abc import Mapping
+from bisect import bisect_right
+import mmap
+import struct
+from .compression import vbyte_encode, vbyte_read
+
+#Léxico em disco: os termos, em ordem, são agrupados em blocos de LEXICON_BLOCK_TERMS termos.
+#Em cada bloco, cada termo armazena apenas o tamanho do prefixo em comum com o termo
+#anterior e o sufixo restante (front coding); o primeiro termo do bloco é completo:
+#   [tam. prefixo][tam. sufixo][sufixo][term_id][doc_count_with_term][posição][tamanho]
+#Ao final do arquivo fica a posição de cada bloco e o rodapé.
+LEXICON_MAGIC = b"TPLX"
+LEXICON_VERSION = 1
+LEXICON_HEADER = struct.Struct("<4sBxxx")
+#quantidade de termos, quantidade de blocos e posição da tabela de blocos
+LEXICON_FOOTER = struct.Struct("<IIQ")
+BLOCK_OFFSET = struct.Struct("<Q")
+
+LEXICON_BLOCK_TERMS = 16
+
+
+def common_prefix_len(str_a:bytes, str_b:bytes) -> int:
+    int_max = min(len(str_a), len(str_b))
+    i = 0
+    while i < int_max and str_a[i] == str_b[i]:
+        i += 1
+    return i
+
+
+def write_lexicon(str_file_name:str, terms:Iterable[Tuple[str,object]]):
+    """
+        Grava o léxico a partir dos pares (termo, TermFilePosition), que devem estar
+        em ordem crescente de termo
+    """
+    lst_block_offsets = []
+    int_terms = 0
+    with open(str_file_name, "wb") as lexicon_file:
+        lexicon_file.write(LEXICON_HEADER.pack(LEXICON_MAGIC, LEXICON_VERSION))
+        block = bytearray()
+        last_term = b""
+        for str_term, obj_term in terms:
+            term = str_term.encode("utf-8")
+            if int_terms % LEXICON_BLOCK_TERMS == 0:
+                lexicon_file.write(block)
+                block = bytearray()
+                lst_block_offsets.append(lexicon_file.tell())
+                last_term = b""
+            int_prefix = common_prefix_len(last_term, term)
+            vbyte_encode((int_prefix, len(term)-int_prefix), block)
+            block += term[int_prefix:]
+            vbyte_encode((obj_term.term_id, obj_term.doc_count_with_term or 0,
+                          obj_term.term_file_start_pos or 0, obj_term.term_file_byte_count or 0), block)
+            last_term = term
+            int_terms += 1
+        lexicon_file.write(block)
+
+        int_table_pos = lexicon_file.tell()
+        for int_offset in lst_block_offsets:
+            lexicon_file.write(BLOCK_OFFSET.pack(int_offset))
+        lexicon_file.write(LEXICON_FOOTER.pack(int_terms, len(lst_block_offsets), int_table_pos))
+
+
+class Lexicon(Mapping):
+    """
+        Dicionário (termo -> TermFilePosition) somente leitura sobre o léxico em disco mapeado
+        em memória. Apenas o primeiro termo de cada bloco fica em memória: a busca de um termo
+        é uma busca binária nesta amostra seguida da leitura de um único bloco.
+    """
+    def __init__(self, str_file_name:str, entry_class):
+        self.str_file_name = str_file_name
+        #classe das entradas retornadas (TermFilePosition)
+        self.entry_class = entry_class
+        with open(str_file_name, "rb") as lexicon_file:
+            magic, version = LEXICON_HEADER.unpack(lexicon_file.read(LEXICON_HEADER.size))
+            if magic != LEXICON_MAGIC or version != LEXICON_VERSION:
+                raise ValueError(f"O arquivo {str_file_name} não é um léxico válido")
+            self.mmap_lexicon = mmap.mmap(lexicon_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.int_terms, int_blocks, int_table_pos = LEXICON_FOOTER.unpack_from(self.mmap_lexicon,
+                                                                  len(self.mmap_lexicon)-LEXICON_FOOTER.size)
+        self.lst_block_offsets = [BLOCK_OFFSET.unpack_from(self.mmap_lexicon, int_table_pos+i*BLOCK_OFFSET.size)[0]
+                                        for i in range(int_blocks)]
+        self.int_blocks_end = int_table_pos
+        #amostra: primeiro termo (completo) de cada bloco
+        self.lst_block_first_terms = [self.read_entry(int_offset, b"")[0].decode("utf-8")
+                                        for int_offset in self.lst_block_offsets]
+
+    def read_entry(self, pos:int, last_term:bytes) -> Tuple[bytes,Tuple[int,int,int,int],int]:
+        """
+            Lê a entrada na posição pos, retornando o termo, seus valores e a posição da próxima entrada
+        """
+        int_prefix, pos = vbyte_read(self.mmap_lexicon, pos)
+        int_suffix, pos = vbyte_read(self.mmap_lexicon, pos)
+        term = last_term[:int_prefix]+self.mmap_lexicon[pos:pos+int_suffix]
+        pos += int_suffix
+        arr_values = []
+        for _ in range(4):
+            value, pos = vbyte_read(self.mmap_lexicon, pos)
+            arr_values.append(value)
+        return term, tuple(arr_values), pos
+
+    def iter_block(self, block:int) -> Iterator[Tuple[bytes,Tuple[int,int,int,int]]]:
+        pos = self.lst_block_offsets[block]
+        int_end = self.lst_block_offsets[block+1] if block+1 < len(self.lst_block_offsets) else self.int_blocks_end
+        term = b""
+        while pos < int_end:
+            term, arr_values, pos = self.read_entry(pos, term)
+            yield term, arr_values
+
+    def create_entry(self, arr_values:Tuple[int,int,int,int]):
+        term_id, doc_count_with_term, term_file_start_pos, term_file_byte_count = arr_values
+        return self.entry_class(term_id, term_file_start_pos=term_file_start_pos,
+                                doc_count_with_term=doc_count_with_term,
+                                term_file_byte_count=term_file_byte_count)
+
+    def __getitem__(self, str_term:str):
+        if not isinstance(str_term, str):
+            raise KeyError(str_term)
+        block = bisect_right(self.lst_block_first_terms, str_term)-1
+        if block < 0:
+            raise KeyError(str_term)
+        term = str_term.encode("utf-8")
+        for block_term, arr_values in self.iter_block(block):
+            if block_term == term:
+                return self.create_entry(arr_values)
+            if block_term > term:
+                break
+        raise KeyError(str_term)
+
+    def __iter__(self) -> Iterator[str]:
+        for str_term, _ in self.items():
+            yield str_term
+
+    def items(self):
+        for block in range(len(self.lst_block_offsets)):
+            for term, arr_values in self.iter_block(block):
+                yield term.decode("utf-8"), self.create_entry(arr_values)
+
+    def __len__(self):
+        return self.int_terms
+
+    def close(self):
+        self.mmap_lexicon.close()
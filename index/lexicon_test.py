@@ -0,0 +1,56 @@
+from .structure import *
+from .lexicon import Lexicon, write_lexicon, LEXICON_BLOCK_TERMS
+import os
+import tempfile
+import unittest
+
+
+class LexiconTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.str_file_name = os.path.join(tmp_dir.name, "lexicon.lex")
+
+        #termos com prefixos em comum e acentos, ocupando vários blocos
+        self.arr_terms = sorted({f"{prefix}{i}" for prefix in ["cas","casa","casarão","verd","ção"] for i in range(LEXICON_BLOCK_TERMS)})
+        self.dic_terms = {term:TermFilePosition(i, i*12, i%5+1, (i%5+1)*12) for i,term in enumerate(self.arr_terms)}
+        write_lexicon(self.str_file_name, sorted(self.dic_terms.items()))
+        self.lexicon = Lexicon(self.str_file_name, TermFilePosition)
+        self.addCleanup(self.lexicon.close)
+
+    def test_get(self):
+        self.assertEqual(len(self.lexicon), len(self.arr_terms))
+        for term, expected in self.dic_terms.items():
+            self.assertTrue(term in self.lexicon)
+            obj_term = self.lexicon[term]
+            self.assertTupleEqual((obj_term.term_id, obj_term.term_file_start_pos, obj_term.doc_count_with_term, obj_term.term_file_byte_count),
+                                  (expected.term_id, expected.term_file_start_pos, expected.doc_count_with_term, expected.term_file_byte_count))
+
+        #antes do primeiro termo, entre dois termos e depois do último
+        for term in ["a", "casa", "casa10a", "zzz", ""]:
+            self.assertFalse(term in self.lexicon, f"O termo '{term}' não deveria existir no léxico")
+        self.assertIsNone(self.lexicon.get("xuxu"))
+
+    def test_iteration(self):
+        self.assertListEqual(list(self.lexicon), self.arr_terms)
+        self.assertListEqual([obj_term.term_id for _,obj_term in self.lexicon.items()], list(range(len(self.arr_terms))))
+
+    def test_file_index_lexicon(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        index = FileIndex(str_idx_dir=tmp_dir.name)
+        index.index("casa",1,10)
+        index.index("vermelho",1,3)
+        index.index("vermelho",2,1)
+        index.finish_indexing()
+        int_casa_id = index.get_term_id("casa")
+        index.open_lexicon()
+        self.addCleanup(index.dic_index.close)
+
+        self.assertIsInstance(index.dic_index, Lexicon)
+        self.assertEqual(index.get_term_id("casa"), int_casa_id)
+        self.assertIsNone(index.get_term_id("xuxu"))
+        self.assertListEqual([(o.doc_id,o.term_freq) for o in index.get_occurrence_list("vermelho")],[(1,3),(2,1)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@ from index.structure import *
 
 from datetime import datetime
 import math
+import tempfile
 import tracemalloc
 import unittest
 from random import randrange,seed
@@ -64,7 +65,13 @@ class PerformanceTest(unittest.TestCase):
 import time
 class FilePerformanceTest(PerformanceTest):
     def setUp(self):
-        self.index = FileIndex()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.index = FileIndex(str_idx_dir=tmp_dir.name)
+
+class CompactPerformanceTest(PerformanceTest):
+    def setUp(self):
+        self.index = CompactHashIndex()
 
 def test():
     for i in range(10):
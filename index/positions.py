@@ -0,0 +1,181 @@
+from typing import Iterable, Iterator, List, Sequence, Tuple
+from itertools import accumulate
+from array import array
+from bisect import bisect_left
+import mmap
+import os
+import struct
+from .compression import vbyte_encode, vbyte_decode, vbyte_read
+from .document_table import write_arrays, read_arrays
+
+#Posições dos termos (índice posicional): as posições de cada ocorrência (termo, documento) são
+#armazenadas como a diferença (gap) para a posição anterior, codificadas em variable-byte, em um
+#arquivo separado do arquivo de ocorrências (consultas sem frases não leem as posições).
+#Nos runs temporários (.pos), as posições acompanham as ocorrências do run, na mesma ordem:
+#   [tamanho em bytes][gaps das posições]
+#No arquivo final (.prx), as posições de cada termo são contíguas e não dependem do arquivo de ocorrências:
+#   [gap do doc_id][tamanho em bytes][gaps das posições]...
+#seguidas da tabela (term_id, posição inicial e tamanho das posições de cada termo) e do rodapé
+POSITIONS_MAGIC = b"TPPS"
+POSITIONS_VERSION = 1
+POSITIONS_HEADER = struct.Struct("<4sBxxx")
+#quantidade de termos e posição da tabela
+POSITIONS_FOOTER = struct.Struct("<IQ")
+
+
+def write_positions_header(pos_file):
+    pos_file.write(POSITIONS_HEADER.pack(POSITIONS_MAGIC, POSITIONS_VERSION))
+
+
+def check_positions_header(data:bytes, str_file_name:str):
+    magic, version = POSITIONS_HEADER.unpack_from(data, 0)
+    if magic != POSITIONS_MAGIC or version != POSITIONS_VERSION:
+        raise ValueError(f"O arquivo {str_file_name} não é um arquivo de posições válido")
+
+
+def encode_positions(positions:Sequence[int]) -> bytes:
+    """
+        Codifica as posições (em ordem crescente) como gaps em variable-byte
+    """
+    return bytes(vbyte_encode([position-last for last, position in zip([0]+list(positions), positions)], bytearray()))
+
+
+def decode_positions(data:bytes) -> List[int]:
+    return list(accumulate(vbyte_decode(data)))
+
+
+class PositionsRunWriter:
+    """
+        Grava o run de posições (as posições já codificadas de cada ocorrência do run, na mesma ordem),
+        acumulando-as em um buffer gravado de uma só vez a cada RUN_BUFFER_SIZE bytes
+    """
+    RUN_BUFFER_SIZE = 64*1024
+
+    def __init__(self, pos_file):
+        self.pos_file = pos_file
+        self.buffer = bytearray()
+        write_positions_header(pos_file)
+
+    def write(self, data:bytes):
+        vbyte_encode((len(data),), self.buffer)
+        self.buffer += data
+        if len(self.buffer) >= self.RUN_BUFFER_SIZE:
+            self.flush()
+
+    def write_all(self, lst_data:Iterable[bytes]):
+        for data in lst_data:
+            self.write(data)
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            self.pos_file.write(self.buffer)
+            self.buffer = bytearray()
+
+
+def read_positions_run(str_file_name:str) -> Iterator[bytes]:
+    """
+        Percorre (sob demanda) as posições codificadas de cada ocorrência do run
+    """
+    with open(str_file_name, "rb") as pos_file:
+        mmap_pos = mmap.mmap(pos_file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        check_positions_header(mmap_pos, str_file_name)
+        pos = POSITIONS_HEADER.size
+        while pos < len(mmap_pos):
+            length, pos = vbyte_read(mmap_pos, pos)
+            yield mmap_pos[pos:pos+length]
+            pos += length
+    finally:
+        mmap_pos.close()
+
+
+class PositionsTable:
+    """
+        Posição inicial e tamanho (em bytes) das posições de cada termo no arquivo final,
+        em arrays compactos alinhados aos term_ids ordenados
+    """
+    def __init__(self, term_ids:array=None, starts:array=None, byte_counts:array=None):
+        self.term_ids = term_ids if term_ids is not None else array("I")
+        self.starts = starts if starts is not None else array("Q")
+        self.byte_counts = byte_counts if byte_counts is not None else array("Q")
+
+    def term_range(self, term_id:int) -> Tuple[int,int]:
+        """
+            Retorna a posição inicial e o tamanho das posições do termo (ou None, caso o termo não as possua)
+        """
+        pos = bisect_left(self.term_ids, term_id)
+        if pos == len(self.term_ids) or self.term_ids[pos] != term_id:
+            return None
+        return self.starts[pos], self.byte_counts[pos]
+
+    @staticmethod
+    def read(pos_file) -> "PositionsTable":
+        """
+            Lê apenas a tabela (ao final do arquivo de posições)
+        """
+        pos_file.seek(0)
+        check_positions_header(pos_file.read(POSITIONS_HEADER.size), pos_file.name)
+        pos_file.seek(-POSITIONS_FOOTER.size, os.SEEK_END)
+        int_terms, int_table_pos = POSITIONS_FOOTER.unpack(pos_file.read(POSITIONS_FOOTER.size))
+        pos_file.seek(int_table_pos)
+        return PositionsTable(*read_arrays(pos_file, "IQQ", int_terms))
+
+    def __len__(self):
+        return len(self.term_ids)
+
+
+class PositionsWriter:
+    """
+        Grava o arquivo final de posições, um termo por vez (em ordem de term_id)
+    """
+    def __init__(self, pos_file):
+        self.pos_file = pos_file
+        self.table = PositionsTable()
+        write_positions_header(pos_file)
+
+    def write_term(self, term_id:int, doc_ids:Sequence[int], lst_data:Sequence[bytes]):
+        block = bytearray()
+        last_doc_id = -1
+        for doc_id, data in zip(doc_ids, lst_data):
+            vbyte_encode((doc_id-last_doc_id, len(data)), block)
+            block += data
+            last_doc_id = doc_id
+        self.table.term_ids.append(term_id)
+        self.table.starts.append(self.pos_file.tell())
+        self.table.byte_counts.append(len(block))
+        self.pos_file.write(block)
+
+    def close(self) -> PositionsTable:
+        """
+            Grava a tabela e o rodapé, retornando a tabela
+        """
+        int_table_pos = self.pos_file.tell()
+        write_arrays(self.pos_file, [self.table.term_ids, self.table.starts, self.table.byte_counts])
+        self.pos_file.write(POSITIONS_FOOTER.pack(len(self.table), int_table_pos))
+        return self.table
+
+
+class PositionsIterator:
+    """
+        Percorre, em ordem crescente de doc_id, as posições de um termo no arquivo final. Assim como os
+        iteradores de ocorrências, nunca retrocede: as posições dos documentos pulados não são decodificadas
+    """
+    def __init__(self, data:bytes):
+        self.data = data
+        self.pos = 0
+        self.doc_id = -1
+        self.int_start = 0
+
+    def positions(self, doc_id:int) -> List[int]:
+        """
+            Posições do termo no documento doc_id (lista vazia, caso o termo não ocorra no documento)
+        """
+        data = self.data
+        while self.doc_id < doc_id and self.pos < len(data):
+            gap, pos = vbyte_read(data, self.pos)
+            length, self.int_start = vbyte_read(data, pos)
+            self.doc_id += gap
+            self.pos = self.int_start+length
+        if self.doc_id != doc_id:
+            return []
+        return decode_positions(data[self.int_start:self.pos])
@@ -0,0 +1,84 @@
+import struct
+from typing import Iterable, Iterator, Tuple
+
+#Formato binário dos arquivos de ocorrências (runs temporários e índice final):
+#um cabeçalho versionado seguido de registros de tamanho fixo
+#(term_id, doc_id, term_freq), lidos e escritos em blocos
+MAGIC = b"TPIX"
+FORMAT_VERSION = 1
+
+#magic, versão, codec e tamanho (em bytes) de cada registro
+HEADER = struct.Struct("<4sBBH")
+#term_id, doc_id, term_freq
+OCCURRENCE = struct.Struct("<III")
+
+#ocorrências de tamanho fixo (runs e índice final não comprimido)
+CODEC_FIXED = 0
+#ocorrências codificadas em gaps + variable-byte (ver compression.py)
+CODEC_VBYTE = 1
+
+#quantidade de ocorrências lidas/escritas por vez
+BLOCK_SIZE = 4096
+
+
+def write_header(idx_file, codec:int=CODEC_FIXED):
+    idx_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, codec, OCCURRENCE.size))
+
+
+def read_header(idx_file) -> int:
+    """
+        Lê e valida o cabeçalho do arquivo, retornando o codec usado nas ocorrências
+    """
+    header = idx_file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"Arquivo de índice sem cabeçalho: {idx_file.name}")
+    magic, version, codec, record_size = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"O arquivo {idx_file.name} não é um arquivo de índice")
+    if version != FORMAT_VERSION or record_size != OCCURRENCE.size:
+        raise ValueError(f"Versão {version} do arquivo {idx_file.name} não suportada")
+    return codec
+
+
+class OccurrenceWriter:
+    """
+        Escreve as ocorrências (term_id, doc_id, term_freq) acumulando-as em um buffer
+        que é gravado de uma só vez a cada BLOCK_SIZE ocorrências
+    """
+    def __init__(self, idx_file, codec:int=CODEC_FIXED):
+        self.idx_file = idx_file
+        self.arr_buffer = []
+        self.count = 0
+        write_header(idx_file, codec)
+
+    def write(self, term_id:int, doc_id:int, term_freq:int):
+        self.arr_buffer.append(term_id)
+        self.arr_buffer.append(doc_id)
+        self.arr_buffer.append(term_freq)
+        self.count += 1
+        if len(self.arr_buffer) >= BLOCK_SIZE*3:
+            self.flush()
+
+    def write_all(self, occurrences:Iterable[Tuple[int,int,int]]):
+        for term_id, doc_id, term_freq in occurrences:
+            self.write(term_id, doc_id, term_freq)
+
+    def flush(self):
+        if len(self.arr_buffer) > 0:
+            self.idx_file.write(struct.pack(f"<{len(self.arr_buffer)}I", *self.arr_buffer))
+            self.arr_buffer = []
+
+
+def read_occurrences(idx_file) -> Iterator[Tuple[int,int,int]]:
+    """
+        Percorre o arquivo (a partir da posição atual, logo após o cabeçalho)
+        lendo BLOCK_SIZE ocorrências por vez
+    """
+    int_block_bytes = BLOCK_SIZE*OCCURRENCE.size
+    while True:
+        block = idx_file.read(int_block_bytes)
+        if not block:
+            return
+        if len(block) % OCCURRENCE.size != 0:
+            raise ValueError(f"Arquivo de índice truncado: {idx_file.name}")
+        yield from OCCURRENCE.iter_unpack(block)
@@ -0,0 +1,446 @@
+from typing import List, Sequence, Tuple
+from abc import abstractmethod
+from bisect import bisect_left, bisect_right
+import heapq
+from .compression import BLOCK_POSTINGS, decode_skip_data, decode_block
+
+
+class PostingIterator:
+    """
+        Percorre as ocorrências de um termo em ordem crescente de doc_id.
+        Antes da primeira chamada a next/advance, doc_id é -1; ao final, doc_id é None.
+    """
+    def __init__(self, count:int):
+        #quantidade de ocorrências (usada para ordenar os iteradores pelo custo)
+        self.count = count
+        self.doc_id = -1
+
+    def __len__(self):
+        return self.count
+
+    @property
+    @abstractmethod
+    def term_freq(self) -> int:
+        raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
+
+    @abstractmethod
+    def next(self) -> int:
+        """
+            Avança para a próxima ocorrência, retornando seu doc_id (ou None, caso não exista)
+        """
+        raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
+
+    @abstractmethod
+    def advance(self, target:int) -> int:
+        """
+            Avança para a primeira ocorrência com doc_id >= target, retornando seu doc_id
+            (ou None, caso não exista). Nunca retrocede.
+        """
+        raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
+
+    def block_max_doc_id(self) -> int:
+        """
+            Maior doc_id do bloco atual (ou None, ao final). Sem blocos, cada ocorrência é um bloco
+        """
+        return self.doc_id
+
+    def next_block(self, max_doc_id:int) -> Tuple[Sequence[int],Sequence[int]]:
+        """
+            Retorna os doc_ids e as frequências das ocorrências do bloco atual, a partir da atual, com
+            doc_id <= max_doc_id e avança para a ocorrência seguinte a elas
+        """
+        if self.doc_id is None or self.doc_id > max_doc_id:
+            return [], []
+        doc_ids, term_freqs = [self.doc_id], [self.term_freq]
+        self.next()
+        return doc_ids, term_freqs
+
+
+class ArrayPostingIterator(PostingIterator):
+    """
+        Iterador sobre colunas (listas ou memoryviews) de doc_ids e frequências.
+        Como as colunas são indexáveis, advance usa busca exponencial a partir da posição atual.
+    """
+    def __init__(self, doc_ids:Sequence[int], term_freqs:Sequence[int]):
+        super().__init__(len(doc_ids))
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.pos = -1
+
+    @property
+    def term_freq(self) -> int:
+        return self.term_freqs[self.pos]
+
+    def set_position(self, pos:int) -> int:
+        self.pos = pos
+        self.doc_id = self.doc_ids[pos] if pos < self.count else None
+        return self.doc_id
+
+    def next(self) -> int:
+        if self.doc_id is None:
+            return None
+        return self.set_position(self.pos+1)
+
+    def advance(self, target:int) -> int:
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+        #busca exponencial (galloping): dobra o salto até ultrapassar o alvo e, em seguida, faz a
+        #busca binária apenas no último intervalo. O custo depende da distância até o alvo, e não do tamanho da lista
+        int_low = max(self.pos,0)
+        int_step = 1
+        while int_low+int_step < self.count and self.doc_ids[int_low+int_step] < target:
+            int_low += int_step
+            int_step *= 2
+        return self.set_position(bisect_left(self.doc_ids, target, int_low, min(int_low+int_step,self.count)))
+
+    def block_end(self) -> int:
+        #as colunas são divididas em blocos de BLOCK_POSTINGS ocorrências, assim como as ocorrências comprimidas
+        return min((self.pos//BLOCK_POSTINGS+1)*BLOCK_POSTINGS, self.count)
+
+    def block_max_doc_id(self) -> int:
+        if self.doc_id is None:
+            return None
+        return self.doc_ids[self.block_end()-1]
+
+    def next_block(self, max_doc_id:int) -> Tuple[Sequence[int],Sequence[int]]:
+        if self.doc_id is None:
+            return [], []
+        int_start = self.pos
+        int_end = bisect_right(self.doc_ids, max_doc_id, int_start, self.block_end())
+        self.set_position(int_end)
+        return list(self.doc_ids[int_start:int_end]), list(self.term_freqs[int_start:int_end])
+
+
+class BlockPostingIterator(PostingIterator):
+    """
+        Iterador sobre as ocorrências comprimidas (ver compression.py): apenas a tabela
+        de saltos é decodificada inicialmente; cada bloco é decodificado somente quando
+        necessário e advance pula os blocos cujo maior doc_id é menor que o alvo.
+    """
+    def __init__(self, data:bytes, count:int):
+        super().__init__(count)
+        self.data = data
+        self.lst_max_doc_ids, self.lst_block_starts = decode_skip_data(data)
+        self.block = -1
+        self.block_doc_ids = []
+        self.block_term_freqs = []
+        self.pos = -1
+
+    @property
+    def term_freq(self) -> int:
+        return self.block_term_freqs[self.pos]
+
+    def load_block(self, block:int) -> int:
+        self.block = block
+        self.pos = 0
+        if block >= len(self.lst_block_starts):
+            self.doc_id = None
+            return None
+        last_doc_id = self.lst_max_doc_ids[block-1] if block > 0 else 0
+        self.block_doc_ids, self.block_term_freqs, _ = decode_block(self.data, self.lst_block_starts[block], last_doc_id)
+        self.doc_id = self.block_doc_ids[0]
+        return self.doc_id
+
+    def next(self) -> int:
+        if self.doc_id is None:
+            return None
+        if self.pos+1 >= len(self.block_doc_ids):
+            return self.load_block(self.block+1)
+        self.pos += 1
+        self.doc_id = self.block_doc_ids[self.pos]
+        return self.doc_id
+
+    def advance(self, target:int) -> int:
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+        if self.block < 0 or self.lst_max_doc_ids[self.block] < target:
+            #pula todos os blocos em que o maior doc_id é menor que o alvo
+            block = bisect_left(self.lst_max_doc_ids, target, max(self.block,0))
+            if self.load_block(block) is None:
+                return None
+        self.pos = bisect_left(self.block_doc_ids, target, self.pos)
+        self.doc_id = self.block_doc_ids[self.pos]
+        return self.doc_id
+
+    def block_max_doc_id(self) -> int:
+        if self.doc_id is None:
+            return None
+        return self.lst_max_doc_ids[self.block]
+
+    def next_block(self, max_doc_id:int) -> Tuple[Sequence[int],Sequence[int]]:
+        if self.doc_id is None:
+            return [], []
+        int_start = self.pos
+        int_end = bisect_right(self.block_doc_ids, max_doc_id, int_start)
+        doc_ids, term_freqs = self.block_doc_ids[int_start:int_end], self.block_term_freqs[int_start:int_end]
+        if int_end == len(self.block_doc_ids):
+            self.load_block(self.block+1)
+        else:
+            self.pos = int_end
+            self.doc_id = self.block_doc_ids[int_end]
+        return doc_ids, term_freqs
+
+
+class LiveDocsIterator(PostingIterator):
+    """
+        Ignora, durante a iteração, as ocorrências dos documentos removidos (deleted_docs)
+    """
+    def __init__(self, iterator:PostingIterator, deleted_docs):
+        super().__init__(len(iterator))
+        self.iterator = iterator
+        self.deleted_docs = deleted_docs
+
+    @property
+    def term_freq(self) -> int:
+        return self.iterator.term_freq
+
+    def skip_deleted(self, doc_id:int) -> int:
+        while doc_id is not None and doc_id in self.deleted_docs:
+            doc_id = self.iterator.next()
+        self.doc_id = doc_id
+        return doc_id
+
+    def next(self) -> int:
+        return self.skip_deleted(self.iterator.next())
+
+    def advance(self, target:int) -> int:
+        return self.skip_deleted(self.iterator.advance(target))
+
+    def block_max_doc_id(self) -> int:
+        return self.iterator.block_max_doc_id()
+
+    def next_block(self, max_doc_id:int) -> Tuple[Sequence[int],Sequence[int]]:
+        doc_ids, term_freqs = self.iterator.next_block(max_doc_id)
+        self.skip_deleted(self.iterator.doc_id)
+        lst_pairs = [(doc_id,term_freq) for doc_id,term_freq in zip(doc_ids,term_freqs) if doc_id not in self.deleted_docs]
+        return [doc_id for doc_id,_ in lst_pairs], [term_freq for _,term_freq in lst_pairs]
+
+
+class ConjunctionIterator(PostingIterator):
+    """
+        Documentos presentes em todos os iteradores (AND). O iterador de menos ocorrências conduz
+        a busca e os demais apenas avançam (advance) até o seu doc_id; caso algum deles ultrapasse
+        o doc_id, o iterador condutor avança até o novo doc_id (leapfrog).
+        A frequência é a soma das frequências nos iteradores.
+    """
+    def __init__(self, lst_iterators:List[PostingIterator]):
+        self.lst_iterators = sorted(lst_iterators, key=len)
+        #a quantidade de ocorrências (limite superior) é a do menor iterador
+        super().__init__(len(self.lst_iterators[0]) if len(self.lst_iterators) > 0 else 0)
+        if len(self.lst_iterators) == 0:
+            self.doc_id = None
+
+    @property
+    def term_freq(self) -> int:
+        return sum(iterator.term_freq for iterator in self.lst_iterators)
+
+    def align(self, doc_id:int) -> int:
+        lead = self.lst_iterators[0]
+        while doc_id is not None:
+            for iterator in self.lst_iterators[1:]:
+                other_doc_id = iterator.advance(doc_id)
+                if other_doc_id is None:
+                    doc_id = None
+                    break
+                if other_doc_id != doc_id:
+                    doc_id = lead.advance(other_doc_id)
+                    break
+            else:
+                break
+        self.doc_id = doc_id
+        return doc_id
+
+    def next(self) -> int:
+        if self.doc_id is None:
+            return None
+        return self.align(self.lst_iterators[0].next())
+
+    def advance(self, target:int) -> int:
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+        return self.align(self.lst_iterators[0].advance(target))
+
+
+class DisjunctionIterator(PostingIterator):
+    """
+        Documentos presentes em ao menos um dos iteradores (OR), em ordem de doc_id e sem repetições:
+        os iteradores ficam em um heap ordenado pelo doc_id atual de cada um.
+        A frequência é a soma das frequências nos iteradores posicionados no doc_id atual.
+    """
+    def __init__(self, lst_iterators:List[PostingIterator]):
+        #a quantidade de ocorrências (limite superior) é a soma das quantidades
+        super().__init__(sum(len(iterator) for iterator in lst_iterators))
+        self.lst_iterators = lst_iterators
+        #(doc_id, posição do iterador): criado no primeiro next/advance
+        self.lst_heap = None
+
+    @property
+    def term_freq(self) -> int:
+        return sum(self.lst_iterators[i].term_freq for doc_id, i in self.lst_heap if doc_id == self.doc_id)
+
+    def move(self, move_iterator) -> int:
+        """
+            Aplica move_iterator (next ou advance) aos iteradores e atualiza o doc_id atual
+        """
+        if self.lst_heap is None:
+            self.lst_heap = []
+            for i, iterator in enumerate(self.lst_iterators):
+                doc_id = move_iterator(iterator)
+                if doc_id is not None:
+                    self.lst_heap.append((doc_id, i))
+            heapq.heapify(self.lst_heap)
+        self.doc_id = self.lst_heap[0][0] if len(self.lst_heap) > 0 else None
+        return self.doc_id
+
+    def replace_top(self, doc_id:int):
+        if doc_id is None:
+            heapq.heappop(self.lst_heap)
+        else:
+            heapq.heapreplace(self.lst_heap, (doc_id, self.lst_heap[0][1]))
+
+    def next(self) -> int:
+        if self.doc_id is None:
+            return None
+        if self.lst_heap is not None:
+            current_doc_id = self.doc_id
+            while len(self.lst_heap) > 0 and self.lst_heap[0][0] == current_doc_id:
+                self.replace_top(self.lst_iterators[self.lst_heap[0][1]].next())
+        return self.move(lambda iterator: iterator.next())
+
+    def advance(self, target:int) -> int:
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+        if self.lst_heap is not None:
+            while len(self.lst_heap) > 0 and self.lst_heap[0][0] < target:
+                self.replace_top(self.lst_iterators[self.lst_heap[0][1]].advance(target))
+        return self.move(lambda iterator: iterator.advance(target))
+
+
+class ExclusionIterator(PostingIterator):
+    """
+        Documentos do iterador que não estão em nenhum dos iteradores excluídos (AND NOT). Os
+        iteradores excluídos apenas avançam (advance) até cada doc_id candidato: suas ocorrências
+        nunca são percorridas por completo
+    """
+    def __init__(self, iterator:PostingIterator, lst_excluded:List[PostingIterator]):
+        super().__init__(len(iterator))
+        self.iterator = iterator
+        self.lst_excluded = lst_excluded
+
+    @property
+    def term_freq(self) -> int:
+        return self.iterator.term_freq
+
+    def skip_excluded(self, doc_id:int) -> int:
+        while doc_id is not None and any(excluded.advance(doc_id) == doc_id for excluded in self.lst_excluded):
+            doc_id = self.iterator.next()
+        self.doc_id = doc_id
+        return doc_id
+
+    def next(self) -> int:
+        if self.doc_id is None:
+            return None
+        return self.skip_excluded(self.iterator.next())
+
+    def advance(self, target:int) -> int:
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+        return self.skip_excluded(self.iterator.advance(target))
+
+
+class PositionalIterator(PostingIterator):
+    """
+        Documentos da interseção (ConjunctionIterator) dos termos cujas posições satisfazem a restrição
+        de match_count. As posições (lst_positions: um PositionsIterator por termo, na ordem dos termos)
+        só são decodificadas para os documentos que sobrevivem à interseção.
+        A frequência é a quantidade de ocorrências da restrição no documento
+    """
+    def __init__(self, lst_iterators:List[PostingIterator], lst_positions:List):
+        self.conjunction = ConjunctionIterator(lst_iterators)
+        super().__init__(len(self.conjunction))
+        self.lst_positions = lst_positions
+        self.freq = 0
+
+    @property
+    def term_freq(self) -> int:
+        return self.freq
+
+    @abstractmethod
+    def match_count(self, lst_doc_positions:List[List[int]]) -> int:
+        """
+            Quantidade de ocorrências da restrição, dadas as posições de cada termo no documento
+        """
+        raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
+
+    def skip_mismatches(self, doc_id:int) -> int:
+        while doc_id is not None:
+            self.freq = self.match_count([positions.positions(doc_id) for positions in self.lst_positions])
+            if self.freq > 0:
+                break
+            doc_id = self.conjunction.next()
+        self.doc_id = doc_id
+        return doc_id
+
+    def next(self) -> int:
+        if self.doc_id is None:
+            return None
+        return self.skip_mismatches(self.conjunction.next())
+
+    def advance(self, target:int) -> int:
+        if self.doc_id is None or self.doc_id >= target:
+            return self.doc_id
+        return self.skip_mismatches(self.conjunction.advance(target))
+
+
+class PhraseIterator(PositionalIterator):
+    """
+        Documentos em que os termos ocorrem consecutivamente, na ordem de lst_positions
+    """
+    def match_count(self, lst_doc_positions:List[List[int]]) -> int:
+        #posições iniciais da frase: a posição de cada termo menos o seu deslocamento na frase
+        set_starts = set(lst_doc_positions[0])
+        for offset, positions in enumerate(lst_doc_positions[1:], 1):
+            set_starts.intersection_update(position-offset for position in positions)
+            if len(set_starts) == 0:
+                return 0
+        return len(set_starts)
+
+
+class ProximityIterator(PositionalIterator):
+    """
+        Documentos em que os termos (distintos) ocorrem, em qualquer ordem, com no máximo
+        max_distance palavras entre eles
+    """
+    def __init__(self, lst_iterators:List[PostingIterator], lst_positions:List, max_distance:int):
+        super().__init__(lst_iterators, lst_positions)
+        self.max_distance = max_distance
+
+    def match_count(self, lst_doc_positions:List[List[int]]) -> int:
+        #janela deslizante sobre as posições de todos os termos: para cada posição final, a janela
+        #é reduzida à menor que ainda contém todos os termos. Conta as janelas dentro da distância máxima
+        lst_events = sorted((position, i) for i, positions in enumerate(lst_doc_positions) for position in positions)
+        int_terms = len(lst_doc_positions)
+        lst_counts = [0]*int_terms
+        int_covered = 0
+        int_left = 0
+        int_matches = 0
+        for position, i in lst_events:
+            if lst_counts[i] == 0:
+                int_covered += 1
+            lst_counts[i] += 1
+            while lst_counts[lst_events[int_left][1]] > 1:
+                lst_counts[lst_events[int_left][1]] -= 1
+                int_left += 1
+            if int_covered == int_terms and position-lst_events[int_left][0]-(int_terms-1) <= self.max_distance:
+                int_matches += 1
+        return int_matches
+
+
+def iterate_doc_ids(iterator:PostingIterator):
+    """
+        Gera (sob demanda) os doc_ids do iterador
+    """
+    doc_id = iterator.next()
+    while doc_id is not None:
+        yield doc_id
+        doc_id = iterator.next()
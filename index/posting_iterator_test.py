@@ -0,0 +1,135 @@
+from .structure import *
+from .compression import encode_postings, BLOCK_POSTINGS
+from .posting_iterator import ArrayPostingIterator, BlockPostingIterator, ConjunctionIterator, DisjunctionIterator, ExclusionIterator, LiveDocsIterator, iterate_doc_ids
+from .reader import posting_iterator
+import unittest
+
+
+class PostingIteratorTest(unittest.TestCase):
+    def setUp(self):
+        self.doc_ids = [i*7+1 for i in range(3*BLOCK_POSTINGS+10)]
+        self.term_freqs = [i%9+1 for i in range(len(self.doc_ids))]
+
+    def create_iterators(self):
+        data = bytes(encode_postings(self.doc_ids, self.term_freqs))
+        return [ArrayPostingIterator(self.doc_ids, self.term_freqs),
+                BlockPostingIterator(data, len(self.doc_ids))]
+
+    def test_next(self):
+        for iterator in self.create_iterators():
+            lst_resp = []
+            doc_id = iterator.next()
+            while doc_id is not None:
+                lst_resp.append((doc_id, iterator.term_freq))
+                doc_id = iterator.next()
+            self.assertListEqual(lst_resp, list(zip(self.doc_ids, self.term_freqs)))
+            self.assertIsNone(iterator.next())
+
+    def test_advance(self):
+        for iterator in self.create_iterators():
+            #alvo existente, alvo entre dois doc_ids, alvo anterior ao atual e alvo no último bloco
+            self.assertEqual(iterator.advance(8), 8)
+            self.assertEqual(iterator.term_freq, 2)
+            self.assertEqual(iterator.advance(10), 15)
+            self.assertEqual(iterator.advance(3), 15)
+            self.assertEqual(iterator.advance(self.doc_ids[-3]-2), self.doc_ids[-3])
+            self.assertEqual(iterator.next(), self.doc_ids[-2])
+            self.assertIsNone(iterator.advance(self.doc_ids[-1]+1))
+
+    def test_skip_blocks(self):
+        iterator = self.create_iterators()[1]
+        iterator.advance(self.doc_ids[-1])
+        self.assertEqual(iterator.block, 3, "O iterador deveria ter pulado diretamente para o último bloco")
+
+    def test_next_block(self):
+        #a leitura em blocos (até o fim do bloco atual) deve retornar as mesmas ocorrências da leitura com next
+        lst_iterators = self.create_iterators()+[LiveDocsIterator(iterator, {8,15,self.doc_ids[-1]}) for iterator in self.create_iterators()]
+        for iterator in lst_iterators:
+            lst_expected = list(zip(self.doc_ids, self.term_freqs))
+            if isinstance(iterator, LiveDocsIterator):
+                lst_expected = [(doc_id, term_freq) for doc_id, term_freq in lst_expected if doc_id not in iterator.deleted_docs]
+            lst_resp = []
+            iterator.next()
+            while iterator.doc_id is not None:
+                block_max_doc_id = iterator.block_max_doc_id()
+                self.assertGreaterEqual(block_max_doc_id, iterator.doc_id)
+                #metade do bloco e, em seguida, o restante
+                doc_ids, term_freqs = iterator.next_block((iterator.doc_id+block_max_doc_id)//2)
+                lst_resp.extend(zip(doc_ids, term_freqs))
+                doc_ids, term_freqs = iterator.next_block(block_max_doc_id)
+                lst_resp.extend(zip(doc_ids, term_freqs))
+            self.assertListEqual(lst_resp, lst_expected)
+            self.assertTupleEqual(iterator.next_block(self.doc_ids[-1]), ([], []))
+
+    def test_posting_iterator(self):
+        #listas fora de ordem de doc_id são ordenadas
+        iterator = posting_iterator([TermOccurrence(5,1,2),TermOccurrence(2,1,1)])
+        self.assertEqual(iterator.next(), 2)
+        self.assertEqual(iterator.term_freq, 1)
+        self.assertEqual(iterator.next(), 5)
+        self.assertIsNone(iterator.next())
+
+    def test_compact_posting_list(self):
+        #doc_ids adicionados fora de ordem são ordenados (junto às frequências) antes da iteração
+        index = CompactHashIndex()
+        for doc_id in [7,3,9,1]:
+            index.index("casa",doc_id,doc_id+1)
+        for doc_id in [1,9,7]:
+            index.index("verde",doc_id,1)
+        iterator = posting_iterator(index.get_occurrence_list("casa"))
+        self.assertListEqual(list(iterate_doc_ids(iterator)), [1,3,7,9])
+        self.assertListEqual(list(index.get_occurrence_list("casa").term_freqs), [2,4,8,10])
+        conjunction = ConjunctionIterator([posting_iterator(index.get_occurrence_list(term)) for term in ["casa","verde"]])
+        self.assertListEqual(list(iterate_doc_ids(conjunction)), [1,7,9])
+
+    def test_galloping_advance(self):
+        #saltos curtos e longos devem chegar ao mesmo doc_id da busca linear
+        iterator = ArrayPostingIterator(self.doc_ids, self.term_freqs)
+        for target in [1,2,9,9,100,101,1000,self.doc_ids[-1]]:
+            expected = next(doc_id for doc_id in self.doc_ids if doc_id >= target)
+            self.assertEqual(iterator.advance(target), max(expected, iterator.doc_id))
+        self.assertIsNone(iterator.advance(self.doc_ids[-1]+1))
+
+    def test_conjunction_disjunction(self):
+        lst_lists = [list(range(0,3000,2)), list(range(0,3000,3)), list(range(0,3000,5)), [30,60,61,90,2970]]
+        def iterators():
+            data = bytes(encode_postings(lst_lists[0], [1]*len(lst_lists[0])))
+            return [BlockPostingIterator(data, len(lst_lists[0]))]+[ArrayPostingIterator(lst, [1]*len(lst)) for lst in lst_lists[1:]]
+
+        #interseção de 3 ou mais listas
+        self.assertListEqual(list(iterate_doc_ids(ConjunctionIterator(iterators()[:3]))), list(range(0,3000,30)))
+        self.assertListEqual(list(iterate_doc_ids(ConjunctionIterator(iterators()))), [30,60,90,2970])
+        conjunction = ConjunctionIterator(iterators()[:3])
+        self.assertEqual(conjunction.advance(31), 60)
+        self.assertEqual(conjunction.term_freq, 3)
+
+        #união em ordem de doc_id, sem repetições
+        set_union = set().union(*lst_lists)
+        self.assertListEqual(list(iterate_doc_ids(DisjunctionIterator(iterators()))), sorted(set_union))
+        disjunction = DisjunctionIterator(iterators())
+        self.assertEqual(disjunction.advance(59), 60)
+        self.assertEqual(disjunction.term_freq, 4)
+        self.assertEqual(disjunction.next(), 61)
+        self.assertEqual(disjunction.term_freq, 1)
+        self.assertIsNone(disjunction.advance(3000))
+
+        #combinação dos iteradores (AND de um OR)
+        iterator = ConjunctionIterator([DisjunctionIterator(iterators()[2:]), ArrayPostingIterator(lst_lists[1], [1]*len(lst_lists[1]))])
+        self.assertListEqual(list(iterate_doc_ids(iterator)), sorted(set(lst_lists[1]) & (set(lst_lists[2]) | set(lst_lists[3]))))
+
+    def test_exclusion(self):
+        #a lista excluída só é decodificada nos blocos que podem conter os candidatos
+        lst_loaded_blocks = []
+        class BlockCounterIterator(BlockPostingIterator):
+            def load_block(self, block:int) -> int:
+                lst_loaded_blocks.append(block)
+                return super().load_block(block)
+        data = bytes(encode_postings(self.doc_ids, self.term_freqs))
+        lst_candidates = [3, 8, 9, self.doc_ids[-1], self.doc_ids[-1]+5]
+        iterator = ExclusionIterator(ArrayPostingIterator(lst_candidates, [1]*len(lst_candidates)),
+                                     [BlockCounterIterator(data, len(self.doc_ids))])
+        self.assertListEqual(list(iterate_doc_ids(iterator)), [3, 9, self.doc_ids[-1]+5])
+        self.assertListEqual(lst_loaded_blocks, [0, 3, 4])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,257 @@
+from typing import List, Sequence, Tuple
+from array import array
+import mmap
+import sys
+from .structure import Index, FileIndex, TermOccurrence
+from .posting_file import HEADER, OCCURRENCE, CODEC_VBYTE, read_header
+from .compression import decode_postings
+from .positions import PositionsIterator
+from .posting_iterator import PostingIterator, ArrayPostingIterator, BlockPostingIterator, LiveDocsIterator
+from util.bitset import BitSet
+
+
+class PostingView:
+    """
+        Ocorrências de um termo diretamente sobre a região do arquivo mapeada em memória.
+        Nenhuma cópia é feita: doc_ids e term_freqs são fatias (memoryview) do próprio mapeamento.
+        Objetos TermOccurrence só são criados caso a visão seja iterada.
+
+        Caso existam documentos removidos (deleted_docs), as colunas passam a ser listas
+        apenas com os documentos válidos e o iterador ignora os removidos.
+    """
+    def __init__(self, term_id:int, buffer:memoryview, deleted_docs:BitSet=None):
+        self.term_id = term_id
+        #cada ocorrência ocupa três inteiros: term_id, doc_id, term_freq
+        self.buffer = buffer
+        self.deleted_docs = deleted_docs if deleted_docs else None
+        self.live_columns = None
+
+    def all_columns(self) -> Tuple[Sequence[int],Sequence[int]]:
+        """
+            Colunas com todas as ocorrências, inclusive as de documentos removidos
+        """
+        return self.buffer[1::3], self.buffer[2::3]
+
+    def all_iterator(self) -> PostingIterator:
+        return ArrayPostingIterator(*self.all_columns())
+
+    def columns(self) -> Tuple[Sequence[int],Sequence[int]]:
+        if self.live_columns is None:
+            if self.deleted_docs is None:
+                self.live_columns = self.all_columns()
+            else:
+                lst_pairs = [(doc_id,term_freq) for doc_id,term_freq in zip(*self.all_columns())
+                                    if doc_id not in self.deleted_docs]
+                self.live_columns = [doc_id for doc_id,_ in lst_pairs], [term_freq for _,term_freq in lst_pairs]
+        return self.live_columns
+
+    @property
+    def doc_ids(self) -> Sequence[int]:
+        return self.columns()[0]
+
+    @property
+    def term_freqs(self) -> Sequence[int]:
+        return self.columns()[1]
+
+    def release(self):
+        #as colunas guardadas também são fatias do mapeamento
+        if self.live_columns is not None and self.deleted_docs is None:
+            for column in self.live_columns:
+                column.release()
+        self.live_columns = None
+        self.buffer.release()
+
+    def iterator(self) -> PostingIterator:
+        if self.deleted_docs is None:
+            return self.all_iterator()
+        return LiveDocsIterator(self.all_iterator(), self.deleted_docs)
+
+    def __len__(self):
+        if self.deleted_docs is None:
+            return len(self.buffer)//3
+        return len(self.doc_ids)
+
+    def __getitem__(self, i:int) -> TermOccurrence:
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError(i)
+        return TermOccurrence(self.doc_ids[i], self.term_id, self.term_freqs[i])
+
+    def __iter__(self):
+        for doc_id, term_freq in zip(self.doc_ids, self.term_freqs):
+            yield TermOccurrence(doc_id, self.term_id, term_freq)
+
+    def __str__(self):
+        return str(list(self))
+
+    def __repr__(self):
+        return str(self)
+
+
+class CompressedPostingView(PostingView):
+    """
+        Ocorrências comprimidas (CODEC_VBYTE) de um termo, decodificadas uma única vez
+        e somente quando os doc_ids ou as frequências forem acessados
+    """
+    def __init__(self, term_id:int, data:bytes, count:int, deleted_docs:BitSet=None):
+        self.term_id = term_id
+        self.data = data
+        self.count = count
+        self.deleted_docs = deleted_docs if deleted_docs else None
+        self.live_columns = None
+        self.decoded_columns = None
+
+    def all_columns(self) -> Tuple[Sequence[int],Sequence[int]]:
+        if self.decoded_columns is None:
+            self.decoded_columns = decode_postings(self.data)
+        return self.decoded_columns
+
+    def all_iterator(self) -> PostingIterator:
+        #caso as ocorrências ainda não tenham sido decodificadas, só decodifica os blocos necessários
+        if self.decoded_columns is None:
+            return BlockPostingIterator(self.data, self.count)
+        return ArrayPostingIterator(*self.decoded_columns)
+
+    def release(self):
+        pass
+
+    def __len__(self):
+        if self.deleted_docs is None:
+            return self.count
+        return len(self.doc_ids)
+
+
+def posting_columns(occurrences) -> Tuple[Sequence[int],Sequence[int]]:
+    """
+        Retorna os doc_ids e as frequências de uma lista de ocorrências, seja ela uma
+        lista de TermOccurrence ou uma visão das ocorrências no arquivo mapeado
+    """
+    if hasattr(occurrences, "doc_ids"):
+        return occurrences.doc_ids, occurrences.term_freqs
+    return [occur.doc_id for occur in occurrences], [occur.term_freq for occur in occurrences]
+
+
+def posting_iterator(occurrences) -> PostingIterator:
+    """
+        Retorna um iterador (em ordem de doc_id) sobre uma lista de ocorrências ou sobre
+        uma visão das ocorrências no arquivo mapeado
+    """
+    if hasattr(occurrences, "iterator"):
+        return occurrences.iterator()
+    doc_ids, term_freqs = posting_columns(occurrences)
+    if any(doc_ids[i] > doc_ids[i+1] for i in range(len(doc_ids)-1)):
+        lst_pairs = sorted(zip(doc_ids, term_freqs))
+        doc_ids = [doc_id for doc_id,_ in lst_pairs]
+        term_freqs = [term_freq for _,term_freq in lst_pairs]
+    return ArrayPostingIterator(doc_ids, term_freqs)
+
+
+class FileIndexReader(Index):
+    """
+        Leitor (somente leitura) de um FileIndex finalizado que mapeia o arquivo de
+        ocorrências em memória (mmap). Assim, vários processos compartilham a mesma cópia do
+        índice no cache de páginas do sistema operacional.
+
+        As visões retornadas por get_occurrence_list devem ser liberadas antes de close().
+    """
+    def __init__(self, file_index:FileIndex):
+        super().__init__()
+        self.dic_index = file_index.dic_index
+        self.set_documents = file_index.set_documents
+        self.str_idx_file_name = file_index.str_idx_file_name
+        self.deleted_docs = file_index.deleted_docs
+        self.document_stats = file_index.document_stats
+        self.term_stats = file_index.term_stats
+        self.positional = file_index.positional
+        self.positions_table = file_index.positions_table
+
+        self.idx_file = open(self.str_idx_file_name, "rb")
+        self.codec = read_header(self.idx_file)
+        self.mmap_idx = mmap.mmap(self.idx_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view_occurrences = None
+        if self.codec != CODEC_VBYTE:
+            if sys.byteorder == "little":
+                #os registros estão em little-endian: o cast (na ordem de bytes nativa) não faz cópias
+                self.view_occurrences = memoryview(self.mmap_idx)[HEADER.size:].cast("I")
+            else:
+                #nas arquiteturas big-endian, os registros são convertidos (em uma cópia) para a ordem nativa
+                arr_occurrences = array("I")
+                arr_occurrences.frombytes(self.mmap_idx[HEADER.size:])
+                arr_occurrences.byteswap()
+                self.view_occurrences = memoryview(arr_occurrences)
+        #o arquivo de posições também é mapeado em memória, mas só é acessado por get_positions
+        self.positions_file = None
+        self.mmap_positions = None
+        if self.positions_table is not None:
+            self.positions_file = open(file_index.str_positions_file_name, "rb")
+            self.mmap_positions = mmap.mmap(self.positions_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def index(self, term:str, doc_id:int, term_freq:int):
+        raise NotImplementedError("O leitor do índice é somente leitura")
+
+    def get_term_id(self, term:str):
+        if term not in self.dic_index:
+            return None
+        return self.dic_index[term].term_id
+
+    def get_occurrence_list(self, term:str) -> List:
+        if term not in self.dic_index:
+            return []
+        obj_term = self.dic_index[term]
+        if not obj_term.doc_count_with_term:
+            return []
+        if self.codec == CODEC_VBYTE:
+            int_start = HEADER.size+obj_term.term_file_start_pos
+            return CompressedPostingView(obj_term.term_id,
+                                         self.mmap_idx[int_start:int_start+obj_term.term_file_byte_count],
+                                         obj_term.doc_count_with_term, self.deleted_docs)
+        int_start = obj_term.term_file_start_pos//OCCURRENCE.size*3
+        int_end = int_start+obj_term.doc_count_with_term*3
+        return PostingView(obj_term.term_id, self.view_occurrences[int_start:int_end], self.deleted_docs)
+
+    def get_positions(self, term:str) -> PositionsIterator:
+        if self.positions_table is None:
+            return None
+        term_range = self.positions_table.term_range(self.dic_index[term].term_id) if term in self.dic_index else None
+        if term_range is None:
+            return PositionsIterator(b"")
+        int_start, int_byte_count = term_range
+        return PositionsIterator(self.mmap_positions[int_start:int_start+int_byte_count])
+
+    def document_count_with_term(self, term:str) -> int:
+        if term not in self.dic_index:
+            return 0
+        return self.dic_index[term].doc_count_with_term or 0
+
+    def purge_deleted(self):
+        raise NotImplementedError("O leitor do índice é somente leitura")
+
+    @staticmethod
+    def release_mapping(mapping):
+        """
+            Libera a visão ou o mapeamento. Caso ainda existam visões em uso (PostingView, suas colunas ou
+            arrays criados a partir delas), elas mantêm o mapeamento, que é desfeito quando a última for descartada
+        """
+        try:
+            if isinstance(mapping, memoryview):
+                mapping.release()
+            else:
+                mapping.close()
+        except BufferError:
+            pass
+
+    def close(self):
+        if self.view_occurrences is not None:
+            FileIndexReader.release_mapping(self.view_occurrences)
+        FileIndexReader.release_mapping(self.mmap_idx)
+        self.idx_file.close()
+        if self.mmap_positions is not None:
+            FileIndexReader.release_mapping(self.mmap_positions)
+            self.positions_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
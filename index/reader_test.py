@@ -0,0 +1,72 @@
+from .structure import *
+from .reader import FileIndexReader, PostingView, posting_columns
+import tempfile
+import unittest
+
+
+class FileIndexReaderTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.index = FileIndex(str_idx_dir=tmp_dir.name)
+        self.index.index("casa",1,10)
+        self.index.index("vermelho",1,3)
+        self.index.index("verde",1,1)
+        self.index.index("vermelho",2,1)
+        self.index.index("vermelho",3,1)
+        self.index.index("casa",2,3)
+        self.index.finish_indexing()
+        self.reader = FileIndexReader(self.index)
+
+    def tearDown(self):
+        self.reader.close()
+
+    def test_get_occurrence_list(self):
+        for term in self.index.vocabulary:
+            view = self.reader.get_occurrence_list(term)
+            self.assertIsInstance(view, PostingView)
+            self.assertIsInstance(view.doc_ids, memoryview, "Os doc_ids deveriam ser uma visão do arquivo mapeado, sem cópia")
+            lst_expected = self.index.get_occurrence_list(term)
+            self.assertListEqual([(o.term_id,o.doc_id,o.term_freq) for o in view],
+                                 [(o.term_id,o.doc_id,o.term_freq) for o in lst_expected])
+            self.assertEqual(len(view),self.reader.document_count_with_term(term))
+            view.release()
+        self.assertListEqual(self.reader.get_occurrence_list("xuxu"),[])
+
+    def test_posting_columns(self):
+        view = self.reader.get_occurrence_list("vermelho")
+        doc_ids, term_freqs = posting_columns(view)
+        self.assertListEqual(doc_ids.tolist(),[1,2,3])
+        self.assertListEqual(term_freqs.tolist(),[3,1,1])
+        view.release()
+
+        doc_ids, term_freqs = posting_columns(self.index.get_occurrence_list("casa"))
+        self.assertListEqual(doc_ids,[1,2])
+        self.assertListEqual(term_freqs,[10,3])
+
+    def test_deleted_docs(self):
+        self.reader.delete_document(2)
+        self.assertEqual(self.reader.document_count,2)
+        view = self.reader.get_occurrence_list("vermelho")
+        self.assertListEqual(list(view.doc_ids),[1,3])
+        self.assertEqual(len(view),2)
+        #a quantidade do léxico (limite superior) inclui os documentos removidos: nenhuma ocorrência é lida
+        self.assertEqual(self.reader.document_count_with_term("casa"),2)
+        self.assertEqual(len(self.reader.get_occurrence_list("casa")),1)
+        #o iterador pula os documentos removidos
+        iterator = view.iterator()
+        self.assertEqual(iterator.advance(2),3)
+        self.assertEqual(iterator.term_freq,1)
+        self.assertIsNone(iterator.next())
+        view.release()
+
+    def test_close_with_views(self):
+        #as visões em uso mantêm o mapeamento após o fechamento do leitor
+        view = self.reader.get_occurrence_list("vermelho")
+        doc_ids, term_freqs = posting_columns(view)
+        self.reader.close()
+        self.assertListEqual(list(view.doc_ids),[1,2,3])
+        self.assertListEqual(list(term_freqs),[3,1,1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,336 @@
+from typing import List, Mapping
+from contextlib import contextmanager
+from os import path
+import os
+import heapq
+import json
+import math
+import shutil
+import tempfile
+import threading
+from util.threads import synchronized
+from util.bitset import BitSet
+from .structure import Index, FileIndex, TermOccurrence
+from .reader import FileIndexReader, posting_columns
+
+
+class Segment:
+    """
+        Segmento imutável do índice: um FileIndex salvo em seu próprio diretório e
+        lido por meio de um FileIndexReader (léxico e ocorrências mapeados em memória,
+        o que permite remover os arquivos mesmo com consultas em andamento).
+        As consultas em andamento são contadas (acquire/release): um segmento substituído
+        por uma intercalação (retire) só é fechado quando a última delas termina
+    """
+    def __init__(self, str_name:str, str_dir:str):
+        self.str_name = str_name
+        self.str_dir = str_dir
+        self.file_index = FileIndex.open(str_dir)
+        self.reader = FileIndexReader(self.file_index)
+        self.int_refs = 0
+        self.bol_retired = False
+        self.refs_lock = threading.Lock()
+
+    def acquire(self):
+        with self.refs_lock:
+            self.int_refs += 1
+
+    def release(self):
+        with self.refs_lock:
+            self.int_refs -= 1
+            if self.int_refs == 0 and self.bol_retired:
+                self.close()
+
+    def retire(self):
+        """
+            Marca o segmento como substituído, fechando-o assim que não existirem consultas em andamento
+        """
+        with self.refs_lock:
+            self.bol_retired = True
+            if self.int_refs == 0:
+                self.close()
+
+    def close(self):
+        self.reader.close()
+        self.file_index.dic_index.close()
+
+    @property
+    def document_count(self) -> int:
+        return self.reader.document_count
+
+    @property
+    def deleted_count(self) -> int:
+        return len(self.reader.deleted_docs)
+
+    def delete_document(self, doc_id:int) -> bool:
+        """
+            Marca o documento como removido no segmento, gravando os documentos removidos.
+            Retorna se o documento pertencia ao segmento
+        """
+        if doc_id not in self.reader.set_documents:
+            return False
+        self.reader.delete_document(doc_id)
+        self.file_index.save_deleted(self.str_dir)
+        return True
+
+    def __str__(self):
+        return f"{self.str_name} ({self.document_count} docs)"
+
+    def __repr__(self):
+        return str(self)
+
+
+class TieredMergePolicy:
+    """
+        Política de intercalação em camadas: os segmentos são agrupados pelo tamanho
+        (a camada de um segmento é log_{segments_per_tier}(docs/min_segment_docs)) e,
+        quando uma camada acumula segments_per_tier segmentos, eles são intercalados
+        em um único segmento da camada seguinte
+    """
+    def __init__(self, segments_per_tier:int=10, min_segment_docs:int=1000):
+        self.segments_per_tier = segments_per_tier
+        self.min_segment_docs = min_segment_docs
+
+    def tier(self, segment:Segment) -> int:
+        int_docs = max(segment.document_count, self.min_segment_docs)
+        return math.floor(math.log(int_docs/self.min_segment_docs, self.segments_per_tier))
+
+    def find_merge(self, lst_segments:List[Segment]) -> List[Segment]:
+        dic_tiers = {}
+        for segment in lst_segments:
+            dic_tiers.setdefault(self.tier(segment), []).append(segment)
+        for int_tier in sorted(dic_tiers.keys()):
+            lst_tier = dic_tiers[int_tier]
+            if len(lst_tier) >= self.segments_per_tier:
+                return sorted(lst_tier, key=lambda segment:segment.document_count)[:self.segments_per_tier]
+        return []
+
+
+class SegmentedIndex(Index):
+    """
+        Índice formado por segmentos imutáveis no diretório str_dir. Os documentos novos ficam
+        em um FileIndex temporário (buffer) até o próximo flush (ou finish_indexing), que o
+        transforma em um novo segmento. Os segmentos pequenos são intercalados, de acordo com
+        a política de intercalação, em uma thread separada, sem interromper as consultas.
+        As consultas são feitas sobre todos os segmentos ativos.
+    """
+    SEGMENTS_FILE = "segments.json"
+
+    def __init__(self, str_dir:str, merge_policy:TieredMergePolicy=None, background_merge:bool=True,
+                        max_buffered_docs:int=None, compressed:bool=False):
+        super().__init__()
+        self.str_dir = str_dir
+        self.merge_policy = merge_policy if merge_policy is not None else TieredMergePolicy()
+        self.background_merge = background_merge
+        self.max_buffered_docs = max_buffered_docs
+        self.compressed = compressed
+
+        self.lst_segments = []
+        self.int_generation = 0
+        self.merge_thread = None
+        self.buffer = None
+        #protege a lista de segmentos contra remoções durante a troca dos segmentos intercalados
+        self.segments_lock = threading.RLock()
+
+        os.makedirs(str_dir, exist_ok=True)
+        str_segments_file = path.join(str_dir, SegmentedIndex.SEGMENTS_FILE)
+        if path.exists(str_segments_file):
+            with open(str_segments_file, "r", encoding="utf-8") as segments_file:
+                dic_segments = json.load(segments_file)
+            self.int_generation = dic_segments["generation"]
+            self.lst_segments = [Segment(str_name, path.join(str_dir, str_name)) for str_name in dic_segments["segments"]]
+            self.update_vocabulary(self.lst_segments)
+
+    def create_buffer(self) -> FileIndex:
+        return FileIndex(compressed=self.compressed, str_idx_dir=tempfile.mkdtemp(prefix="buffer_", dir=self.str_dir))
+
+    @synchronized
+    def next_segment_name(self) -> str:
+        str_name = f"segment_{self.int_generation}"
+        self.int_generation += 1
+        return str_name
+
+    def update_vocabulary(self, lst_segments:List[Segment]):
+        #ids globais dos termos: atribuídos na ordem em que os termos aparecem nos segmentos
+        for segment in lst_segments:
+            for term in segment.reader.vocabulary:
+                if term not in self.dic_index:
+                    self.dic_index[term] = len(self.dic_index)
+            self.set_documents |= segment.reader.set_documents
+
+    def update_segments(self, lst_removed:List[Segment], new_segment:Segment, dic_deleted:Mapping[Segment,BitSet]=None):
+        """
+            Substitui os segmentos removidos pelo novo segmento (a lista de segmentos
+            é substituída por completo, assim as consultas em andamento não são afetadas).
+            dic_deleted possui os documentos removidos de cada segmento no início da intercalação
+        """
+        with self.segments_lock:
+            #apenas os documentos removidos durante a intercalação ainda estão presentes no novo segmento.
+            #Os removidos antes dela não foram copiados e o seu doc_id pode pertencer a uma nova versão do
+            #documento (update_document), que não deve ser removida
+            for segment in lst_removed:
+                set_deleted_before = dic_deleted.get(segment, BitSet()) if dic_deleted is not None else BitSet()
+                for doc_id in segment.reader.deleted_docs:
+                    if doc_id not in set_deleted_before:
+                        new_segment.delete_document(doc_id)
+
+            lst_segments = [segment for segment in self.lst_segments if segment not in lst_removed]
+            lst_segments.append(new_segment)
+            self.update_vocabulary([new_segment])
+            self.lst_segments = lst_segments
+            if len(lst_removed) > 0:
+                self.int_purges += 1
+
+            str_segments_file = path.join(self.str_dir, SegmentedIndex.SEGMENTS_FILE)
+            with open(str_segments_file+".tmp", "w", encoding="utf-8") as segments_file:
+                json.dump({"generation":self.int_generation,
+                           "segments":[segment.str_name for segment in lst_segments]}, segments_file, indent=4)
+            os.replace(str_segments_file+".tmp", str_segments_file)
+            for segment in lst_removed:
+                segment.retire()
+                shutil.rmtree(segment.str_dir)
+
+    def save_segment(self, index:FileIndex) -> Segment:
+        str_name = self.next_segment_name()
+        str_segment_dir = path.join(self.str_dir, str_name)
+        index.save(str_segment_dir)
+        shutil.rmtree(index.str_idx_dir)
+        return Segment(str_name, str_segment_dir)
+
+    def delete_document(self, doc_id:int):
+        """
+            Marca o documento como removido em todos os segmentos que o possuem. As suas
+            ocorrências são ignoradas nas consultas e removidas na próxima intercalação
+        """
+        if self.buffer is not None and doc_id in self.buffer.set_documents:
+            #o buffer não permite remoções: o documento passa a estar em um segmento
+            self.flush()
+        with self.segments_lock:
+            for segment in self.lst_segments:
+                segment.delete_document(doc_id)
+        self.set_documents.discard(doc_id)
+
+    def update_document(self, doc_id:int, dic_term_freq:Mapping[str,int]):
+        self.delete_document(doc_id)
+        self.index_document(doc_id, dic_term_freq)
+
+    def purge_deleted(self):
+        """
+            Intercala os segmentos que possuem documentos removidos, expurgando suas ocorrências
+        """
+        self.wait_merges()
+        lst_merge = [segment for segment in self.lst_segments if segment.deleted_count > 0]
+        if len(lst_merge) > 0:
+            self.merge_segments(lst_merge)
+
+    def document_buffer(self, doc_id:int) -> FileIndex:
+        """
+            Buffer onde o documento doc_id deve ser indexado
+        """
+        if self.buffer is None:
+            self.buffer = self.create_buffer()
+        #o flush automático só acontece ao iniciar um novo documento
+        if self.max_buffered_docs is not None and doc_id not in self.buffer.set_documents \
+                and self.buffer.document_count >= self.max_buffered_docs:
+            self.flush()
+            self.buffer = self.create_buffer()
+        return self.buffer
+
+    def index(self, term:str, doc_id:int, term_freq:int):
+        self.document_buffer(doc_id).index(term, doc_id, term_freq)
+
+    def index_document(self, doc_id:int, dic_term_freq:Mapping[str,int]):
+        self.document_buffer(doc_id).index_document(doc_id, dic_term_freq)
+
+    def flush(self):
+        """
+            Transforma os documentos do buffer em um novo segmento, tornando-os pesquisáveis
+        """
+        if self.buffer is None or self.buffer.document_count == 0:
+            return
+        buffer = self.buffer
+        self.buffer = None
+        buffer.finish_indexing()
+        self.update_segments([], self.save_segment(buffer))
+        self.maybe_merge()
+
+    def finish_indexing(self):
+        self.flush()
+
+    def maybe_merge(self):
+        if self.merge_thread is not None and self.merge_thread.is_alive():
+            return
+        lst_merge = self.merge_policy.find_merge(self.lst_segments)
+        if len(lst_merge) == 0:
+            return
+        if self.background_merge:
+            self.merge_thread = threading.Thread(target=self.merge_segments, args=(lst_merge,), daemon=True)
+            self.merge_thread.start()
+        else:
+            self.merge_segments(lst_merge)
+
+    def merge_segments(self, lst_segments:List[Segment]):
+        """
+            Intercala os segmentos em um novo segmento e, em seguida, verifica se a
+            política de intercalação sugere uma nova intercalação
+        """
+        new_index = FileIndex(compressed=self.compressed, str_idx_dir=tempfile.mkdtemp(prefix="merge_", dir=self.str_dir))
+        with self.segments_lock:
+            dic_deleted = {segment:BitSet(segment.reader.deleted_docs.to_bytes()) for segment in lst_segments}
+        set_terms = set()
+        for segment in lst_segments:
+            set_terms.update(segment.reader.vocabulary)
+        for term in sorted(set_terms):
+            for doc_id, term_freq in self.merged_postings(lst_segments, term):
+                new_index.index(term, doc_id, term_freq)
+        new_index.finish_indexing()
+        self.update_segments(lst_segments, self.save_segment(new_index), dic_deleted)
+
+        lst_merge = self.merge_policy.find_merge(self.lst_segments)
+        if len(lst_merge) > 0:
+            self.merge_segments(lst_merge)
+
+    def wait_merges(self):
+        if self.merge_thread is not None:
+            self.merge_thread.join()
+
+    @contextmanager
+    def active_segments(self):
+        """
+            Segmentos ativos no início da consulta: eles só são fechados (caso sejam substituídos
+            por uma intercalação) após o fim da consulta
+        """
+        with self.segments_lock:
+            lst_segments = self.lst_segments
+            for segment in lst_segments:
+                segment.acquire()
+        try:
+            yield lst_segments
+        finally:
+            for segment in lst_segments:
+                segment.release()
+
+    def merged_postings(self, lst_segments:List[Segment], term:str):
+        """
+            Intercala, em ordem de doc_id, os pares (doc_id, term_freq) do termo em todos os segmentos
+        """
+        lst_postings = []
+        for segment in lst_segments:
+            occurrences = segment.reader.get_occurrence_list(term)
+            if len(occurrences) > 0:
+                lst_postings.append(zip(*posting_columns(occurrences)))
+        return heapq.merge(*lst_postings)
+
+    def get_term_id(self, term:str):
+        return self.dic_index.get(term)
+
+    def get_occurrence_list(self, term:str) -> List:
+        if term not in self.dic_index:
+            return []
+        term_id = self.dic_index[term]
+        with self.active_segments() as lst_segments:
+            return [TermOccurrence(doc_id, term_id, term_freq) for doc_id, term_freq in self.merged_postings(lst_segments, term)]
+
+    def document_count_with_term(self, term:str) -> int:
+        with self.active_segments() as lst_segments:
+            return sum(segment.reader.document_count_with_term(term) for segment in lst_segments)
@@ -0,0 +1,130 @@
+from .structure import *
+from .segments import SegmentedIndex, TieredMergePolicy
+import os
+import tempfile
+import unittest
+
+
+class SegmentedIndexTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.str_dir = tmp_dir.name
+        self.expected_index = HashIndex()
+
+    def index_docs(self, index, doc_ids):
+        for doc_id in doc_ids:
+            for term in ["casa","verde","prédio","amarelo"][doc_id%4:]:
+                index.index(term,doc_id,doc_id%3+1)
+                self.expected_index.index(term,doc_id,doc_id%3+1)
+
+    def check_index(self, index):
+        self.assertSetEqual(index.set_documents,self.expected_index.set_documents)
+        for term in self.expected_index.vocabulary:
+            self.assertListEqual([(o.doc_id,o.term_freq) for o in index.get_occurrence_list(term)],
+                                 sorted((o.doc_id,o.term_freq) for o in self.expected_index.get_occurrence_list(term)))
+            if sum(segment.deleted_count for segment in index.lst_segments) == 0:
+                self.assertEqual(index.document_count_with_term(term),self.expected_index.document_count_with_term(term))
+            else:
+                #limite superior: os documentos removidos são contados até a intercalação
+                self.assertGreaterEqual(index.document_count_with_term(term),self.expected_index.document_count_with_term(term))
+            self.assertIsNotNone(index.get_term_id(term))
+        self.assertListEqual(index.get_occurrence_list("xuxu"),[])
+
+    def test_flush(self):
+        index = SegmentedIndex(self.str_dir,background_merge=False)
+        self.index_docs(index,range(1,20))
+        #documentos no buffer ainda não são pesquisáveis
+        self.assertListEqual(index.get_occurrence_list("amarelo"),[])
+        index.flush()
+        self.index_docs(index,range(20,30))
+        index.finish_indexing()
+        self.assertEqual(len(index.lst_segments),2)
+        self.check_index(index)
+
+        #o índice é reaberto a partir dos segmentos salvos
+        self.check_index(SegmentedIndex(self.str_dir))
+
+    def test_merge_policy(self):
+        policy = TieredMergePolicy(segments_per_tier=3,min_segment_docs=5)
+        index = SegmentedIndex(self.str_dir,merge_policy=policy,background_merge=False,max_buffered_docs=5)
+        self.index_docs(index,range(1,46))
+        index.flush()
+        #9 segmentos de 5 documentos: três intercalações na primeira camada e uma na segunda
+        self.assertEqual(len(index.lst_segments),1)
+        self.assertEqual(index.lst_segments[0].document_count,45)
+        self.check_index(index)
+        self.assertListEqual(sorted(os.listdir(self.str_dir)),[index.lst_segments[0].str_name,SegmentedIndex.SEGMENTS_FILE])
+
+    def test_background_merge(self):
+        policy = TieredMergePolicy(segments_per_tier=2,min_segment_docs=4)
+        index = SegmentedIndex(self.str_dir,merge_policy=policy,max_buffered_docs=4)
+        self.index_docs(index,range(1,33))
+        index.flush()
+        index.wait_merges()
+        self.check_index(index)
+
+    def test_delete_update(self):
+        policy = TieredMergePolicy(segments_per_tier=10,min_segment_docs=5)
+        index = SegmentedIndex(self.str_dir,merge_policy=policy,background_merge=False,max_buffered_docs=5)
+        self.index_docs(index,range(1,16))
+        index.flush()
+        for doc_id in [2,7,15]:
+            index.delete_document(doc_id)
+            self.expected_index.delete_document(doc_id)
+        index.update_document(4,{"casa":5,"azul":2})
+        self.expected_index.update_document(4,{"casa":5,"azul":2})
+        index.flush()
+        self.assertEqual(index.document_count,12)
+        self.check_index(index)
+
+        #os documentos removidos são persistidos em cada segmento
+        self.check_index(SegmentedIndex(self.str_dir))
+
+        #a intercalação expurga as ocorrências dos documentos removidos (e os valores pré-calculados são refeitos)
+        int_purges = index.int_purges
+        index.purge_deleted()
+        self.assertEqual(index.int_purges,int_purges+1)
+        #os três segmentos com remoções são intercalados; o segmento com o doc. 4 atualizado é mantido
+        self.assertListEqual([segment.deleted_count for segment in index.lst_segments],[0,0])
+        self.assertEqual(sum(segment.reader.dic_index["casa"].doc_count_with_term for segment in index.lst_segments),
+                         self.expected_index.document_count_with_term("casa"))
+        self.check_index(index)
+        self.expected_index.purge_deleted()
+        self.check_index(index)
+
+    def test_update_merge(self):
+        #a nova versão de um documento atualizado não pode ser removida pela intercalação do segmento antigo
+        policy = TieredMergePolicy(segments_per_tier=2,min_segment_docs=5)
+        index = SegmentedIndex(self.str_dir,merge_policy=policy,background_merge=False)
+        for doc_id in [1,2]:
+            index.index("casa",doc_id,1)
+            self.expected_index.index("casa",doc_id,1)
+        index.flush()
+        index.update_document(1,{"casa":7,"azul":1})
+        self.expected_index.update_document(1,{"casa":7,"azul":1})
+        index.flush()
+        self.assertEqual(len(index.lst_segments),1)
+        self.check_index(index)
+        self.assertListEqual([(o.doc_id,o.term_freq) for o in index.get_occurrence_list("azul")],[(1,1)])
+
+    def test_retired_segments(self):
+        policy = TieredMergePolicy(segments_per_tier=2,min_segment_docs=5)
+        index = SegmentedIndex(self.str_dir,merge_policy=policy,background_merge=False,max_buffered_docs=5)
+        self.index_docs(index,range(1,6))
+        index.flush()
+        #uma consulta em andamento mantém o segmento aberto durante a intercalação
+        with index.active_segments() as lst_segments:
+            old_segment = lst_segments[0]
+            self.index_docs(index,range(6,11))
+            index.flush()
+            self.assertNotIn(old_segment,index.lst_segments)
+            self.assertListEqual([o.doc_id for o in old_segment.reader.get_occurrence_list("casa")],[4])
+            self.assertFalse(old_segment.reader.mmap_idx.closed)
+        #o segmento substituído é fechado ao fim da consulta
+        self.assertTrue(old_segment.reader.mmap_idx.closed)
+        self.assertFalse(index.lst_segments[0].reader.mmap_idx.closed)
+        self.check_index(index)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,21 +1,46 @@
 
-from typing import List, Set, Union
+from typing import Iterable, List, Mapping, Set, Tuple, Union
 from abc import abstractmethod
 from functools import total_ordering
 from os import path
 import os
-import pickle
+from operator import attrgetter, itemgetter
+from itertools import groupby, compress
+from array import array
+import heapq
 import gc
+import json
+import math
+import shutil
+from .posting_file import HEADER, OCCURRENCE, CODEC_FIXED, CODEC_VBYTE, OccurrenceWriter, \
+                            write_header, read_header, read_occurrences
+from .compression import encode_postings, decode_postings
+from .posting_iterator import ArrayPostingIterator
+from .lexicon import Lexicon, write_lexicon
+from .document_table import DocumentStats, TermStats, write_documents, read_documents
+from .positions import PositionsTable, PositionsWriter, PositionsIterator, encode_positions, \
+                        PositionsRunWriter, read_positions_run
+from util.bitset import BitSet
 
 class Index:
     def __init__(self):
         self.dic_index = {}
         self.set_documents = set()
+        #documentos removidos: suas ocorrências são ignoradas até serem expurgadas (purge_deleted)
+        self.deleted_docs = BitSet()
+        #documentos atualizados desde o último purge_deleted (doc_id -> termos do novo conteúdo): as ocorrências
+        #da versão anterior nas listas dos demais termos são ignoradas até serem expurgadas
+        self.dic_updated_docs = {}
+        #quantidade de expurgos das ocorrências removidas (purge_deleted ou intercalação de segmentos)
+        self.int_purges = 0
+        #índices posicionais armazenam também as posições de cada termo nos documentos (ver get_positions)
+        self.positional = False
+        self.int_next_term_id = 0
 
     def index(self, term:str, doc_id:int, term_freq:int):
         int_term_id = 0
         if term not in self.dic_index:
-            int_term_id = len(self.dic_index)
+            int_term_id = self.next_term_id()
             self.dic_index[term] = self.create_index_entry(int_term_id)
         else:
             int_term_id = self.get_term_id(term)
@@ -25,6 +50,27 @@ class Index:
             self.set_documents.add(doc_id)
 
 
+    def next_term_id(self) -> int:
+        #os termos sem ocorrências são removidos em purge_deleted: seus ids não são reutilizados
+        int_term_id = self.int_next_term_id
+        self.int_next_term_id += 1
+        return int_term_id
+
+    def index_document(self, doc_id:int, dic_term_freq:Mapping[str,int]):
+        """
+            Indexa, de uma só vez, todos os termos do documento (dic_term_freq: termo -> frequência).
+            As subclasses sobrepõem este método para evitar o custo de uma chamada a index por termo
+        """
+        for term, term_freq in dic_term_freq.items():
+            self.index(term, doc_id, term_freq)
+
+    def index_documents(self, documents:Iterable[Tuple[int,Mapping[str,int]]]):
+        """
+            Indexa os documentos (pares doc_id, dic_term_freq) por meio de index_document
+        """
+        for doc_id, dic_term_freq in documents:
+            self.index_document(doc_id, dic_term_freq)
+
     @property
     def vocabulary(self) -> List:
         return self.dic_index.keys()
@@ -52,11 +98,70 @@ class Index:
 
     @abstractmethod
     def document_count_with_term(self,term:str) -> int:
-         raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
+        """
+            Quantidade de documentos que possuem o termo. Nos índices em disco, é a quantidade gravada no
+            léxico: um limite superior que inclui os documentos removidos até que as suas ocorrências sejam
+            expurgadas (na intercalação de segmentos), assim nenhuma ocorrência precisa ser lida
+        """
+        raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
+
+    def get_positions(self, term:str):
+        """
+            Iterador sobre as posições do termo em cada documento, em ordem de doc_id
+            (None, caso o índice não armazene as posições)
+        """
+        return None
 
     def finish_indexing(self):
         pass
 
+    def delete_document(self, doc_id:int):
+        """
+            Remove o documento: ele é apenas marcado como removido (deleted_docs) e
+            suas ocorrências deixam de ser retornadas, sem alterar as listas de ocorrências
+        """
+        if doc_id in self.set_documents:
+            self.deleted_docs.add(doc_id)
+            self.set_documents.discard(doc_id)
+            self.dic_updated_docs.pop(doc_id, None)
+
+    def update_document(self, doc_id:int, dic_term_freq:Mapping[str,int]):
+        """
+            Substitui as ocorrências do documento pelas frequências dic_term_freq (termo -> frequência).
+            Apenas as listas dos termos do novo conteúdo são alteradas (replace_occurrence); nas listas dos
+            demais termos, as ocorrências da versão anterior são ignoradas (ver stale_docs) até o próximo purge_deleted
+        """
+        if len(dic_term_freq) == 0:
+            self.delete_document(doc_id)
+            return
+        self.deleted_docs.discard(doc_id)
+        self.dic_updated_docs[doc_id] = frozenset(dic_term_freq)
+        for term, term_freq in dic_term_freq.items():
+            self.replace_occurrence(term, doc_id, term_freq)
+        self.set_documents.add(doc_id)
+
+    def replace_occurrence(self, term:str, doc_id:int, term_freq:int):
+        """
+            Substitui a frequência do termo no documento doc_id (ou adiciona a ocorrência, caso ela não exista)
+        """
+        raise NotImplementedError(f"{type(self).__name__} não permite atualizar documentos")
+
+    def stale_docs(self, term:str) -> Set[int]:
+        """
+            Documentos atualizados cujo novo conteúdo não possui o termo: as suas ocorrências na lista
+            do termo são da versão anterior do documento
+        """
+        return {doc_id for doc_id, set_terms in self.dic_updated_docs.items() if term not in set_terms}
+
+    @abstractmethod
+    def purge_deleted(self):
+        """
+            Remove, das listas de ocorrências, as ocorrências dos documentos removidos e as das versões
+            anteriores dos documentos atualizados. Percorre todas as listas: deve ser chamado após um lote de
+            remoções e atualizações, e não a cada uma delas
+        """
+        raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
+
     def __str__(self):
         arr_index = []
         for str_term in self.vocabulary:
@@ -69,14 +174,16 @@ class Index:
 
 @total_ordering
 class TermOccurrence:
+    __slots__ = ("doc_id","term_id","term_freq")
+
     def __init__(self,doc_id:int,term_id:int, term_freq:int):
         self.doc_id = doc_id
         self.term_id = term_id
         self.term_freq = term_freq
 
     def write(self, idx_file):
-        pickle.dump(self,idx_file)
-       
+        idx_file.write(OCCURRENCE.pack(self.term_id,self.doc_id,self.term_freq))
+
 
     def __hash__(self):
     	return hash((self.doc_id,self.term_id))
@@ -113,27 +220,196 @@ class HashIndex(Index):
     def add_index_occur(self, entry_dic_index:List[TermOccurrence], doc_id:int, term_id:int, term_freq:int):
         entry_dic_index.append(TermOccurrence(doc_id,term_id,term_freq))
 
+    def index_document(self, doc_id:int, dic_term_freq:Mapping[str,int]):
+        dic_index = self.dic_index
+        for term, term_freq in dic_term_freq.items():
+            lst_occurrences = dic_index.get(term)
+            if lst_occurrences is None:
+                dic_index[term] = [TermOccurrence(doc_id,self.next_term_id(),term_freq)]
+            else:
+                lst_occurrences.append(TermOccurrence(doc_id,lst_occurrences[0].term_id,term_freq))
+        if len(dic_term_freq) > 0:
+            self.set_documents.add(doc_id)
+
+    def replace_occurrence(self, term:str, doc_id:int, term_freq:int):
+        lst_occurrences = self.dic_index.get(term)
+        if lst_occurrences is None:
+            self.index(term, doc_id, term_freq)
+            return
+        for i, occur in enumerate(lst_occurrences):
+            if occur.doc_id == doc_id:
+                lst_occurrences[i] = TermOccurrence(doc_id, occur.term_id, term_freq)
+                return
+        lst_occurrences.append(TermOccurrence(doc_id, lst_occurrences[0].term_id, term_freq))
+
     def get_occurrence_list(self,term: str)->List:
         if term in self.dic_index:
+            set_stale = self.stale_docs(term) if self.dic_updated_docs else None
+            if self.deleted_docs or set_stale:
+                deleted_docs = self.deleted_docs
+                return [occur for occur in self.dic_index[term]
+                            if occur.doc_id not in deleted_docs and not (set_stale and occur.doc_id in set_stale)]
             return self.dic_index[term]
         return []
 
     def document_count_with_term(self,term:str) -> int:
         if term in self.dic_index:
-            return len(self.dic_index[term])
+            return len(self.get_occurrence_list(term))
         return 0
 
+    def purge_deleted(self):
+        if not self.deleted_docs and not self.dic_updated_docs:
+            return
+        for term in list(self.dic_index.keys()):
+            lst_occurrences = self.get_occurrence_list(term)
+            if len(lst_occurrences) == 0:
+                del self.dic_index[term]
+            else:
+                self.dic_index[term] = lst_occurrences
+        self.deleted_docs.clear()
+        self.dic_updated_docs.clear()
+        self.int_purges += 1
+
+
+class CompactPostingList:
+    """
+        Ocorrências de um termo armazenadas em duas colunas de inteiros (array('I')):
+        cerca de 8 bytes por ocorrência. Objetos TermOccurrence só são criados quando a
+        lista é iterada ou indexada.
+    """
+    __slots__ = ("term_id","doc_ids","term_freqs","is_sorted")
+
+    def __init__(self, term_id:int):
+        self.term_id = term_id
+        self.doc_ids = array("I")
+        self.term_freqs = array("I")
+        #se os doc_ids foram adicionados em ordem crescente
+        self.is_sorted = True
+
+    def append(self, doc_id:int, term_freq:int):
+        if len(self.doc_ids) > 0 and doc_id < self.doc_ids[-1]:
+            self.is_sorted = False
+        self.doc_ids.append(doc_id)
+        self.term_freqs.append(term_freq)
+
+    def sort(self):
+        """
+            Ordena as colunas (em conjunto) por doc_id
+        """
+        if not self.is_sorted:
+            lst_pairs = sorted(zip(self.doc_ids, self.term_freqs))
+            self.doc_ids = array("I", [doc_id for doc_id,_ in lst_pairs])
+            self.term_freqs = array("I", [term_freq for _,term_freq in lst_pairs])
+            self.is_sorted = True
+
+    def iterator(self) -> ArrayPostingIterator:
+        #os iteradores exigem as ocorrências em ordem de doc_id
+        self.sort()
+        return ArrayPostingIterator(self.doc_ids, self.term_freqs)
+
+    def replace(self, doc_id:int, term_freq:int):
+        """
+            Substitui a frequência do documento (ou adiciona a ocorrência, caso ela não exista)
+        """
+        try:
+            self.term_freqs[self.doc_ids.index(doc_id)] = term_freq
+        except ValueError:
+            self.append(doc_id, term_freq)
+
+    def without(self, deleted_docs:BitSet, set_stale:Set[int]=None) -> "CompactPostingList":
+        """
+            Cópia da lista sem as ocorrências dos documentos removidos (e dos documentos de set_stale)
+        """
+        if set_stale:
+            lst_keep = [doc_id not in deleted_docs and doc_id not in set_stale for doc_id in self.doc_ids]
+        else:
+            lst_keep = [doc_id not in deleted_docs for doc_id in self.doc_ids]
+        posting_list = CompactPostingList(self.term_id)
+        posting_list.doc_ids = array("I", compress(self.doc_ids, lst_keep))
+        posting_list.term_freqs = array("I", compress(self.term_freqs, lst_keep))
+        posting_list.is_sorted = self.is_sorted
+        return posting_list
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __getitem__(self, i:int) -> TermOccurrence:
+        return TermOccurrence(self.doc_ids[i], self.term_id, self.term_freqs[i])
+
+    def __iter__(self):
+        for doc_id, term_freq in zip(self.doc_ids, self.term_freqs):
+            yield TermOccurrence(doc_id, self.term_id, term_freq)
+
+    def __str__(self):
+        return str(list(self))
+
+    def __repr__(self):
+        return str(self)
+
+
+#CompactHashIndex: variação do HashIndex com as ocorrências em colunas compactas
+class CompactHashIndex(Index):
+    def get_term_id(self, term:str):
+        return self.dic_index[term].term_id
+
+    def create_index_entry(self, termo_id:int) -> CompactPostingList:
+        return CompactPostingList(termo_id)
+
+    def add_index_occur(self, entry_dic_index:CompactPostingList, doc_id:int, term_id:int, term_freq:int):
+        entry_dic_index.append(doc_id,term_freq)
+
+    def index_document(self, doc_id:int, dic_term_freq:Mapping[str,int]):
+        dic_index = self.dic_index
+        for term, term_freq in dic_term_freq.items():
+            posting_list = dic_index.get(term)
+            if posting_list is None:
+                posting_list = dic_index[term] = CompactPostingList(self.next_term_id())
+            posting_list.append(doc_id,term_freq)
+        if len(dic_term_freq) > 0:
+            self.set_documents.add(doc_id)
+
+    def replace_occurrence(self, term:str, doc_id:int, term_freq:int):
+        if term in self.dic_index:
+            self.dic_index[term].replace(doc_id, term_freq)
+        else:
+            self.index(term, doc_id, term_freq)
+
+    def get_occurrence_list(self,term: str)->List:
+        if term in self.dic_index:
+            set_stale = self.stale_docs(term) if self.dic_updated_docs else None
+            if self.deleted_docs or set_stale:
+                return self.dic_index[term].without(self.deleted_docs, set_stale)
+            return self.dic_index[term]
+        return []
 
+    def document_count_with_term(self,term:str) -> int:
+        if term in self.dic_index:
+            return len(self.get_occurrence_list(term))
+        return 0
 
+    def purge_deleted(self):
+        if not self.deleted_docs and not self.dic_updated_docs:
+            return
+        for term in list(self.dic_index.keys()):
+            posting_list = self.get_occurrence_list(term)
+            if len(posting_list) == 0:
+                del self.dic_index[term]
+            else:
+                self.dic_index[term] = posting_list
+        self.deleted_docs.clear()
+        self.dic_updated_docs.clear()
+        self.int_purges += 1
 
 
 class TermFilePosition:
-    def __init__(self,term_id:int,  term_file_start_pos:int=None, doc_count_with_term:int = None):
+    def __init__(self,term_id:int,  term_file_start_pos:int=None, doc_count_with_term:int = None,
+                        term_file_byte_count:int = None):
         self.term_id = term_id
 
         #a serem definidos após a indexação
         self.term_file_start_pos = term_file_start_pos
         self.doc_count_with_term = doc_count_with_term
+        self.term_file_byte_count = term_file_byte_count
 
     def __str__(self):
         return f"term_id: {self.term_id}, doc_count_with_term: {self.doc_count_with_term}, term_file_start_pos: {self.term_file_start_pos}"
@@ -143,16 +419,40 @@ class TermFilePosition:
 class FileIndex(Index):
 
     TMP_OCCURRENCES_LIMIT = 1000000
-
-    def __init__(self):
+    #quantidade máxima de runs intercalados de uma só vez
+    MERGE_FAN_IN = 64
+    MANIFEST_FILE = "manifest.json"
+    MANIFEST_VERSION = 1
+    DELETED_FILE = "deleted.bits"
+    STATS_FILE = "documents.stats"
+    TERM_STATS_FILE = "terms.stats"
+    POSITIONS_FILE = "positions.prx"
+
+    def __init__(self, compressed:bool=False, str_idx_dir:str=".", positional:bool=False):
         super().__init__()
+        self.positional = positional
+
+        #diretório onde os arquivos de ocorrências são criados
+        self.str_idx_dir = str_idx_dir
 
+        #codec usado no arquivo final (os runs temporários sempre usam tamanho fixo)
+        self.codec = CODEC_VBYTE if compressed else CODEC_FIXED
         self.lst_occurrences_tmp = []
+        #posições codificadas de cada ocorrência em memória ((term_id, doc_id) -> bytes)
+        self.dic_positions_tmp = {}
+        self.lst_run_files = []
         self.idx_file_counter = 0
         self.str_idx_file_name = None
+        self.str_lexicon_file_name = None
+        #tamanho e norma de cada documento e limite superior do peso de cada termo, calculados em finish_indexing
+        self.document_stats = None
+        self.term_stats = None
+        #arquivo final de posições e a tabela com as posições de cada termo (apenas no índice posicional)
+        self.str_positions_file_name = None
+        self.positions_table = None
 
     def get_term_id(self, term:str):
-        if term not in self.dic_index.keys():
+        if term not in self.dic_index:
             return None
         return self.dic_index[term].term_id
 
@@ -160,124 +460,426 @@ class FileIndex(Index):
         return  TermFilePosition(term_id)
 
     def add_index_occur(self, entry_dic_index:TermFilePosition,  doc_id:int, term_id:int, term_freq:int):
+        if self.positional:
+            raise Exception("O índice posicional deve ser criado por index_document, com as posições de cada termo")
         self.lst_occurrences_tmp.append(TermOccurrence(doc_id,term_id,term_freq))
 
-        if len(self.lst_occurrences_tmp) >= FileIndex.TMP_OCCURRENCES_LIMIT:
+        if len(self.lst_occurrences_tmp) >= self.TMP_OCCURRENCES_LIMIT:
             self.save_tmp_occurrences()
+
+    def index_document(self, doc_id:int, dic_term_freq:Mapping[str,int], dic_term_positions:Mapping[str,List[int]]=None):
+        """
+            No índice posicional, dic_term_positions possui as posições (em ordem crescente) de cada termo do documento
+        """
+        if self.positional and dic_term_positions is None:
+            raise Exception("O índice posicional requer as posições dos termos do documento")
+        dic_index = self.dic_index
+        lst_occurrences_tmp = self.lst_occurrences_tmp
+        for term, term_freq in dic_term_freq.items():
+            obj_term = dic_index.get(term)
+            if obj_term is None:
+                obj_term = dic_index[term] = TermFilePosition(self.next_term_id())
+            lst_occurrences_tmp.append(TermOccurrence(doc_id,obj_term.term_id,term_freq))
+            if self.positional:
+                self.dic_positions_tmp[(obj_term.term_id,doc_id)] = encode_positions(dic_term_positions[term])
+        if len(dic_term_freq) > 0:
+            self.set_documents.add(doc_id)
+        #o limite é verificado uma única vez por documento
+        if len(self.lst_occurrences_tmp) >= self.TMP_OCCURRENCES_LIMIT:
+            self.save_tmp_occurrences()
+
     def incress_idx_file_counter(self):
         self.idx_file_counter = self.idx_file_counter + 1
 
-    def next_from_list(self) -> TermOccurrence:
-        try:
-            next_element = self.lst_occurrences_tmp.pop(0)
-            if not next_element:
-                return None
-            return next_element
-        except:            
-            return None
+    def next_idx_file_name(self) -> str:
+        str_file_name = path.join(self.str_idx_dir,f"occur_index_{self.idx_file_counter}.idx")
+        self.incress_idx_file_counter()
+        return str_file_name
+
+    @staticmethod
+    def positions_run_name(str_run_file_name:str) -> str:
+        """
+            Run de posições que acompanha o run de ocorrências str_run_file_name
+        """
+        return path.splitext(str_run_file_name)[0]+".pos"
+
+    def run_occurrences(self, idx_file, str_run_file_name:str) -> Iterable[Tuple]:
+        """
+            Ocorrências (term_id, doc_id, term_freq) do run (a partir do fim do cabeçalho). No índice
+            posicional, cada ocorrência é acompanhada por suas posições codificadas
+        """
+        if not self.positional:
+            return read_occurrences(idx_file)
+        return (occur+(data,) for occur, data in zip(read_occurrences(idx_file),
+                                                     read_positions_run(FileIndex.positions_run_name(str_run_file_name))))
 
     def next_from_file(self,file_idx) -> TermOccurrence:
-            #next_from_file = pickle.load(file_idx)
-    
-        #seu código aqui :)
-        try:
-            next_occurrence = pickle.load(file_idx)
-            if not next_occurrence:
-                return None
-            return TermOccurrence(next_occurrence.doc_id, next_occurrence.term_id, next_occurrence.term_freq)
-        except:
+        #o cabeçalho é validado ao iniciar a leitura do arquivo
+        if file_idx.tell() == 0:
+            read_header(file_idx)
+        record = file_idx.read(OCCURRENCE.size)
+        if len(record) < OCCURRENCE.size:
             return None
+        term_id, doc_id, term_freq = OCCURRENCE.unpack(record)
+        return TermOccurrence(doc_id, term_id, term_freq)
 
     def save_tmp_occurrences(self):
-
-        #ordena pelo term_id, doc_id
+        """
+            Grava as ocorrências em memória, ordenadas por (term_id, doc_id), em um novo
+            arquivo (run) independente. Os runs só são intercalados em merge_runs
+        """
         #Para eficiencia, todo o codigo deve ser feito com o garbage
         #collector desabilitado
         gc.disable()
-        #ordena pelo term_id, doc_id        
-        ### Abra um arquivo novo faça a ordenação externa: compar sempre a primeira posição
-        ### da lista com a primeira possição do arquivo usando os métodos next_from_list e next_from_file
-        ### para armazenar no novo indice ordenado
-
-        self.lst_occurrences_tmp.sort()
-        filename = ""
-        if self.str_idx_file_name == None:
-            filename = f"occur_index_{self.idx_file_counter}.idx"
-            self.str_idx_file_name  = f"occur_index_{self.idx_file_counter}.idx"
-            idx_file =  open(filename,"wb")
-        else:
-            filename = self.str_idx_file_name            
-            self.incress_idx_file_counter()
-            self.str_idx_file_name  = f"occur_index_{self.idx_file_counter}.idx"
-            idx_file = open(filename,"rb")
-        with open(self.str_idx_file_name,"wb") as new_idx_file:
-            occur_file = self.next_from_file(idx_file)
-            occur_list = self.next_from_list()
-            while occur_list != None or occur_file != None: 
-                if occur_file < occur_list:
-                    next_save = occur_file
-                    occur_file = self.next_from_file(idx_file)
+        try:
+            #ordena pelo term_id, doc_id
+            self.lst_occurrences_tmp.sort(key=attrgetter("term_id","doc_id"))
+
+            str_run_file_name = self.next_idx_file_name()
+            with open(str_run_file_name,"wb") as run_file:
+                writer = OccurrenceWriter(run_file)
+                for occur in self.lst_occurrences_tmp:
+                    writer.write(occur.term_id, occur.doc_id, occur.term_freq)
+                writer.flush()
+            if self.positional:
+                with open(FileIndex.positions_run_name(str_run_file_name),"wb") as pos_file:
+                    pos_writer = PositionsRunWriter(pos_file)
+                    pos_writer.write_all(self.dic_positions_tmp[(occur.term_id,occur.doc_id)]
+                                                        for occur in self.lst_occurrences_tmp)
+                    pos_writer.flush()
+                self.dic_positions_tmp = {}
+            self.lst_run_files.append(str_run_file_name)
+            self.lst_occurrences_tmp = []
+        finally:
+            gc.enable()
+
+    def merge_files(self, lst_file_names:List[str]) -> str:
+        """
+            Intercala (k-way merge usando um heap) os arquivos ordenados em um novo arquivo,
+            removendo os arquivos de entrada. Retorna o nome do novo arquivo
+        """
+        str_new_file_name = self.next_idx_file_name()
+        lst_files = [open(str_file_name,"rb") for str_file_name in lst_file_names]
+        try:
+            lst_iters = []
+            for idx_file, str_file_name in zip(lst_files, lst_file_names):
+                read_header(idx_file)
+                lst_iters.append(self.run_occurrences(idx_file, str_file_name))
+            with open(str_new_file_name,"wb") as new_idx_file:
+                writer = OccurrenceWriter(new_idx_file)
+                if self.positional:
+                    #as posições são gravadas no run de posições do novo arquivo, na mesma ordem das ocorrências
+                    with open(FileIndex.positions_run_name(str_new_file_name),"wb") as pos_file:
+                        pos_writer = PositionsRunWriter(pos_file)
+                        for term_id, doc_id, term_freq, data in heapq.merge(*lst_iters):
+                            writer.write(term_id, doc_id, term_freq)
+                            pos_writer.write(data)
+                        pos_writer.flush()
                 else:
-                    next_save = occur_list
-                    occur_list = self.next_from_list()
-                next_save.write(new_idx_file)
-        self.lst_occurrences_tmp = []
-        idx_file.close()
-        gc.enable()
+                    writer.write_all(heapq.merge(*lst_iters))
+                writer.flush()
+        finally:
+            for idx_file in lst_files:
+                idx_file.close()
+        for str_file_name in lst_file_names:
+            os.remove(str_file_name)
+            if self.positional:
+                os.remove(FileIndex.positions_run_name(str_file_name))
+        return str_new_file_name
+
+    def merge_runs(self):
+        """
+            Intercala todos os runs em um único arquivo (str_idx_file_name). Caso existam
+            mais runs que MERGE_FAN_IN, a intercalação é feita em múltiplas passadas
+        """
+        while len(self.lst_run_files) > self.MERGE_FAN_IN:
+            lst_next_pass = []
+            for i in range(0,len(self.lst_run_files),self.MERGE_FAN_IN):
+                lst_group = self.lst_run_files[i:i+self.MERGE_FAN_IN]
+                if len(lst_group) == 1:
+                    lst_next_pass.append(lst_group[0])
+                else:
+                    lst_next_pass.append(self.merge_files(lst_group))
+            self.lst_run_files = lst_next_pass
+
+        if len(self.lst_run_files) > 1:
+            self.lst_run_files = [self.merge_files(self.lst_run_files)]
+        if len(self.lst_run_files) == 1:
+            self.str_idx_file_name = self.lst_run_files[0]
+
+    def add_runs(self, lst_terms:List[str], lst_run_files:List[str], set_documents:Set[int]):
+        """
+            Adiciona, a um índice vazio, runs gerados fora dele (por exemplo, por outros processos).
+            O term_id de cada ocorrência dos runs deve ser a posição do termo em lst_terms
+        """
+        if len(self.dic_index) > 0:
+            raise Exception("Os runs só podem ser adicionados a um índice vazio")
+        if self.positional:
+            raise Exception("Os runs gerados fora do índice não possuem as posições dos termos")
+        for term_id, term in enumerate(lst_terms):
+            self.dic_index[term] = self.create_index_entry(term_id)
+        self.int_next_term_id = len(lst_terms)
+        self.lst_run_files += lst_run_files
+        self.set_documents |= set_documents
 
     def finish_indexing(self):
+        if isinstance(self.dic_index, Lexicon):
+            #o vocabulário já está em disco: o índice já foi finalizado
+            return
         if len(self.lst_occurrences_tmp) > 0:
             self.save_tmp_occurrences()
-
-        #Sugestão: faça a navegação e obetenha um mapeamento 
-        # id_termo -> obj_termo armazene-o em dic_ids_por_termo
+        if self.str_lexicon_file_name is not None:
+            #índice já finalizado: só é necessário finalizar novamente caso existam novos runs
+            if len([str_run for str_run in self.lst_run_files if str_run != self.str_idx_file_name]) == 0:
+                return
+            #o arquivo comprimido é gerado uma única vez
+            if self.codec == CODEC_VBYTE:
+                raise Exception("O índice comprimido já foi finalizado: não é possível adicionar novas ocorrências")
+        self.merge_runs()
+        if self.str_idx_file_name is None:
+            return
+
+        #mapeamento id_termo -> termo para atualizar cada entrada do dic_index
         dic_ids_por_termo = {}
         for str_term,obj_term in self.dic_index.items():
             dic_ids_por_termo[obj_term.term_id] = str_term
-        lst_discovery_id = {}
-        with open(self.str_idx_file_name,'rb') as idx_file:
-            #navega nas ocorrencias para atualizar cada termo em dic_ids_por_termo 
-            #apropriadamente
-            occur_file = self.next_from_file(idx_file)
-            int_size_of_occur = idx_file.tell()
-            while occur_file != None:
-                if occur_file.term_id not in lst_discovery_id:
-                    docs_with = 1
-                    lst_discovery_id[occur_file.term_id] = docs_with
-                else:
-                    docs_with =  lst_discovery_id[occur_file.term_id] + 1
-                    lst_discovery_id[occur_file.term_id] = docs_with
-                occur_file = self.next_from_file(idx_file)
-            for id_elemnt,obj_element in lst_discovery_id.items():
-                if id_elemnt > 1:
-                    count_terms = self.dic_index[dic_ids_por_termo[id_elemnt-1]].doc_count_with_term
-                    last_position =  self.dic_index[dic_ids_por_termo[id_elemnt-1]].term_file_start_pos
-                    starts = last_position + count_terms*int_size_of_occur
+
+        #as ocorrências de cada termo são contíguas: percorre o arquivo (uma única vez)
+        #calculando a posição inicial (contada a partir do fim do cabeçalho) e o tamanho
+        #das ocorrências de cada termo. No caso do indice comprimido, o arquivo final
+        #é reescrito com as ocorrências codificadas.
+        #No mesmo percurso são calculados o tamanho de cada documento e a soma dos
+        #quadrados dos pesos tf-idf ((1+log2 f)*log2(N/df)) de seus termos e, no índice
+        #posicional, é gravado o arquivo final de posições
+        str_fixed_file_name = self.str_idx_file_name
+        compressed_file = None
+        if self.codec == CODEC_VBYTE:
+            self.str_idx_file_name = self.next_idx_file_name()
+            compressed_file = open(self.str_idx_file_name,"wb")
+            write_header(compressed_file,CODEC_VBYTE)
+        positions_file = None
+        if self.positional:
+            if self.str_positions_file_name is not None:
+                os.remove(self.str_positions_file_name)
+            self.str_positions_file_name = path.splitext(self.str_idx_file_name)[0]+".prx"
+            positions_file = open(self.str_positions_file_name,"wb")
+            positions_writer = PositionsWriter(positions_file)
+        int_pos = 0
+        int_doc_count = self.document_count
+        dic_lengths = {}
+        dic_norm_sums = {}
+        with open(str_fixed_file_name,'rb') as idx_file:
+            read_header(idx_file)
+            for term_id, it_occurrences in groupby(self.run_occurrences(idx_file,str_fixed_file_name),key=itemgetter(0)):
+                lst_occurrences = list(it_occurrences)
+                obj_term = self.dic_index[dic_ids_por_termo[term_id]]
+                obj_term.term_file_start_pos = int_pos
+                obj_term.doc_count_with_term = len(lst_occurrences)
+                if positions_file is not None:
+                    positions_writer.write_term(term_id,[occur[1] for occur in lst_occurrences],
+                                                [occur[3] for occur in lst_occurrences])
+                if int_doc_count > 0:
+                    idf = math.log((int_doc_count/obj_term.doc_count_with_term),2)
+                    for _, doc_id, term_freq, *_ in lst_occurrences:
+                        dic_lengths[doc_id] = dic_lengths.get(doc_id,0)+term_freq
+                        dic_norm_sums[doc_id] = dic_norm_sums.get(doc_id,0)+math.pow((1+math.log(term_freq,2))*idf,2)
+                if compressed_file is None:
+                    obj_term.term_file_byte_count = len(lst_occurrences)*OCCURRENCE.size
                 else:
-                    starts = 0
-                news = TermFilePosition(id_elemnt,starts,obj_element)
-                self.dic_index[dic_ids_por_termo[id_elemnt]] = news
-           
+                    data = encode_postings([occur[1] for occur in lst_occurrences],
+                                           [occur[2] for occur in lst_occurrences])
+                    compressed_file.write(data)
+                    obj_term.term_file_byte_count = len(data)
+                int_pos += obj_term.term_file_byte_count
+        #sem a tabela de documentos (ocorrências adicionadas diretamente), as estatísticas não são calculadas
+        self.document_stats = DocumentStats.from_sums(dic_lengths,dic_norm_sums) if int_doc_count > 0 else None
+        self.term_stats = self.compute_term_stats(str_fixed_file_name) if int_doc_count > 0 else None
+        if positions_file is not None:
+            self.positions_table = positions_writer.close()
+            positions_file.close()
+        if compressed_file is not None:
+            compressed_file.close()
+            os.remove(str_fixed_file_name)
+            if self.positional:
+                os.remove(FileIndex.positions_run_name(str_fixed_file_name))
+            self.lst_run_files = []
+
+        #léxico ordenado em disco, ao lado do arquivo de ocorrências (o léxico da finalização anterior é removido)
+        if self.str_lexicon_file_name is not None:
+            os.remove(self.str_lexicon_file_name)
+        self.str_lexicon_file_name = path.splitext(self.str_idx_file_name)[0]+".lex"
+        write_lexicon(self.str_lexicon_file_name, sorted(self.dic_index.items(),key=itemgetter(0)))
+
+    def compute_term_stats(self, str_fixed_file_name:str) -> TermStats:
+        """
+            Percorre novamente o arquivo de ocorrências (de tamanho fixo), já com as normas e os tamanhos
+            dos documentos calculados, obtendo o maior peso normalizado (1+log2 f)/norma, a maior frequência
+            e o tamanho do menor documento de cada termo
+        """
+        dic_norms = dict(zip(self.document_stats.doc_ids,self.document_stats.norms))
+        dic_lengths = dict(zip(self.document_stats.doc_ids,self.document_stats.lengths))
+        dic_max_weights = {}
+        dic_max_term_freqs = {}
+        dic_min_lengths = {}
+        with open(str_fixed_file_name,'rb') as idx_file:
+            read_header(idx_file)
+            for term_id, doc_id, term_freq in read_occurrences(idx_file):
+                norm = dic_norms[doc_id]
+                weight = (1+math.log(term_freq,2))/norm if norm > 0 else 0
+                if weight >= dic_max_weights.get(term_id,0):
+                    dic_max_weights[term_id] = weight
+                if term_freq > dic_max_term_freqs.get(term_id,0):
+                    dic_max_term_freqs[term_id] = term_freq
+                if dic_lengths[doc_id] < dic_min_lengths.get(term_id,math.inf):
+                    dic_min_lengths[term_id] = dic_lengths[doc_id]
+        return TermStats.from_dicts(dic_max_weights,dic_max_term_freqs,dic_min_lengths)
+
+    def open_lexicon(self):
+        """
+            Substitui o vocabulário em memória pelo léxico gravado em finish_indexing:
+            os termos passam a ser buscados no arquivo (busca binária), sem manter o dicionário em memória
+        """
+        if not isinstance(self.dic_index, Lexicon):
+            self.dic_index = Lexicon(self.str_lexicon_file_name, TermFilePosition)
+
+    def save(self, str_dir:str):
+        """
+            Grava, no diretório str_dir, o índice finalizado: o arquivo de ocorrências,
+            o léxico, a tabela de documentos e o manifesto que os descreve
+        """
+        self.finish_indexing()
+        os.makedirs(str_dir, exist_ok=True)
+        dic_manifest = {"format_version":FileIndex.MANIFEST_VERSION,
+                        "codec":self.codec,
+                        "posting_file":"postings.idx",
+                        "lexicon_file":"lexicon.lex",
+                        "documents_file":"documents.dat",
+                        "deleted_file":FileIndex.DELETED_FILE,
+                        "stats_file":FileIndex.STATS_FILE if self.document_stats is not None else None,
+                        "term_stats_file":FileIndex.TERM_STATS_FILE if self.term_stats is not None else None,
+                        "positions_file":FileIndex.POSITIONS_FILE if self.str_positions_file_name is not None else None,
+                        "document_count":self.document_count,
+                        "term_count":len(self.dic_index)}
+        if self.str_idx_file_name is None:
+            #índice vazio
+            with open(path.join(str_dir,dic_manifest["posting_file"]),"wb") as idx_file:
+                write_header(idx_file,self.codec)
+            write_lexicon(path.join(str_dir,dic_manifest["lexicon_file"]),[])
+        else:
+            lst_files = [(self.str_idx_file_name,dic_manifest["posting_file"]),
+                         (self.str_lexicon_file_name,dic_manifest["lexicon_file"])]
+            if self.str_positions_file_name is not None:
+                lst_files.append((self.str_positions_file_name,dic_manifest["positions_file"]))
+            for str_file_name,str_new_name in lst_files:
+                str_new_name = path.join(str_dir,str_new_name)
+                if not path.exists(str_new_name) or not path.samefile(str_file_name,str_new_name):
+                    shutil.copyfile(str_file_name,str_new_name)
+        write_documents(path.join(str_dir,dic_manifest["documents_file"]),self.set_documents)
+        if self.document_stats is not None:
+            self.document_stats.write(path.join(str_dir,dic_manifest["stats_file"]))
+        if self.term_stats is not None:
+            self.term_stats.write(path.join(str_dir,dic_manifest["term_stats_file"]))
+        self.save_deleted(str_dir)
+        #o manifesto é gravado por último: sua existência indica que o índice está completo
+        with open(path.join(str_dir,FileIndex.MANIFEST_FILE),"w",encoding="utf-8") as manifest_file:
+            json.dump(dic_manifest,manifest_file,indent=4)
+
+    @staticmethod
+    def open(str_dir:str) -> "FileIndex":
+        """
+            Abre um índice gravado por save. Apenas os metadados são lidos: o vocabulário
+            fica no léxico e as ocorrências permanecem em disco.
+        """
+        with open(path.join(str_dir,FileIndex.MANIFEST_FILE),"r",encoding="utf-8") as manifest_file:
+            dic_manifest = json.load(manifest_file)
+        if dic_manifest["format_version"] != FileIndex.MANIFEST_VERSION:
+            raise ValueError(f"Versão {dic_manifest['format_version']} do índice em {str_dir} não suportada")
+
+        index = FileIndex(compressed=dic_manifest["codec"] == CODEC_VBYTE,str_idx_dir=str_dir)
+        index.str_idx_file_name = path.join(str_dir,dic_manifest["posting_file"])
+        index.str_lexicon_file_name = path.join(str_dir,dic_manifest["lexicon_file"])
+        with open(index.str_idx_file_name,"rb") as idx_file:
+            if read_header(idx_file) != index.codec:
+                raise ValueError(f"O codec do arquivo {index.str_idx_file_name} não corresponde ao manifesto")
+        index.open_lexicon()
+        index.set_documents = set(read_documents(path.join(str_dir,dic_manifest["documents_file"])))
+        str_deleted_file = path.join(str_dir,dic_manifest.get("deleted_file",FileIndex.DELETED_FILE))
+        if path.exists(str_deleted_file):
+            with open(str_deleted_file,"rb") as deleted_file:
+                index.deleted_docs = BitSet(deleted_file.read())
+            index.set_documents.difference_update(index.deleted_docs)
+        if dic_manifest.get("stats_file") is not None:
+            index.document_stats = DocumentStats.read(path.join(str_dir,dic_manifest["stats_file"]))
+        if dic_manifest.get("term_stats_file") is not None:
+            index.term_stats = TermStats.read(path.join(str_dir,dic_manifest["term_stats_file"]))
+        if dic_manifest.get("positions_file") is not None:
+            index.positional = True
+            index.str_positions_file_name = path.join(str_dir,dic_manifest["positions_file"])
+            with open(index.str_positions_file_name,"rb") as positions_file:
+                index.positions_table = PositionsTable.read(positions_file)
+        return index
+
+    def save_deleted(self, str_dir:str):
+        """
+            Grava os documentos removidos no diretório str_dir. O arquivo é substituído
+            atomicamente, assim ele pode ser atualizado após o índice ter sido salvo
+        """
+        str_deleted_file = path.join(str_dir,FileIndex.DELETED_FILE)
+        with open(str_deleted_file+".tmp","wb") as deleted_file:
+            deleted_file.write(self.deleted_docs.to_bytes())
+        os.replace(str_deleted_file+".tmp",str_deleted_file)
+
     def get_occurrence_list(self,term: str)->List:
-        occurrenc_list = []
-        if term in self.dic_index:
-            term_id = self.dic_index[term].term_id
-            with open(self.str_idx_file_name,"rb") as idx_file:
-                occur_file = self.next_from_file(idx_file)
-                while occur_file != None:
-                    if occur_file.term_id == term_id:
-                        occurrenc_list.append(occur_file)
-                    occur_file = self.next_from_file(idx_file)
-        return occurrenc_list
+        #as ocorrências de um termo são contíguas no arquivo: basta posicionar no
+        #inicio do termo e ler exatamente doc_count_with_term ocorrências
+        if term not in self.dic_index:
+            return []
+        obj_term = self.dic_index[term]
+        if not obj_term.doc_count_with_term:
+            return []
+        with open(self.str_idx_file_name,"rb") as idx_file:
+            idx_file.seek(HEADER.size+obj_term.term_file_start_pos)
+            data = idx_file.read(obj_term.term_file_byte_count)
+        if self.codec == CODEC_VBYTE:
+            doc_ids, term_freqs = decode_postings(data)
+            lst_occurrences = [TermOccurrence(doc_id,obj_term.term_id,term_freq) for doc_id,term_freq in zip(doc_ids,term_freqs)]
+        else:
+            lst_occurrences = [TermOccurrence(doc_id,term_id,term_freq) for term_id,doc_id,term_freq in OCCURRENCE.iter_unpack(data)]
+        if self.deleted_docs:
+            return [occur for occur in lst_occurrences if occur.doc_id not in self.deleted_docs]
+        return lst_occurrences
+
+    def get_positions(self, term:str) -> PositionsIterator:
+        """
+            Iterador sobre as posições do termo em cada documento (ou None, caso o índice não seja
+            posicional). As posições só são lidas do disco por este método
+        """
+        if self.positions_table is None:
+            return None
+        term_range = self.positions_table.term_range(self.dic_index[term].term_id) if term in self.dic_index else None
+        if term_range is None:
+            return PositionsIterator(b"")
+        int_start, int_byte_count = term_range
+        with open(self.str_positions_file_name,"rb") as positions_file:
+            positions_file.seek(int_start)
+            return PositionsIterator(positions_file.read(int_byte_count))
 
     def document_count_with_term(self,term:str) -> int:
-        document_count = 0
-        if term in self.dic_index:
-            term_id = self.dic_index[term].term_id
-            with open(self.str_idx_file_name,"rb") as idx_file:
-                occur_file = self.next_from_file(idx_file)
-                while occur_file != None:
-                    if occur_file.term_id == term_id:
-                        document_count += 1
-                    occur_file = self.next_from_file(idx_file)
-        return document_count
\ No newline at end of file
+        if term not in self.dic_index:
+            return 0
+        return self.dic_index[term].doc_count_with_term or 0
+
+    def update_document(self, doc_id:int, dic_term_freq:Mapping[str,int]):
+        """
+            O arquivo de ocorrências é imutável e os documentos removidos são identificados apenas pelo doc_id:
+            um documento removido não pode ser indexado novamente no mesmo FileIndex. As atualizações de
+            índices em disco devem ser feitas por meio de um SegmentedIndex (a nova versão é gravada em
+            um novo segmento)
+        """
+        raise NotImplementedError("O FileIndex não permite atualizar documentos: utilize um SegmentedIndex")
+
+    def purge_deleted(self):
+        #o arquivo de ocorrências é imutável: as ocorrências removidas só deixam de existir
+        #quando o índice é reescrito (ver a intercalação de segmentos em SegmentedIndex)
+        if self.deleted_docs:
+            raise NotImplementedError("Não é possível expurgar as ocorrências de um FileIndex: utilize um SegmentedIndex")
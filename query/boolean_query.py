@@ -0,0 +1,272 @@
+from typing import Callable, List
+from abc import abstractmethod
+import re
+from index.structure import Index
+from index.reader import posting_iterator
+from index.posting_iterator import PostingIterator, ArrayPostingIterator, ConjunctionIterator, \
+                                    DisjunctionIterator, ExclusionIterator, PhraseIterator, ProximityIterator
+from index.indexer import text_tokens
+
+#tokens da consulta: frases entre aspas (seguidas, na busca por proximidade, de ~distância),
+#parênteses e palavras (operadores ou termos)
+QUERY_TOKEN_REGEX = re.compile(r'"([^"]*)"(?:~(\d+))?|([()])|([^\s()"]+)')
+OPERATORS = {"AND","OR","NOT"}
+
+
+def all_documents_iterator(index:Index) -> PostingIterator:
+    """
+        Iterador sobre todos os documentos do índice (usado nas negações sem termos positivos)
+    """
+    lst_doc_ids = sorted(index.set_documents)
+    return ArrayPostingIterator(lst_doc_ids, [0]*len(lst_doc_ids))
+
+
+class QueryNode:
+    """
+        Nó da árvore de uma consulta booleana
+    """
+    @abstractmethod
+    def cost(self, index:Index) -> int:
+        """
+            Estimativa (limite superior) da quantidade de documentos do nó
+        """
+        raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
+
+    @abstractmethod
+    def iterator(self, index:Index) -> PostingIterator:
+        """
+            Iterador (em ordem de doc_id) sobre os documentos que satisfazem o nó
+        """
+        raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
+
+    def plan(self, index:Index) -> "QueryNode":
+        """
+            Retorna o nó reorganizado para a avaliação (ver AndNode.plan)
+        """
+        return self
+
+
+class TermNode(QueryNode):
+    def __init__(self, term:str):
+        self.term = term
+
+    def cost(self, index:Index) -> int:
+        return index.document_count_with_term(self.term)
+
+    def iterator(self, index:Index) -> PostingIterator:
+        return posting_iterator(index.get_occurrence_list(self.term))
+
+    def __str__(self):
+        return self.term
+
+
+class PhraseNode(QueryNode):
+    """
+        Termos consecutivos (entre aspas). As posições só são verificadas nos documentos que possuem
+        todos os termos; sem as posições dos termos no índice (índice não posicional), a frase
+        corresponde a todos estes documentos
+    """
+    def __init__(self, lst_terms:List[str]):
+        self.lst_terms = lst_terms
+
+    def cost(self, index:Index) -> int:
+        return min(index.document_count_with_term(term) for term in self.lst_terms)
+
+    def term_iterators(self, index:Index) -> List[PostingIterator]:
+        return [posting_iterator(index.get_occurrence_list(term)) for term in self.lst_terms]
+
+    def iterator(self, index:Index) -> PostingIterator:
+        if not index.positional:
+            return ConjunctionIterator(self.term_iterators(index))
+        return PhraseIterator(self.term_iterators(index), [index.get_positions(term) for term in self.lst_terms])
+
+    def __str__(self):
+        return '"'+" ".join(self.lst_terms)+'"'
+
+
+class ProximityNode(PhraseNode):
+    """
+        Termos (entre aspas e seguidos de ~max_distance) que ocorrem, em qualquer ordem, com no máximo
+        max_distance palavras entre eles
+    """
+    def __init__(self, lst_terms:List[str], max_distance:int):
+        super().__init__(lst_terms)
+        self.max_distance = max_distance
+
+    def iterator(self, index:Index) -> PostingIterator:
+        if not index.positional:
+            return ConjunctionIterator(self.term_iterators(index))
+        return ProximityIterator(self.term_iterators(index), [index.get_positions(term) for term in self.lst_terms],
+                                 self.max_distance)
+
+    def __str__(self):
+        return super().__str__()+f"~{self.max_distance}"
+
+
+class NotNode(QueryNode):
+    def __init__(self, child:QueryNode):
+        self.child = child
+
+    def cost(self, index:Index) -> int:
+        return index.document_count
+
+    def plan(self, index:Index) -> QueryNode:
+        return NotNode(self.child.plan(index))
+
+    def iterator(self, index:Index) -> PostingIterator:
+        return ExclusionIterator(all_documents_iterator(index), [self.child.iterator(index)])
+
+    def __str__(self):
+        return f"NOT {self.child}"
+
+
+class AndNode(QueryNode):
+    def __init__(self, lst_children:List[QueryNode]):
+        self.lst_children = lst_children
+
+    def cost(self, index:Index) -> int:
+        lst_costs = [child.cost(index) for child in self.lst_children if not isinstance(child, NotNode)]
+        return min(lst_costs) if len(lst_costs) > 0 else index.document_count
+
+    def plan(self, index:Index) -> QueryNode:
+        """
+            Une os ANDs aninhados e ordena os filhos pela quantidade estimada de documentos: os positivos
+            em ordem crescente (o menor conduz a interseção) e os negados em ordem decrescente (os mais
+            frequentes descartam mais candidatos)
+        """
+        lst_children = []
+        for child in self.lst_children:
+            child = child.plan(index)
+            lst_children += child.lst_children if isinstance(child, AndNode) else [child]
+        lst_positive = sorted([child for child in lst_children if not isinstance(child, NotNode)], key=lambda child:child.cost(index))
+        lst_negative = sorted([child for child in lst_children if isinstance(child, NotNode)], key=lambda child:-child.child.cost(index))
+        return AndNode(lst_positive+lst_negative)
+
+    def iterator(self, index:Index) -> PostingIterator:
+        lst_positive = [child.iterator(index) for child in self.lst_children if not isinstance(child, NotNode)]
+        lst_negative = [child.child.iterator(index) for child in self.lst_children if isinstance(child, NotNode)]
+        if len(lst_positive) == 0:
+            iterator = all_documents_iterator(index)
+        elif len(lst_positive) == 1:
+            iterator = lst_positive[0]
+        else:
+            iterator = ConjunctionIterator(lst_positive)
+        if len(lst_negative) == 0:
+            return iterator
+        return ExclusionIterator(iterator, lst_negative)
+
+    def __str__(self):
+        return "("+" AND ".join(str(child) for child in self.lst_children)+")"
+
+
+class OrNode(QueryNode):
+    def __init__(self, lst_children:List[QueryNode]):
+        self.lst_children = lst_children
+
+    def cost(self, index:Index) -> int:
+        return min(sum(child.cost(index) for child in self.lst_children), index.document_count)
+
+    def plan(self, index:Index) -> QueryNode:
+        lst_children = []
+        for child in self.lst_children:
+            child = child.plan(index)
+            lst_children += child.lst_children if isinstance(child, OrNode) else [child]
+        return OrNode(lst_children)
+
+    def iterator(self, index:Index) -> PostingIterator:
+        return DisjunctionIterator([child.iterator(index) for child in self.lst_children])
+
+    def __str__(self):
+        return "("+" OR ".join(str(child) for child in self.lst_children)+")"
+
+
+class BooleanQueryParser:
+    """
+        Analisador de consultas booleanas:
+            consulta := e_expr (OR e_expr)*
+            e_expr   := nao_expr ([AND] nao_expr)*      (termos lado a lado são unidos por AND)
+            nao_expr := NOT nao_expr | "(" consulta ")" | "frase entre aspas" | "termos entre aspas"~k | termo
+        A frase exige os termos consecutivos e "termos entre aspas"~k exige os termos, em qualquer ordem,
+        com no máximo k palavras entre eles (ambos dependem de um índice posicional). Os operadores devem estar em maiúsculas. Cada termo é normalizado pela função normalize
+        (por exemplo, Cleaner.preprocess_word); os termos que resultam vazios (stop words) são ignorados
+    """
+    def __init__(self, normalize:Callable[[str],str]=None):
+        self.normalize = normalize if normalize is not None else str.lower
+
+    def tokenize(self, str_query:str) -> List:
+        lst_tokens = []
+        for phrase, distance, parenthesis, word in QUERY_TOKEN_REGEX.findall(str_query):
+            if parenthesis:
+                lst_tokens.append(parenthesis)
+            elif word:
+                lst_tokens.append(word)
+            else:
+                #a frase é representada pela lista de seus termos e pela distância máxima (None na frase exata)
+                lst_tokens.append((text_tokens(phrase),int(distance) if distance else None))
+        return lst_tokens
+
+    def parse(self, str_query:str) -> QueryNode:
+        """
+            Retorna a árvore da consulta (ou None, caso a consulta não possua termos)
+        """
+        self.lst_tokens = self.tokenize(str_query)
+        self.pos = 0
+        if len(self.lst_tokens) == 0:
+            return None
+        node = self.parse_or()
+        if self.pos < len(self.lst_tokens):
+            raise ValueError(f"Consulta inválida: '{self.lst_tokens[self.pos]}' inesperado")
+        return node
+
+    def peek(self):
+        return self.lst_tokens[self.pos] if self.pos < len(self.lst_tokens) else None
+
+    def parse_or(self) -> QueryNode:
+        lst_children = [self.parse_and()]
+        while self.peek() == "OR":
+            self.pos += 1
+            lst_children.append(self.parse_and())
+        return self.create_node(OrNode, lst_children)
+
+    def parse_and(self) -> QueryNode:
+        lst_children = [self.parse_not()]
+        while self.peek() is not None and self.peek() not in (")","OR"):
+            if self.peek() == "AND":
+                self.pos += 1
+            lst_children.append(self.parse_not())
+        return self.create_node(AndNode, lst_children)
+
+    def parse_not(self) -> QueryNode:
+        token = self.peek()
+        if token is None:
+            raise ValueError("Consulta inválida: termo esperado no fim da consulta")
+        self.pos += 1
+        if isinstance(token, tuple):
+            lst_phrase, distance = token
+            lst_terms = [term for term in map(self.normalize, lst_phrase) if term]
+            if distance is not None:
+                #na proximidade, termos repetidos não alteram a restrição
+                lst_terms = list(dict.fromkeys(lst_terms))
+            if len(lst_terms) <= 1:
+                return TermNode(lst_terms[0]) if len(lst_terms) > 0 else None
+            return PhraseNode(lst_terms) if distance is None else ProximityNode(lst_terms, distance)
+        if token == ")" or token in OPERATORS-{"NOT"}:
+            raise ValueError(f"Consulta inválida: termo esperado antes de '{token}'")
+        if token == "NOT":
+            child = self.parse_not()
+            return NotNode(child) if child is not None else None
+        if token == "(":
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise ValueError("Consulta inválida: ')' esperado")
+            self.pos += 1
+            return node
+        term = self.normalize(token)
+        return TermNode(term) if term else None
+
+    @staticmethod
+    def create_node(node_class, lst_children:List[QueryNode]) -> QueryNode:
+        lst_children = [child for child in lst_children if child is not None]
+        if len(lst_children) == 0:
+            return None
+        return lst_children[0] if len(lst_children) == 1 else node_class(lst_children)
@@ -1,13 +1,18 @@
 from typing import List, Set,Mapping
-from nltk.tokenize import word_tokenize
 from util.time import CheckTime
 from query.ranking_models import *
+from query.boolean_query import BooleanQueryParser
+from index.posting_iterator import iterate_doc_ids
+from itertools import islice
 from index.structure import Index, TermOccurrence, FileIndex
 from index.indexer import Cleaner
 import os
 from datetime import datetime
 
 class QueryRunner:
+	#diretório onde o índice é salvo e de onde ele é reaberto
+	INDEX_DIR = "indice"
+
 	def __init__(self,ranking_model:RankingModel,index:Index, cleaner:Cleaner):
 		self.ranking_model = ranking_model
 		self.index = index
@@ -69,7 +74,9 @@ class QueryRunner:
 	def get_occurrence_list_per_term(self, terms:List) -> Mapping[str, List[TermOccurrence]]:
 		"""
 			Retorna dicionario a lista de ocorrencia no indice de cada termo passado como parametro.
-			Caso o termo nao exista, este termo possuirá uma lista vazia
+			Caso o termo nao exista, este termo possuirá uma lista vazia.
+			No caso do FileIndexReader, a lista é uma visão (PostingView) sobre o arquivo mapeado,
+			usada diretamente pelos modelos de ranking
 		"""
 		dic_terms = {}
 		for term in terms:
@@ -80,10 +87,11 @@ class QueryRunner:
 				dic_terms[term] = self.index.get_occurrence_list(term)		
 
 		return dic_terms
-	def get_docs_term(self, query:str) -> List[int]:
+	def get_docs_term(self, query:str, k:int=None) -> List[int]:
 		"""
 			A partir do indice, retorna a lista de ids de documentos desta consulta
-			usando o modelo especificado pelo atributo ranking_model
+			usando o modelo especificado pelo atributo ranking_model.
+			Caso k seja informado, apenas os k primeiros documentos são retornados
 		"""
 		cleaner_query = self.cleaner.preprocess_word(query)
 		
@@ -93,9 +101,22 @@ class QueryRunner:
 		lista = cleaner_query.split(" ")
 		dic_occur_per_term_query = self.get_occurrence_list_per_term(lista)
 		#utilize o ranking_model para retornar o documentos ordenados considrando dic_query_occur e dic_occur_per_term_query
-		return self.ranking_model.get_ordered_docs(dic_query_occur,dic_occur_per_term_query)
+		return self.ranking_model.get_ordered_docs(dic_query_occur,dic_occur_per_term_query,k)
 		
 
+	def get_docs_boolean_query(self, query:str, k:int=None) -> List[int]:
+		"""
+			Avalia uma consulta booleana estruturada (AND, OR, NOT, parênteses e frases entre aspas),
+			retornando, em ordem de doc_id, os documentos que a satisfazem (apenas os k primeiros, caso k
+			seja informado). A árvore é reorganizada pelo planejador (ver AndNode.plan) e avaliada sob
+			demanda por meio dos iteradores das ocorrências
+		"""
+		node = BooleanQueryParser(self.cleaner.preprocess_word).parse(query)
+		if node is None:
+			return []
+		iterator = node.plan(self.index).iterator(self.index)
+		return list(islice(iterate_doc_ids(iterator),k))
+
 	@staticmethod
 	def runQuery(query:str, indice:Index, indice_pre_computado: IndexPreComputedVals, map_relevantes):
 		time_checker = CheckTime()
@@ -105,20 +126,24 @@ class QueryRunner:
 		#abaixo, existem exemplos fixos.
         
 		mod = RankingModel()
-		clean = Cleaner(stop_words_file="stopwords.txt",language="portuguese",
+		clean = Cleaner.shared(stop_words_file="stopwords.txt",language="portuguese",
                         perform_stop_words_removal=False,perform_accents_removal=False,
                         perform_stemming=False)
-		modelo = int(input("Selecione um dos modelos:\n1)Modelo Booleano\n2)Modelo Vetorial"))
+		modelo = int(input("Selecione um dos modelos:\n1)Modelo Booleano\n2)Modelo Vetorial\n3)BM25"))
 		if modelo == 1:
-			operador = int(input("Qual dos termos deseja utilizar?1)AND\n2)OR"))
+			operador = int(input("Qual dos termos deseja utilizar?1)AND\n2)OR\n3)Consulta estruturada (AND, OR, NOT, parênteses e aspas)"))
 			if operador==1:
 				mod = BooleanRankingModel(OPERATOR.AND)
 			elif operador==2:
 				mod = BooleanRankingModel(OPERATOR.OR)
+			elif operador==3:
+				mod = None
 			else:
 				raise Exception("Opção inválida. A execução foi interrompida.")
 		elif modelo==2:
 			mod = VectorRankingModel(indice_pre_computado)
+		elif modelo==3:
+			mod = BM25RankingModel(indice_pre_computado)
 		else:
 			raise Exception("Opção inválida. A execução foi interrompida.")
 		
@@ -127,7 +152,12 @@ class QueryRunner:
 		time_checker.printDelta("Query Creation")
 
 		#Utilize o método get_docs_term para obter a lista de documentos que responde esta consulta
-		respostas = qr.get_docs_term(query)
+		#(apenas o top 50, o maior top avaliado abaixo)
+		arr_top = [5,10,20,50]
+		if mod is None:
+			respostas = qr.get_docs_boolean_query(query,max(arr_top)),None
+		else:
+			respostas = qr.get_docs_term(query,max(arr_top))
 		time_checker.printDelta(f"anwered with {len(respostas)} docs")
 
 		#nesse if, vc irá verificar se o termo possui documentos relevantes associados a ele
@@ -135,12 +165,11 @@ class QueryRunner:
 		#O for que fiz abaixo é só uma sugestao e o metododo countTopNRelevants podera auxiliar no calculo da revocacao e precisao
 	
 		if(query in map_relevantes.keys()):
-			arr_top = [5,10,20,50]
 			revocacao = 0 
 			precisao = 0
 			for n in arr_top:
 				revocacao = qr.count_topn_relevant(n,respostas[0],set(map_relevantes[query])) / len(map_relevantes[query]) #substitua aqui pelo calculo da revocacao topN
-				precisao = qr.count_topn_relevant(n,respostas[0],set(map_relevantes[query])) / len(respostas[0]) #substitua aqui pelo calculo da revocacao topN
+				precisao = qr.count_topn_relevant(n,respostas[0],set(map_relevantes[query])) / n #substitua aqui pelo calculo da revocacao topN
 				filter(map_relevantes, respostas[0])
 				print(f"Precisao {n}: {precisao}")
 				print(f"Recall {n}: {revocacao} \n")
@@ -151,30 +180,35 @@ class QueryRunner:
 
 	@staticmethod
 	def main():
-		#leia o indice (base da dados fornecida)
-		index = FileIndex()
+		#leia o indice (base da dados fornecida). Caso o indice já tenha sido salvo,
+		#ele é reaberto (apenas os metadados são lidos) em vez de ser reconstruído
+		if os.path.exists(os.path.join(QueryRunner.INDEX_DIR,FileIndex.MANIFEST_FILE)):
+			index = FileIndex.open(QueryRunner.INDEX_DIR)
+		else:
+			index = FileIndex()
 		
-		index.index("irlanda",37632,1)
-		index.index("irlanda",39300,3)
-		index.index("espero",39300,1)
-		index.index("que",11953,1)
-		index.index("irlanda",11953,1)
-		index.index("você",11953,1)
-		index.index("se",11953,1)
-		index.index("irlanda",37632,4)
+			index.index("irlanda",37632,1)
+			index.index("irlanda",39300,3)
+			index.index("espero",39300,1)
+			index.index("que",11953,1)
+			index.index("irlanda",11953,1)
+			index.index("você",11953,1)
+			index.index("se",11953,1)
+			index.index("irlanda",37632,4)
 		
-		index.index("que",44259,1)
-		index.index("irlanda",44259,1)
-		index.index("estejam",44259,1)
-		index.index("se",44259,1)
-		index.index("irlanda",111966,4)
-
-		index.index("que",51714,1)
-		index.index("irlanda",51714,1)
-		index.index("estejam",51714,1)
-		index.index("se",51714,1)
+			index.index("que",44259,1)
+			index.index("irlanda",44259,1)
+			index.index("estejam",44259,1)
+			index.index("se",44259,1)
+			index.index("irlanda",111966,4)
+
+			index.index("que",51714,1)
+			index.index("irlanda",51714,1)
+			index.index("estejam",51714,1)
+			index.index("se",51714,1)
 		
-		index.finish_indexing()
+			index.finish_indexing()
+			index.save(QueryRunner.INDEX_DIR)
 		#Checagem se existe um documento (apenas para teste, deveria existir)
 		print(f"Existe o doc? index.hasDocId(105047)")
 		
@@ -2,12 +2,41 @@ from typing import List
 from abc import abstractmethod
 from typing import List, Set,Mapping
 from index.structure import TermOccurrence
+from index.reader import posting_columns, posting_iterator
+from index.posting_iterator import ConjunctionIterator, DisjunctionIterator, iterate_doc_ids
 import math
+import heapq
 from enum import Enum
+#NumPy é opcional: sem ele, os pesos são calculados por ocorrência em Python
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def posting_arrays(occurrences):
+    """
+        doc_ids e frequências de uma lista de ocorrências como arrays NumPy
+    """
+    doc_ids, term_freqs = posting_columns(occurrences)
+    return np.asarray(doc_ids,dtype=np.int64), np.asarray(term_freqs,dtype=np.int64)
+
+
+def weights_per_posting(term_freqs, weight):
+    """
+        Aplica weight (função da frequência) a cada frequência de term_freqs. A função é
+        avaliada em Python apenas uma vez por frequência distinta (poucas), assim os
+        valores são exatamente os mesmos do cálculo por ocorrência
+    """
+    arr_freqs, arr_positions = np.unique(term_freqs,return_inverse=True)
+    arr_weights = np.array([weight(term_freq) for term_freq in arr_freqs.tolist()],dtype=np.float64)
+    return arr_weights[arr_positions]
+
 
 class IndexPreComputedVals():
-    def __init__(self,index):
+    def __init__(self,index,use_numpy:bool=True):
         self.index = index
+        self.use_numpy = use_numpy and np is not None
         self.precompute_vals()
 
     def precompute_vals(self):
@@ -15,20 +44,52 @@ class IndexPreComputedVals():
         Inicializa os atributos por meio do indice (idx):
             doc_count: o numero de documentos que o indice possui
             document_norm: A norma por documento (cada termo é presentado pelo seu peso (tfxidf))
+            document_length: O tamanho (soma das frequências dos termos) por documento
+            dic_term_max_weight: O maior valor de tf/norma de cada termo (ver term_max_weight)
+            dic_term_max_freq/dic_term_min_length: A maior frequência de cada termo e o tamanho do menor
+                documento que o contém (ver term_length_bounds)
+        Caso o índice já possua as estatísticas dos documentos e dos termos (calculadas em finish_indexing),
+        as ocorrências não são percorridas
         """
         self.document_norm = {}
+        self.document_length = {}
+        self.dic_term_max_weight = {}
+        self.dic_term_max_freq = {}
+        self.dic_term_min_length = {}
+        self.term_stats = None
+        self.norm_correction = 1.0
+        #expurgos do índice já considerados (ver refresh)
+        self.int_purges = getattr(self.index,"int_purges",0)
         self.doc_count = self.index.document_count
+        document_stats = getattr(self.index,"document_stats",None)
+        if document_stats is not None:
+            set_documents = self.index.set_documents
+            for doc_id, length, norm in zip(document_stats.doc_ids,document_stats.lengths,document_stats.norms):
+                if doc_id in set_documents:
+                    self.document_norm[doc_id] = round(norm,2)
+                    self.document_length[doc_id] = length
+                    #os limites dos termos foram calculados com as normas sem arredondamento
+                    if self.document_norm[doc_id] > 0:
+                        self.norm_correction = max(self.norm_correction,norm/self.document_norm[doc_id])
+            self.term_stats = getattr(self.index,"term_stats",None)
+            self.total_length = sum(self.document_length.values())
+            return
+        if self.use_numpy:
+            self.precompute_vals_numpy()
+            return
         sum_doc  = dict() 
         term_idf = dict()
         for term in list(self.index.dic_index.keys()):
             occurrence_list = self.index.get_occurrence_list(term)
-            for item in occurrence_list:
-                tf_idf = VectorRankingModel.tf_idf(self.doc_count,item.term_freq,len(occurrence_list))
+            doc_ids, term_freqs = posting_columns(occurrence_list)
+            for doc_id, term_freq in zip(doc_ids, term_freqs):
+                self.document_length[doc_id] = self.document_length.get(doc_id,0)+term_freq
+                tf_idf = VectorRankingModel.tf_idf(self.doc_count,term_freq,len(occurrence_list))
                 if term not in term_idf.keys():
                     term_idf[term] = list()
-                    term_idf[term].append((item.doc_id,tf_idf))
+                    term_idf[term].append((doc_id,tf_idf,term_freq))
                 else:
-                    term_idf[term].append((item.doc_id,tf_idf))
+                    term_idf[term].append((doc_id,tf_idf,term_freq))
         for term in term_idf.keys():
             for occurrence in term_idf[term]:
                 if occurrence[0] in sum_doc:
@@ -37,18 +98,281 @@ class IndexPreComputedVals():
                     sum_doc[occurrence[0]] = math.pow(occurrence[1],2)
         for x in self.index.set_documents:
             self.document_norm[x] = round(math.sqrt(sum_doc[x]),2)
+        self.total_length = sum(self.document_length.values())
+        for term in term_idf.keys():
+            self.dic_term_max_weight[term] = max(self.normalized_tf(doc_id,term_freq) for doc_id,_,term_freq in term_idf[term])
+            self.dic_term_max_freq[term] = max(term_freq for _,_,term_freq in term_idf[term])
+            self.dic_term_min_length[term] = min(self.document_length[doc_id] for doc_id,_,_ in term_idf[term])
+
+    def normalized_tf(self,doc_id:int,term_freq:int) -> float:
+        return self.normalized_weight(doc_id,VectorRankingModel.tf(term_freq))
+
+    def normalized_weight(self,doc_id:int,weight:float) -> float:
+        """
+            Peso dividido pela norma do documento. Os documentos sem norma ou com norma zero
+            (ex.: apenas termos presentes em todos os documentos, com idf zero) têm peso zero
+        """
+        norm = self.document_norm.get(doc_id,0)
+        return weight/norm if norm > 0 else 0
+
+    def precompute_vals_numpy(self):
+        """
+            Mesmo cálculo de precompute_vals com as ocorrências em arrays: os pesos de cada
+            documento são somados (np.bincount) na mesma ordem do cálculo em Python
+        """
+        lst_terms = []
+        lst_doc_ids = []
+        lst_term_freqs = []
+        lst_weights = []
+        for term in list(self.index.dic_index.keys()):
+            doc_ids, term_freqs = posting_arrays(self.index.get_occurrence_list(term))
+            if len(doc_ids) == 0:
+                continue
+            int_docs_with_term = len(doc_ids)
+            lst_terms.append(term)
+            lst_doc_ids.append(doc_ids)
+            lst_term_freqs.append(term_freqs)
+            lst_weights.append(weights_per_posting(term_freqs,
+                lambda term_freq: math.pow(VectorRankingModel.tf_idf(self.doc_count,term_freq,int_docs_with_term),2)))
+        self.total_length = 0
+        if len(lst_doc_ids) == 0:
+            return
+        arr_docs, arr_positions = np.unique(np.concatenate(lst_doc_ids),return_inverse=True)
+        arr_sums = np.bincount(arr_positions,weights=np.concatenate(lst_weights))
+        arr_lengths = np.bincount(arr_positions,weights=np.concatenate(lst_term_freqs))
+        sum_doc = dict(zip(arr_docs.tolist(),arr_sums.tolist()))
+        self.document_length = dict(zip(arr_docs.tolist(),arr_lengths.astype(np.int64).tolist()))
+        self.total_length = sum(self.document_length.values())
+        for x in self.index.set_documents:
+            self.document_norm[x] = round(math.sqrt(sum_doc[x]),2)
+
+        #maior tf/norma de cada termo: os documentos sem norma (ou com norma zero) são desconsiderados
+        arr_norms = np.array([self.document_norm.get(doc_id,0) for doc_id in arr_docs.tolist()],dtype=np.float64)
+        arr_norms[arr_norms <= 0] = np.inf
+        arr_normalized_tfs = np.concatenate([weights_per_posting(term_freqs,VectorRankingModel.tf) for term_freqs in lst_term_freqs])/arr_norms[arr_positions]
+        arr_term_starts = np.cumsum([0]+[len(doc_ids) for doc_ids in lst_doc_ids[:-1]])
+        self.dic_term_max_weight = dict(zip(lst_terms,np.maximum.reduceat(arr_normalized_tfs,arr_term_starts).tolist()))
+        self.dic_term_max_freq = dict(zip(lst_terms,np.maximum.reduceat(np.concatenate(lst_term_freqs),arr_term_starts).tolist()))
+        arr_lengths = arr_lengths.astype(np.int64)
+        self.dic_term_min_length = dict(zip(lst_terms,np.minimum.reduceat(arr_lengths[arr_positions],arr_term_starts).tolist()))
+
+    @property
+    def avg_document_length(self) -> float:
+        return self.total_length/len(self.document_length) if len(self.document_length) > 0 else 0
+
+    def term_length_bounds(self,term:str):
+        """
+            Retorna a maior frequência do termo e o tamanho do menor documento que o contém
+            (ou None, caso sejam desconhecidos)
+        """
+        if term in self.dic_term_max_freq:
+            return self.dic_term_max_freq[term],self.dic_term_min_length[term]
+        if self.term_stats is not None:
+            term_id = self.index.get_term_id(term)
+            if term_id is not None:
+                try:
+                    return self.term_stats.max_term_freq(term_id),self.term_stats.min_length(term_id)
+                except KeyError:
+                    pass
+        return None
+
+    def term_max_weight(self,term:str) -> float:
+        """
+            Limite superior de tf/norma do termo entre os documentos: multiplicado pelo idf e pelo peso
+            do termo na consulta, é o limite superior da contribuição do termo à similaridade de um documento.
+            Retorna math.inf caso o limite seja desconhecido
+        """
+        if term in self.dic_term_max_weight:
+            return self.dic_term_max_weight[term]
+        if self.term_stats is not None:
+            term_id = self.index.get_term_id(term)
+            if term_id is not None:
+                try:
+                    return self.term_stats.max_weight(term_id)*self.norm_correction
+                except KeyError:
+                    pass
+        return math.inf
+
+    def refresh(self):
+        """
+            Recalcula os valores caso o índice tenha sido expurgado (purge_deleted ou intercalação de
+            segmentos) desde o último cálculo. Entre dois expurgos, as remoções e atualizações não recalculam
+            as normas dos demais documentos (ver delete_document)
+        """
+        if getattr(self.index,"int_purges",0) != self.int_purges:
+            self.precompute_vals()
+
+    def delete_document(self,doc_id:int):
+        """
+            Atualiza os valores após a remoção do documento no índice, sem percorrer as ocorrências.
+            A remoção altera N e o df dos termos do documento e, portanto, o idf usado na norma dos demais
+            documentos: essas normas permanecem com os valores do último cálculo (a consulta usa o N e o df
+            atuais) até o próximo expurgo do índice, quando são recalculadas (ver refresh). O tamanho dos
+            documentos (BM25) é sempre exato
+        """
+        if doc_id in self.document_norm:
+            del self.document_norm[doc_id]
+        if doc_id in self.document_length:
+            self.total_length -= self.document_length[doc_id]
+            del self.document_length[doc_id]
+        self.doc_count = self.index.document_count
+
+    def update_document(self,doc_id:int,dic_term_freq:Mapping[str,int]):
+        """
+            Atualiza os valores após a atualização do documento no índice (dic_term_freq: termo -> frequência):
+            a norma do documento é calculada com o N e o df atuais; as normas dos demais documentos são
+            recalculadas apenas no próximo expurgo do índice (ver delete_document)
+        """
+        self.doc_count = self.index.document_count
+        sum_doc = 0
+        for term,term_freq in dic_term_freq.items():
+            tf_idf = VectorRankingModel.tf_idf(self.doc_count,term_freq,self.index.document_count_with_term(term))
+            sum_doc += math.pow(tf_idf,2)
+        self.document_norm[doc_id] = round(math.sqrt(sum_doc),2)
+        self.total_length += sum(dic_term_freq.values())-self.document_length.get(doc_id,0)
+        self.document_length[doc_id] = sum(dic_term_freq.values())
+        for term,term_freq in dic_term_freq.items():
+            length_bounds = self.term_length_bounds(term)
+            if length_bounds is None:
+                length_bounds = (0,math.inf)
+            self.dic_term_max_freq[term] = max(length_bounds[0],term_freq)
+            self.dic_term_min_length[term] = min(length_bounds[1],self.document_length[doc_id])
+            #termo sem limite conhecido: ocorre apenas em documentos atualizados após o cálculo dos valores
+            max_weight = self.term_max_weight(term)
+            if max_weight == math.inf:
+                max_weight = 0
+            self.dic_term_max_weight[term] = max(max_weight,self.normalized_tf(doc_id,term_freq))
             
 class RankingModel():
+    #folga para erros de arredondamento de ponto flutuante ao comparar limites superiores (MaxScore)
+    PRUNING_EPSILON = 1e-9
+    #quanto o peso final de um documento pode exceder a soma das contribuições (ver document_weight)
+    ROUNDING_SLACK = 0
+
     @abstractmethod
     def get_ordered_docs(self,query:Mapping[str,TermOccurrence],
-                              docs_occur_per_term:Mapping[str,List[TermOccurrence]]) -> (List[int], Mapping[int,float]):
+                              docs_occur_per_term:Mapping[str,List[TermOccurrence]],k:int=None) -> (List[int], Mapping[int,float]):
+        """
+            Retorna os documentos ordenados e seus pesos. Caso k seja informado, apenas os k primeiros
+            documentos (e seus pesos) são retornados
+        """
         raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
 
-    def rank_document_ids(self,documents_weight):
+    def rank_document_ids(self,documents_weight,k:int=None):
+        """
+            Ordena os documentos pelo peso e, em caso de empate, pelo doc_id (-peso, doc_id): o mesmo
+            desempate de todos os modelos, independente da ordem das listas de ocorrências.
+            Caso k seja informado, apenas os k primeiros são selecionados, por meio de um heap de tamanho k
+        """
+        rank_key = lambda doc_id:(-documents_weight[doc_id],doc_id)
+        if k is not None:
+            return heapq.nsmallest(k,documents_weight,key=rank_key)
         doc_ids = list(documents_weight.keys())
-        doc_ids.sort(key= lambda x:-documents_weight[x])
+        doc_ids.sort(key=rank_key)
         return doc_ids
 
+    def rank_top_k(self,documents_weight,k:int=None) -> (List[int], Mapping[int,float]):
+        """
+            Retorna os documentos ordenados e os seus pesos (apenas os k primeiros, caso k seja informado)
+        """
+        doc_ids = self.rank_document_ids(documents_weight,k)
+        if k is None:
+            return doc_ids,documents_weight
+        return doc_ids,{doc_id:documents_weight[doc_id] for doc_id in doc_ids}
+
+    def document_scale(self,doc_id:int) -> float:
+        """
+            Fator que converte a soma das contribuições dos termos na escala dos limites superiores dos termos
+        """
+        return 1
+
+    def document_weight(self,doc_id:int,sum_weight:float) -> float:
+        """
+            Peso final do documento a partir da soma das contribuições dos termos
+        """
+        return sum_weight
+
+    def max_score_top_k(self,lst_terms:List,k:int) -> (List[int], Mapping[int,float]):
+        """
+            Avalia a consulta documento a documento (em ordem de doc_id) com o algoritmo MaxScore,
+            retornando os k primeiros documentos. lst_terms possui, para cada termo com ocorrências,
+            (limite superior da contribuição do termo, posição do termo na consulta, iterador das ocorrências,
+            função (doc_id, term_freq) -> contribuição). O limite é dado na escala de document_scale.
+
+            Os termos são ordenados pelo limite: os de menor limite cuja soma dos limites não alcança o peso
+            do k-ésimo documento são não essenciais. Os documentos são obtidos apenas dos termos essenciais,
+            lidos um bloco por vez, e as listas dos não essenciais só são avançadas (advance) enquanto o
+            documento ainda puder entrar no top-k.
+
+            O resultado é o mesmo da avaliação termo a termo: as contribuições são somadas na ordem dos
+            termos da consulta e, nos empates, vence o menor doc_id (ver rank_document_ids)
+        """
+        lst_terms = sorted(lst_terms,key=lambda term_data:term_data[0])
+        for _,_,iterator,_ in lst_terms:
+            iterator.next()
+        #arr_prefix_bounds[i]: soma dos limites dos termos 0..i
+        arr_prefix_bounds = []
+        for bound,_,_,_ in lst_terms:
+            arr_prefix_bounds.append(bound+(arr_prefix_bounds[-1] if arr_prefix_bounds else 0))
+
+        #heap com os k melhores: (peso, -doc_id), o pior na raiz
+        lst_heap = []
+        #um documento só entra no top-k caso a soma das contribuições (na escala dos limites) seja ao menos cutoff
+        cutoff = -math.inf
+        int_non_essential = 0
+        document_scale = self.document_scale
+        while True:
+            lst_essential = [term_data for term_data in lst_terms[int_non_essential:] if term_data[2].doc_id is not None]
+            if len(lst_essential) == 0:
+                break
+            #as listas essenciais são lidas um bloco por vez (ver PostingIterator.next_block), até o menor dos
+            #maiores doc_ids dos blocos atuais: assim, cada ocorrência não é obtida por uma chamada a next
+            #e os documentos candidatos da janela são apenas ordenados, sem comparar as listas a cada documento
+            int_window_end = min(iterator.block_max_doc_id() for _,_,iterator,_ in lst_essential)
+            dic_window = {}
+            for _,term_pos,iterator,posting_weight in lst_essential:
+                for doc_id,term_freq in zip(*iterator.next_block(int_window_end)):
+                    if doc_id in dic_window:
+                        dic_window[doc_id].append((term_pos,posting_weight(doc_id,term_freq)))
+                    else:
+                        dic_window[doc_id] = [(term_pos,posting_weight(doc_id,term_freq))]
+            #os termos que deixarem de ser essenciais durante a janela já foram lidos até o seu final
+            int_window_non_essential = int_non_essential
+            for doc_id in sorted(dic_window):
+                lst_weights = dic_window[doc_id]
+                if int_window_non_essential > 0:
+                    score_bound = 0
+                    for _,term_weight in lst_weights:
+                        score_bound += term_weight
+                    scale = document_scale(doc_id)
+                    score_bound *= scale
+                for i in range(int_window_non_essential-1,-1,-1):
+                    if score_bound+arr_prefix_bounds[i] < cutoff:
+                        break
+                    _,term_pos,iterator,posting_weight = lst_terms[i]
+                    #advance também pula blocos inteiros das listas não essenciais
+                    if iterator.advance(doc_id) == doc_id:
+                        term_weight = posting_weight(doc_id,iterator.term_freq)
+                        lst_weights.append((term_pos,term_weight))
+                        score_bound += term_weight*scale
+                else:
+                    #mesma ordem de soma da avaliação termo a termo
+                    lst_weights.sort()
+                    sum_weight = 0
+                    for _,term_weight in lst_weights:
+                        sum_weight = sum_weight+term_weight
+                    entry = (self.document_weight(doc_id,sum_weight),-doc_id)
+                    if len(lst_heap) < k:
+                        heapq.heappush(lst_heap,entry)
+                    elif entry > lst_heap[0]:
+                        heapq.heapreplace(lst_heap,entry)
+                    if len(lst_heap) == k:
+                        cutoff = lst_heap[0][0]-self.ROUNDING_SLACK-RankingModel.PRUNING_EPSILON
+                        while int_non_essential < len(lst_terms) and arr_prefix_bounds[int_non_essential] < cutoff:
+                            int_non_essential += 1
+        lst_heap.sort(reverse=True)
+        return [-neg_doc_id for _,neg_doc_id in lst_heap],{-neg_doc_id:weight for weight,neg_doc_id in lst_heap}
+
 class OPERATOR(Enum):
   AND = 1
   OR = 2
@@ -59,36 +383,41 @@ class BooleanRankingModel(RankingModel):
         self.operator = operator
 
     def intersection_all(self,map_lst_occurrences:Mapping[str,List[TermOccurrence]]) -> List[int]:
-        set_ids = set()
-        set_discover_ids = set()
-        for  term, lst_occurrences in map_lst_occurrences.items():
-             for occurrenc in lst_occurrences:
-                if occurrenc.doc_id not in set_discover_ids:
-                    set_discover_ids.add(occurrenc.doc_id)
-                elif occurrenc.doc_id in set_discover_ids and occurrenc.doc_id not in set_ids:
-                    set_ids.add(occurrenc.doc_id)
-        return list(set_ids)
+        """
+            Interseção de qualquer quantidade de listas, percorrida a partir da menor delas: as demais
+            apenas avançam (busca exponencial / saltos de bloco) até o doc_id candidato
+        """
+        if len(map_lst_occurrences) == 0:
+            return []
+        iterator = ConjunctionIterator([posting_iterator(lst_occurrences) for lst_occurrences in map_lst_occurrences.values()])
+        return list(iterate_doc_ids(iterator))
+
     def union_all(self,map_lst_occurrences:Mapping[str,List[TermOccurrence]]) -> List[int]:
-        set_ids = set()
-        for term, lst_occurrences in map_lst_occurrences.items():
-            for occurrenc in lst_occurrences:
-                if occurrenc.doc_id not in set_ids:
-                    set_ids.add(occurrenc.doc_id)
-        return list(set_ids)
+        """
+            União das listas por meio da intercalação (heap) dos iteradores, em ordem de doc_id
+        """
+        iterator = DisjunctionIterator([posting_iterator(lst_occurrences) for lst_occurrences in map_lst_occurrences.values()])
+        return list(iterate_doc_ids(iterator))
 
     def get_ordered_docs(self,query:Mapping[str,TermOccurrence],
-                              map_lst_occurrences:Mapping[str,List[TermOccurrence]]) -> (List[int], Mapping[int,float]):
+                              map_lst_occurrences:Mapping[str,List[TermOccurrence]],k:int=None) -> (List[int], Mapping[int,float]):
         """Considere que map_lst_occurrences possui as ocorrencias apenas dos termos que existem na consulta"""
         if self.operator == OPERATOR.AND:
-            return self.intersection_all(map_lst_occurrences),None
+            return self.intersection_all(map_lst_occurrences)[:k],None
         else:
-            return self.union_all(map_lst_occurrences),None
+            return self.union_all(map_lst_occurrences)[:k],None
 
 #Atividade 2
 class VectorRankingModel(RankingModel):
 
-    def __init__(self,idx_pre_comp_vals:IndexPreComputedVals):
+    #o peso final é arredondado com duas casas decimais
+    ROUNDING_SLACK = 0.005
+
+    def __init__(self,idx_pre_comp_vals:IndexPreComputedVals,use_numpy:bool=True,dynamic_pruning:bool=False):
         self.idx_pre_comp_vals = idx_pre_comp_vals
+        self.use_numpy = use_numpy and np is not None
+        #avaliação documento a documento com MaxScore nas consultas top-k (ver get_ordered_docs_max_score)
+        self.dynamic_pruning = dynamic_pruning
 
     @staticmethod
     def tf(freq_term:int) -> float:
@@ -105,38 +434,192 @@ class VectorRankingModel(RankingModel):
         #print(f"TF:{tf} IDF:{idf} f: {freq_term} n_i: {num_docs_with_term} N: {doc_count}")
         return tf*idf
 
+    def term_weight(self,query_term:TermOccurrence,int_docs_with_term:int):
+        """
+            Retorna a função que calcula, a partir da frequência do termo no documento,
+            o peso wij*wiq da ocorrência (wiq e o idf são os mesmos em todas as ocorrências do termo)
+        """
+        doc_count = self.idx_pre_comp_vals.doc_count
+        wiq = VectorRankingModel.tf_idf(doc_count,query_term.term_freq,int_docs_with_term)
+        return lambda term_freq: VectorRankingModel.tf_idf(doc_count,term_freq,int_docs_with_term)*wiq
+
     def get_ordered_docs(self,query:Mapping[str,TermOccurrence],
-                              docs_occur_per_term:Mapping[str,List[TermOccurrence]]) -> (List[int], Mapping[int,float]):
-            documents_weight = {}
-            term_idf = dict()
-            sum_doc  = dict()
-            docs_find = []
-            doc_count=0 
-            for item in docs_occur_per_term:
-                for occurrenc in docs_occur_per_term[item]:
-                    if occurrenc.doc_id not in docs_find:
-                        docs_find.append(occurrenc.doc_id)
-                    if occurrenc.doc_id > doc_count:
-                        doc_count = occurrenc.doc_id
-            for term in docs_occur_per_term.keys():
-                for item in docs_occur_per_term[term]:
-                    wiq = VectorRankingModel.tf_idf(doc_count,query[term].term_freq,len(docs_occur_per_term[term]))
-                    wij = VectorRankingModel.tf_idf(self.idx_pre_comp_vals.doc_count,item.term_freq,len(docs_occur_per_term[term]))
-                    tf_idf = wij*wiq
-                    if term not in term_idf.keys():
-                        term_idf[term] = list()
-                        term_idf[term].append((item.doc_id,tf_idf))
-                    else:
-                        term_idf[term].append((item.doc_id,tf_idf))
-            for term in term_idf.keys():
-                for occurrence in term_idf[term]:
-                    if occurrence[0] in sum_doc:
-                        sum_doc[occurrence[0]] =  sum_doc[occurrence[0]] + occurrence[1]
-                    else: 
-                        sum_doc[occurrence[0]] = occurrence[1]
-            for x in docs_find:
-                if x in sum_doc:
-                    documents_weight[x] = round(sum_doc[x]/self.idx_pre_comp_vals.document_norm[x],2)
+                              docs_occur_per_term:Mapping[str,List[TermOccurrence]],k:int=None) -> (List[int], Mapping[int,float]):
+            """
+                Avalia a consulta termo a termo: o peso de cada ocorrência é somado no acumulador
+                (doc_id -> soma dos pesos). O peso é calculado uma vez por frequência distinta do termo
+            """
+            #normas recalculadas após o expurgo das remoções/atualizações de documentos
+            self.idx_pre_comp_vals.refresh()
+            if k is not None and self.dynamic_pruning:
+                return self.get_ordered_docs_max_score(query,docs_occur_per_term,k)
+            if self.use_numpy:
+                return self.get_ordered_docs_numpy(query,docs_occur_per_term,k)
+            dic_accumulator = {}
+            for term,occurrences in docs_occur_per_term.items():
+                doc_ids, term_freqs = posting_columns(occurrences)
+                if len(doc_ids) == 0:
+                    continue
+                weight = self.term_weight(query[term],len(doc_ids))
+                dic_weight_per_freq = {}
+                for doc_id, term_freq in zip(doc_ids, term_freqs):
+                    if term_freq not in dic_weight_per_freq:
+                        dic_weight_per_freq[term_freq] = weight(term_freq)
+                    dic_accumulator[doc_id] = dic_accumulator.get(doc_id,0)+dic_weight_per_freq[term_freq]
+            normalized_weight = self.idx_pre_comp_vals.normalized_weight
+            documents_weight = {doc_id:round(normalized_weight(doc_id,sum_weight),2) for doc_id,sum_weight in dic_accumulator.items()}
             #retona a lista de doc ids ordenados de acordo com o TF IDF
-            return self.rank_document_ids(documents_weight),documents_weight
+            return self.rank_top_k(documents_weight,k)
+
+    def get_ordered_docs_numpy(self,query:Mapping[str,TermOccurrence],
+                              docs_occur_per_term:Mapping[str,List[TermOccurrence]],k:int=None) -> (List[int], Mapping[int,float]):
+        """
+            Mesmo resultado de get_ordered_docs com as ocorrências de cada termo em arrays:
+            os pesos são acumulados (np.bincount) em um array de pontuações indexado pela
+            posição de cada documento em np.unique dos doc_ids.
+
+            Caso k seja informado, apenas os candidatos ao top-k (selecionados por np.partition)
+            têm seus pesos arredondados e ordenados
+        """
+        lst_doc_ids = []
+        lst_weights = []
+        for term,occurrences in docs_occur_per_term.items():
+            doc_ids, term_freqs = posting_arrays(occurrences)
+            if len(doc_ids) == 0:
+                continue
+            lst_doc_ids.append(doc_ids)
+            lst_weights.append(weights_per_posting(term_freqs,self.term_weight(query[term],len(doc_ids))))
+        if len(lst_doc_ids) == 0:
+            return [],{}
+        arr_docs, arr_positions = np.unique(np.concatenate(lst_doc_ids),return_inverse=True)
+        arr_scores = np.bincount(arr_positions,weights=np.concatenate(lst_weights))
+        document_norm = self.idx_pre_comp_vals.document_norm
+        arr_norms = np.array([document_norm.get(doc_id,0) for doc_id in arr_docs.tolist()],dtype=np.float64)
+        #mesma regra de IndexPreComputedVals.normalized_weight: peso zero para os documentos sem norma
+        arr_weights = np.zeros(len(arr_scores),dtype=np.float64)
+        np.divide(arr_scores,arr_norms,out=arr_weights,where=arr_norms > 0)
+        if k is not None and k < len(arr_weights):
+            #o arredondamento altera cada peso em no máximo 0.005: todo documento do top-k (considerando
+            #o peso arredondado) possui peso de pelo menos o k-ésimo maior peso menos 0.01
+            weight_k = np.partition(arr_weights,len(arr_weights)-k)[len(arr_weights)-k]
+            arr_candidates = np.flatnonzero(arr_weights >= weight_k-0.01)
+            arr_docs = arr_docs[arr_candidates]
+            arr_weights = arr_weights[arr_candidates]
+        documents_weight = {doc_id:round(weight,2) for doc_id,weight in zip(arr_docs.tolist(),arr_weights.tolist())}
+        return self.rank_top_k(documents_weight,k)
+
+    def get_ordered_docs_max_score(self,query:Mapping[str,TermOccurrence],
+                              docs_occur_per_term:Mapping[str,List[TermOccurrence]],k:int) -> (List[int], Mapping[int,float]):
+        """
+            Avalia a consulta documento a documento (em ordem de doc_id) com o algoritmo MaxScore,
+            retornando os k primeiros documentos. Os termos são ordenados pelo limite superior de sua
+            contribuição (idf * peso na consulta * term_max_weight). Os termos de menor limite cuja soma
+            dos limites não alcança o peso do k-ésimo documento são não essenciais: os documentos são
+            obtidos apenas dos termos essenciais e as listas dos não essenciais só são avançadas (advance)
+            enquanto o documento ainda puder entrar no top-k.
+
+            O resultado é o mesmo da avaliação completa (ver RankingModel.max_score_top_k)
+        """
+        if k <= 0:
+            return [],{}
+        precomp = self.idx_pre_comp_vals
+        lst_terms = []
+        for term_pos,(term,occurrences) in enumerate(docs_occur_per_term.items()):
+            int_docs_with_term = len(occurrences)
+            if int_docs_with_term == 0:
+                continue
+            idf = VectorRankingModel.idf(precomp.doc_count,int_docs_with_term)
+            bound = 0
+            if idf != 0:
+                bound = VectorRankingModel.tf_idf(precomp.doc_count,query[term].term_freq,int_docs_with_term)*idf*precomp.term_max_weight(term)
+            weight = self.term_weight(query[term],int_docs_with_term)
+            dic_weight_per_freq = {}
+            def posting_weight(doc_id,term_freq,weight=weight,dic_weight_per_freq=dic_weight_per_freq):
+                if term_freq not in dic_weight_per_freq:
+                    dic_weight_per_freq[term_freq] = weight(term_freq)
+                return dic_weight_per_freq[term_freq]
+            lst_terms.append((bound,term_pos,posting_iterator(occurrences),posting_weight))
+        return self.max_score_top_k(lst_terms,k)
+
+    def document_scale(self,doc_id:int) -> float:
+        return self.idx_pre_comp_vals.normalized_weight(doc_id,1)
+
+    def document_weight(self,doc_id:int,sum_weight:float) -> float:
+        return round(self.idx_pre_comp_vals.normalized_weight(doc_id,sum_weight),2)
+
+class BM25RankingModel(RankingModel):
+    """
+        Modelo probabilístico BM25: a contribuição de um termo ao documento é
+            idf * f*(k1+1)/(f + k1*(1-b+b*tamanho/tamanho médio))
+        (f: frequência do termo no documento) multiplicada pela frequência do termo na consulta.
+        Usa apenas o tamanho de cada documento e o tamanho médio (calculados em IndexPreComputedVals)
+    """
+    def __init__(self,idx_pre_comp_vals:IndexPreComputedVals,k1:float=1.2,b:float=0.75,dynamic_pruning:bool=False):
+        self.idx_pre_comp_vals = idx_pre_comp_vals
+        self.k1 = k1
+        self.b = b
+        #avaliação documento a documento com MaxScore nas consultas top-k (ver RankingModel.max_score_top_k)
+        self.dynamic_pruning = dynamic_pruning
+
+    @staticmethod
+    def idf(doc_count:int, num_docs_with_term:int) -> float:
+        #variante que nunca é negativa, mesmo em termos presentes em mais da metade dos documentos
+        return math.log(1+(doc_count-num_docs_with_term+0.5)/(num_docs_with_term+0.5))
+
+    def tf(self,term_freq:int,doc_length:int,avg_doc_length:float) -> float:
+        return term_freq*(self.k1+1)/(term_freq+self.k1*(1-self.b+self.b*doc_length/avg_doc_length))
+
+    def term_weight(self,query_term:TermOccurrence,int_docs_with_term:int):
+        """
+            Retorna a função que calcula, a partir do doc_id e da frequência do termo no documento,
+            a contribuição da ocorrência (o idf e a frequência na consulta são calculados uma única vez)
+        """
+        precomp = self.idx_pre_comp_vals
+        document_length = precomp.document_length
+        avg_doc_length = precomp.avg_document_length
+        query_weight = BM25RankingModel.idf(precomp.doc_count,int_docs_with_term)*query_term.term_freq
+        return lambda doc_id,term_freq: query_weight*self.tf(term_freq,document_length[doc_id],avg_doc_length)
+
+    def term_bound(self,term:str,query_term:TermOccurrence,int_docs_with_term:int) -> float:
+        """
+            Limite superior da contribuição do termo: a parte tf cresce com a frequência e
+            diminui com o tamanho do documento
+        """
+        precomp = self.idx_pre_comp_vals
+        length_bounds = precomp.term_length_bounds(term)
+        if length_bounds is None:
+            return math.inf
+        max_term_freq, min_length = length_bounds
+        query_weight = BM25RankingModel.idf(precomp.doc_count,int_docs_with_term)*query_term.term_freq
+        return query_weight*self.tf(max_term_freq,min_length,precomp.avg_document_length)
+
+    def get_ordered_docs(self,query:Mapping[str,TermOccurrence],
+                              docs_occur_per_term:Mapping[str,List[TermOccurrence]],k:int=None) -> (List[int], Mapping[int,float]):
+        """
+            Avalia a consulta termo a termo, somando as contribuições de cada ocorrência no acumulador
+            (doc_id -> soma), ou documento a documento com MaxScore caso k seja informado e dynamic_pruning esteja ativo
+        """
+        if k is not None and self.dynamic_pruning:
+            return self.get_ordered_docs_max_score(query,docs_occur_per_term,k)
+        dic_accumulator = {}
+        for term,occurrences in docs_occur_per_term.items():
+            doc_ids, term_freqs = posting_columns(occurrences)
+            if len(doc_ids) == 0:
+                continue
+            weight = self.term_weight(query[term],len(doc_ids))
+            for doc_id, term_freq in zip(doc_ids, term_freqs):
+                dic_accumulator[doc_id] = dic_accumulator.get(doc_id,0)+weight(doc_id,term_freq)
+        return self.rank_top_k(dic_accumulator,k)
 
+    def get_ordered_docs_max_score(self,query:Mapping[str,TermOccurrence],
+                              docs_occur_per_term:Mapping[str,List[TermOccurrence]],k:int) -> (List[int], Mapping[int,float]):
+        if k <= 0:
+            return [],{}
+        lst_terms = []
+        for term_pos,(term,occurrences) in enumerate(docs_occur_per_term.items()):
+            int_docs_with_term = len(occurrences)
+            if int_docs_with_term == 0:
+                continue
+            lst_terms.append((self.term_bound(term,query[term],int_docs_with_term),term_pos,
+                              posting_iterator(occurrences),self.term_weight(query[term],int_docs_with_term)))
+        return self.max_score_top_k(lst_terms,k)
@@ -0,0 +1,109 @@
+from query.boolean_query import BooleanQueryParser, AndNode, TermNode, NotNode
+from index.structure import HashIndex, FileIndex
+from index.reader import FileIndexReader
+from index.posting_iterator import iterate_doc_ids
+import random
+import tempfile
+import unittest
+
+class BooleanQueryTest(unittest.TestCase):
+    def new_file_index(self,**kwargs) -> FileIndex:
+        #cada índice é criado em seu próprio diretório temporário (os nomes dos arquivos se repetem entre índices)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        return FileIndex(str_idx_dir=tmp_dir.name,**kwargs)
+
+    def setUp(self):
+        random.seed(5)
+        self.dic_docs = {}
+        self.index = HashIndex()
+        for doc_id in range(1,300):
+            set_terms = {term for term in "abcdefgh" if random.random() < 0.2+"abcdefgh".index(term)*0.08}
+            self.dic_docs[doc_id] = set_terms
+            for term in sorted(set_terms):
+                self.index.index(term,doc_id,1)
+
+    def evaluate(self,index,str_query:str):
+        node = BooleanQueryParser().parse(str_query)
+        return list(iterate_doc_ids(node.plan(index).iterator(index)))
+
+    def expected(self,condition):
+        #documentos sem termos não estão no índice
+        return [doc_id for doc_id,set_terms in sorted(self.dic_docs.items()) if len(set_terms) > 0 and condition(set_terms)]
+
+    def test_parse(self):
+        parser = BooleanQueryParser()
+        self.assertEqual(str(parser.parse('a b OR NOT (c AND "D e") AND f')),'((a AND b) OR (NOT (c AND "d e") AND f))')
+        self.assertEqual(str(parser.parse('a AND (b OR c) OR d')),'((a AND (b OR c)) OR d)')
+        self.assertIsNone(parser.parse('  '))
+        for str_query in ['a AND','(a OR b','a OR OR b','a )','NOT','AND a']:
+            with self.assertRaises(ValueError,msg=f"A consulta '{str_query}' deveria ser inválida"):
+                parser.parse(str_query)
+
+        #os termos que resultam vazios após a normalização (stop words) são ignorados
+        parser = BooleanQueryParser(lambda term: "" if term in {"de","a"} else term.lower())
+        self.assertEqual(str(parser.parse('Belo de Horizonte AND NOT a')),'(belo AND horizonte)')
+        self.assertEqual(str(parser.parse('"belo de horizonte" OR de')),'"belo horizonte"')
+        self.assertIsNone(parser.parse('de OR a'))
+
+    def test_evaluate(self):
+        lst_queries = [("a AND b AND c",lambda s: {"a","b","c"} <= s),
+                       ("a b c d",lambda s: {"a","b","c","d"} <= s),
+                       ("a OR b OR c",lambda s: len({"a","b","c"} & s) > 0),
+                       ("h AND NOT g",lambda s: "h" in s and "g" not in s),
+                       ("NOT a",lambda s: "a" not in s),
+                       ("NOT a AND NOT b",lambda s: "a" not in s and "b" not in s),
+                       ("(a OR b) AND NOT (c OR d) AND h",lambda s: len({"a","b"} & s) > 0 and len({"c","d"} & s) == 0 and "h" in s),
+                       ("a AND (b OR NOT c)",lambda s: "a" in s and ("b" in s or "c" not in s)),
+                       ("x OR a AND x",lambda s: False),
+                       ('"a b" OR NOT (h AND g)',lambda s: {"a","b"} <= s or not {"h","g"} <= s)]
+        file_index = self.new_file_index(compressed=True)
+        for doc_id in sorted(self.dic_docs):
+            for term in sorted(self.dic_docs[doc_id]):
+                file_index.index(term,doc_id,1)
+        file_index.finish_indexing()
+        with FileIndexReader(file_index) as reader:
+            for index in [self.index,reader]:
+                for str_query,condition in lst_queries:
+                    self.assertListEqual(self.evaluate(index,str_query),self.expected(condition),msg=f"Resposta inesperada para a consulta '{str_query}'")
+
+    def test_positional(self):
+        #documentos com palavras em sequência: as frases e a proximidade são comparadas às posições reais
+        dic_words = {doc_id:[random.choice("abcde") for _ in range(random.randint(1,12))] for doc_id in range(1,200)}
+        file_index = self.new_file_index(compressed=True,positional=True)
+        for doc_id,lst_words in dic_words.items():
+            dic_positions = {}
+            for position,word in enumerate(lst_words):
+                dic_positions.setdefault(word,[]).append(position)
+            file_index.index_document(doc_id,{word:len(lst_positions) for word,lst_positions in dic_positions.items()},dic_positions)
+        file_index.finish_indexing()
+
+        def phrase(lst_terms):
+            return lambda lst_words: any(lst_words[i:i+len(lst_terms)] == lst_terms for i in range(len(lst_words)))
+        def near(term_a,term_b,int_distance):
+            return lambda lst_words: any(lst_words[i] == term_a and lst_words[j] == term_b and abs(i-j)-1 <= int_distance
+                                            for i in range(len(lst_words)) for j in range(len(lst_words)))
+        lst_queries = [('"a b"',phrase(["a","b"])),
+                       ('"c a a"',phrase(["c","a","a"])),
+                       ('"a b" AND NOT "b a"',lambda lst_words: phrase(["a","b"])(lst_words) and not phrase(["b","a"])(lst_words)),
+                       ('"d e"~0',near("d","e",0)),
+                       ('"a c"~2 OR "b b"',lambda lst_words: near("a","c",2)(lst_words) or phrase(["b","b"])(lst_words))]
+        with FileIndexReader(file_index) as reader:
+            for index in [file_index,reader]:
+                for str_query,condition in lst_queries:
+                    self.assertListEqual(self.evaluate(index,str_query),[doc_id for doc_id,lst_words in sorted(dic_words.items()) if condition(lst_words)],
+                                         msg=f"Resposta inesperada para a consulta '{str_query}'")
+        self.assertEqual(str(BooleanQueryParser().parse('"a b a"~3 "c"~1')),'("a b"~3 AND c)')
+
+    def test_plan(self):
+        #os termos positivos são ordenados pela quantidade de documentos; os negados ficam ao final
+        node = BooleanQueryParser().parse("h AND NOT b AND (a AND NOT h) AND c").plan(self.index)
+        self.assertIsInstance(node,AndNode)
+        lst_children = node.lst_children
+        self.assertListEqual([str(child) for child in lst_children[:3]],["a","c","h"])
+        self.assertTrue(all(isinstance(child,NotNode) for child in lst_children[3:]))
+        self.assertListEqual([str(child.child) for child in lst_children[3:]],["h","b"])
+        self.assertListEqual(self.evaluate(self.index,"h AND NOT b AND (a AND NOT h) AND c"),[])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,10 +2,13 @@ from index.structure import FileIndex,TermOccurrence
 from query.processing import QueryRunner, VectorRankingModel, IndexPreComputedVals
 from index.indexer import Cleaner
 from typing import Mapping
+import tempfile
 import unittest
 class ProcessingTest(unittest.TestCase):
     def setUp(self):
-        self.index = FileIndex()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.index = FileIndex(str_idx_dir=tmp_dir.name)
         self.index.index("adoro",1,1)
         self.index.index("vocês",2,3)
         self.index.index("espero",2,1)
@@ -132,5 +135,13 @@ class ProcessingTest(unittest.TestCase):
             print()
             self.assertListEqual(resposta, arr_expected_response[i],f"A resposta a consulta '{query}' deveria ser {arr_expected_response[i]} e não {resposta}")
 
+    def test_get_docs_boolean_query(self):
+        arr_queries = ["vocês AND NOT estejam","adoro OR \"Vocês estejam\"","NOT (vocês OR crocodilo)","crocodilo"]
+        arr_expected_response = [[2],[1,3],[1],[]]
+        for i,query in enumerate(arr_queries):
+            resposta = self.queryRunner.get_docs_boolean_query(query)
+            self.assertListEqual(resposta, arr_expected_response[i],f"A resposta a consulta '{query}' deveria ser {arr_expected_response[i]} e não {resposta}")
+        self.assertListEqual(self.queryRunner.get_docs_boolean_query("adoro OR vocês",k=2),[1,2])
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
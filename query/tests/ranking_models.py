@@ -1,8 +1,18 @@
-from query.ranking_models import IndexPreComputedVals,VectorRankingModel,BooleanRankingModel,  OPERATOR
+from query.ranking_models import IndexPreComputedVals,VectorRankingModel,BM25RankingModel,BooleanRankingModel,  OPERATOR, np
+import math
 from index.structure import HashIndex,FileIndex,TermOccurrence
+from index.reader import FileIndexReader
+import random
+import tempfile
 import unittest
 
 class RankingModelTest(unittest.TestCase):
+    def new_file_index(self,**kwargs) -> FileIndex:
+        #cada índice é criado em seu próprio diretório temporário (os nomes dos arquivos se repetem entre índices)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        return FileIndex(str_idx_dir=tmp_dir.name,**kwargs)
+
     def setUp(self):
         self.arr_indexes = [
                                 {"a":[TermOccurrence(1,1,1),
@@ -41,7 +51,7 @@ class RankingModelTest(unittest.TestCase):
                                     "times":TermOccurrence(None, 6, 1)}]
                                     ]
     def test_precomputed_vals(self):
-        index = FileIndex()
+        index = self.new_file_index()
         index.index("new",1,4)
         index.index("york",1,1)
         index.index("times",1,1)
@@ -60,6 +70,41 @@ class RankingModelTest(unittest.TestCase):
         self.assertEqual(precomp.doc_count,3,"Numero de documentos inesperado")
         for doc_id,norma_esperada in norma_esperada_per_doc.items():
             self.assertAlmostEqual(norma_esperada, precomp.document_norm[doc_id], places=2,msg=f"Norma inesperada do documento {doc_id}")
+    def test_precomputed_vals_index_stats(self):
+        #as normas calculadas em finish_indexing devem ser as mesmas do percurso completo das ocorrências
+        lst_occurrences = [(f"termo{(doc_id*7+i)%13}",doc_id,i%4+1) for doc_id in range(1,40) for i in range(doc_id%9+1)]
+        index = self.new_file_index()
+        expected_index = HashIndex()
+        for term,doc_id,freq in lst_occurrences:
+            index.index(term,doc_id,freq)
+            expected_index.index(term,doc_id,freq)
+        index.finish_indexing()
+        self.assertIsNotNone(index.document_stats)
+
+        precomp = IndexPreComputedVals(index)
+        expected_precomp = IndexPreComputedVals(expected_index)
+        self.assertDictEqual(precomp.document_norm,expected_precomp.document_norm)
+        self.assertDictEqual(precomp.document_length,expected_precomp.document_length)
+        self.assertEqual(precomp.doc_count,expected_precomp.doc_count)
+
+        #as estatísticas são gravadas com o índice
+        with tempfile.TemporaryDirectory() as str_dir:
+            index.save(str_dir)
+            index_aberto = FileIndex.open(str_dir)
+            self.assertDictEqual(IndexPreComputedVals(index_aberto).document_norm,expected_precomp.document_norm)
+            index_aberto.dic_index.close()
+
+    def test_precomputed_vals_reader(self):
+        index = self.new_file_index()
+        for term,doc_id,freq in [("new",1,4),("york",1,1),("times",1,1),("new",2,1),("york",2,1),
+                                 ("post",2,1),("los",3,1),("angeles",3,1),("times",3,1)]:
+            index.index(term,doc_id,freq)
+        index.finish_indexing()
+
+        with FileIndexReader(index) as reader:
+            precomp = IndexPreComputedVals(reader)
+            self.assertDictEqual(precomp.document_norm, IndexPreComputedVals(index).document_norm)
+
     def obtem_index_for_query(self,map_query,map_index):
         map_index_for_query = {}
         for term, list_ocur in map_index.items():
@@ -89,8 +134,34 @@ class RankingModelTest(unittest.TestCase):
                 
 
 
+    def test_boolean_model_many_terms(self):
+        #consultas com 3 ou mais termos: documentos com apenas parte dos termos não estão na interseção
+        map_index = {"a":[TermOccurrence(doc_id,1,1) for doc_id in [1,2,3,5,8]],
+                     "b":[TermOccurrence(doc_id,2,1) for doc_id in [2,3,8,9]],
+                     "c":[TermOccurrence(doc_id,3,1) for doc_id in [1,3,8,9,10]],
+                     "d":[TermOccurrence(doc_id,4,1) for doc_id in [3,4,8]]}
+        lst_response,_ = BooleanRankingModel(OPERATOR.AND).get_ordered_docs({}, {term:map_index[term] for term in ["a","b","c"]})
+        self.assertListEqual(lst_response,[3,8])
+        lst_response,_ = BooleanRankingModel(OPERATOR.AND).get_ordered_docs({}, map_index)
+        self.assertListEqual(lst_response,[3,8])
+        lst_response,_ = BooleanRankingModel(OPERATOR.OR).get_ordered_docs({}, map_index)
+        self.assertListEqual(lst_response,[1,2,3,4,5,8,9,10])
+
+    def test_boolean_model_file_index(self):
+        #consulta AND sobre ocorrências comprimidas, percorridas por meio dos blocos
+        index = self.new_file_index(compressed=True)
+        for doc_id in range(1,1000):
+            index.index("comum",doc_id,1)
+            if doc_id%97 == 0:
+                index.index("raro",doc_id,1)
+        index.finish_indexing()
+        with FileIndexReader(index) as reader:
+            map_occurrences = {term:reader.get_occurrence_list(term) for term in ["comum","raro"]}
+            lst_response,_ = BooleanRankingModel(OPERATOR.AND).get_ordered_docs({}, map_occurrences)
+        self.assertListEqual(lst_response,[97*i for i in range(1,11)])
+
     def test_vector_model(self):
-        index = FileIndex()
+        index = self.new_file_index()
         precomp = IndexPreComputedVals(index)
         
         arr_lst_esperado_per_query  = [[[2,4,1],[]],[[1,2,3]]]
@@ -114,5 +185,222 @@ class RankingModelTest(unittest.TestCase):
                         self.assertTrue(doc_id not in doc_weights, f"O documento {doc_id} não deveria ser recuperado da consulta {query_position} indice {idx}")
                     else:
                         self.assertAlmostEqual(peso, doc_weights[doc_id], places=2,msg=f"Peso inesperado do documento {doc_id} consulta {query_position} índice {idx}. Peso calculado:{doc_weights[doc_id]} deveria ser: {peso}")
+
+    def test_vector_model_doc_count(self):
+        #o idf da consulta usa o número de documentos do índice (e não o maior doc_id encontrado)
+        index = HashIndex()
+        for term,doc_id,freq in [("casa",1,2),("verde",1,1),("casa",2,1),("velha",2,1),("verde",10,1),("velha",10,3)]:
+            index.index(term,doc_id,freq)
+        precomp = IndexPreComputedVals(index)
+        map_query = {"casa":TermOccurrence(None,None,1)}
+        map_occurrences = {"casa":index.get_occurrence_list("casa")}
+        wiq = VectorRankingModel.tf_idf(3,1,2)
+        map_expected = {1:round(VectorRankingModel.tf_idf(3,2,2)*wiq/precomp.document_norm[1],2),
+                        2:round(VectorRankingModel.tf_idf(3,1,2)*wiq/precomp.document_norm[2],2)}
+        for use_numpy in [False,np is not None]:
+            lst_response, doc_weights = VectorRankingModel(precomp,use_numpy=use_numpy).get_ordered_docs(map_query,map_occurrences)
+            self.assertListEqual(lst_response,[1,2])
+            self.assertDictEqual(doc_weights,map_expected)
+
+    def test_vector_model_delete_document(self):
+        index = HashIndex()
+        for term,doc_id,freq in [("casa",1,2),("verde",1,1),("casa",2,1),("velha",2,1),("verde",10,1),("velha",10,3),("casa",11,1)]:
+            index.index(term,doc_id,freq)
+        precomp = IndexPreComputedVals(index)
+        dic_norms = dict(precomp.document_norm)
+        index.delete_document(10)
+        precomp.delete_document(10)
+        index.update_document(11,{"casa":1,"azul":2})
+        precomp.update_document(11,{"casa":1,"azul":2})
+        map_query = {"casa":TermOccurrence(None,None,1)}
+        #até o expurgo, as normas dos demais documentos não são recalculadas (as ocorrências não são percorridas)
+        lst_response, _ = VectorRankingModel(precomp).get_ordered_docs(map_query,{"casa":index.get_occurrence_list("casa")})
+        self.assertCountEqual(lst_response,[1,2,11])
+        self.assertDictEqual({doc_id:precomp.document_norm[doc_id] for doc_id in [1,2]},{doc_id:dic_norms[doc_id] for doc_id in [1,2]})
+        self.assertEqual(precomp.document_length,{1:3,2:2,11:3})
+        self.assertEqual(precomp.total_length,8)
+        #após o expurgo, os valores são recalculados na próxima consulta
+        index.purge_deleted()
+        map_occurrences = {"casa":index.get_occurrence_list("casa")}
+        for use_numpy in [False,np is not None]:
+            lst_response, doc_weights = VectorRankingModel(precomp,use_numpy=use_numpy).get_ordered_docs(map_query,map_occurrences)
+            lst_expected, doc_expected = VectorRankingModel(IndexPreComputedVals(index),use_numpy=use_numpy).get_ordered_docs(map_query,map_occurrences)
+            self.assertListEqual(lst_response,lst_expected)
+            self.assertDictEqual(doc_weights,doc_expected)
+        self.assertDictEqual(precomp.document_norm,IndexPreComputedVals(index).document_norm)
+
+    def test_vector_model_max_score(self):
+        #o top-k com MaxScore deve ser o mesmo da avaliação completa, inclusive nos empates (menor doc_id),
+        #também com listas fora de ordem de doc_id (HashIndex com os documentos indexados em ordem aleatória)
+        for int_seed in [7,13,42]:
+            with self.subTest(seed=int_seed):
+                self.check_vector_model_max_score(int_seed)
+
+    def check_vector_model_max_score(self,int_seed:int):
+        random.seed(int_seed)
+        lst_weights = [1/(i+1) for i in range(60)]
+        lst_occurrences = []
+        for doc_id in range(1,600):
+            for term in set(random.choices(range(60),weights=lst_weights,k=12)):
+                lst_occurrences.append((f"termo{term}",doc_id,random.choice([1,1,1,2,3])))
+        hash_index = HashIndex()
+        file_index = self.new_file_index()
+        for term,doc_id,freq in random.sample(lst_occurrences,len(lst_occurrences)):
+            hash_index.index(term,doc_id,freq)
+        for term,doc_id,freq in lst_occurrences:
+            file_index.index(term,doc_id,freq)
+        file_index.finish_indexing()
+        self.assertIsNotNone(file_index.term_stats)
+
+        lst_queries = [["termo0","termo1"],["termo0","termo3","termo20","termo40"],["termo59","termo2","termo2"],
+                       ["termo5","termo6","termo7","termo8","termo9","termo10","termo30"]]
+        with tempfile.TemporaryDirectory() as str_dir, tempfile.TemporaryDirectory() as str_compressed_dir:
+            file_index.save(str_dir)
+            index_aberto = FileIndex.open(str_dir)
+            #ocorrências comprimidas (lidas bloco a bloco) e com documentos removidos
+            compressed_index = FileIndex(compressed=True,str_idx_dir=str_compressed_dir)
+            for term,doc_id,freq in lst_occurrences:
+                compressed_index.index(term,doc_id,freq)
+            compressed_index.finish_indexing()
+            for doc_id in range(7,600,7):
+                compressed_index.delete_document(doc_id)
+            with FileIndexReader(file_index) as reader, FileIndexReader(index_aberto) as reader_aberto, \
+                 FileIndexReader(compressed_index) as reader_comprimido:
+                for index in [hash_index,reader,reader_aberto,reader_comprimido]:
+                    precomp = IndexPreComputedVals(index)
+                    for lst_query in lst_queries:
+                        map_query = {}
+                        for term in lst_query:
+                            map_query[term] = TermOccurrence(None,None,map_query[term].term_freq+1 if term in map_query else 1)
+                        map_occurrences = {term:index.get_occurrence_list(term) for term in map_query}
+                        lst_expected, expected_weights = VectorRankingModel(precomp,use_numpy=False).get_ordered_docs(map_query,map_occurrences)
+                        self.assertListEqual(lst_expected,sorted(expected_weights,key=lambda doc_id:(-expected_weights[doc_id],doc_id)))
+                        for k in [1,3,10,50,len(lst_expected)+5]:
+                            for ranking_model in [VectorRankingModel(precomp,dynamic_pruning=True),VectorRankingModel(precomp)]:
+                                lst_response, doc_weights = ranking_model.get_ordered_docs(map_query,map_occurrences,k)
+                                self.assertListEqual(lst_response,lst_expected[:k],msg=f"Top {k} inesperado para a consulta {lst_query}")
+                                self.assertDictEqual(doc_weights,{doc_id:expected_weights[doc_id] for doc_id in lst_expected[:k]})
+            index_aberto.dic_index.close()
+
+    def test_vector_model_zero_norm(self):
+        #"casa" está em todos os documentos (idf zero): a norma do documento 1 é zero e seu peso também,
+        #nas três formas de avaliação
+        index = HashIndex()
+        index.index("casa",1,2)
+        index.index("casa",2,1)
+        index.index("verde",2,1)
+        index.index("casa",3,1)
+        index.index("azul",3,3)
+        precomp = IndexPreComputedVals(index)
+        self.assertEqual(precomp.document_norm[1],0)
+        for lst_query in [["casa"],["casa","verde"],["casa","verde","azul"]]:
+            map_query = {term:TermOccurrence(None,None,1) for term in lst_query}
+            map_occurrences = {term:index.get_occurrence_list(term) for term in map_query}
+            lst_expected, expected_weights = VectorRankingModel(precomp,use_numpy=False).get_ordered_docs(map_query,map_occurrences)
+            self.assertEqual(expected_weights[1],0)
+            lst_models = [VectorRankingModel(precomp,dynamic_pruning=True)]
+            if np is not None:
+                lst_models.append(VectorRankingModel(precomp))
+            for ranking_model in lst_models:
+                for k in [None,1,3]:
+                    lst_response, doc_weights = ranking_model.get_ordered_docs(map_query,map_occurrences,k)
+                    self.assertListEqual(lst_response,lst_expected[:k],msg=f"Top {k} inesperado para a consulta {lst_query}")
+                    self.assertDictEqual(doc_weights,{doc_id:expected_weights[doc_id] for doc_id in lst_expected[:k]})
+
+    def test_bm25_model(self):
+        index = HashIndex()
+        for term,doc_id,freq in [("new",1,4),("york",1,1),("times",1,1),("new",2,1),("york",2,1),
+                                 ("post",2,1),("los",3,1),("angeles",3,1),("times",3,1)]:
+            index.index(term,doc_id,freq)
+        precomp = IndexPreComputedVals(index)
+        self.assertDictEqual(precomp.document_length,{1:6,2:3,3:3})
+        self.assertAlmostEqual(precomp.avg_document_length,4)
+
+        map_query = {"new":TermOccurrence(None,1,1),"times":TermOccurrence(None,6,1)}
+        map_occurrences = {term:index.get_occurrence_list(term) for term in map_query}
+        lst_response, doc_weights = BM25RankingModel(precomp,k1=1.2,b=0.75).get_ordered_docs(map_query,map_occurrences)
+        idf = math.log(1+(3-2+0.5)/(2+0.5))
+        tf = lambda freq,length: freq*2.2/(freq+1.2*(0.25+0.75*length/4))
+        map_expected = {1:idf*tf(4,6)+idf*tf(1,6),2:idf*tf(1,3),3:idf*tf(1,3)}
+        self.assertListEqual(lst_response,[1,2,3])
+        for doc_id,weight in map_expected.items():
+            self.assertAlmostEqual(doc_weights[doc_id],weight,places=10)
+
+    def test_bm25_model_max_score(self):
+        #o top-k com MaxScore deve ser o mesmo da avaliação completa, inclusive nos empates (menor doc_id)
+        for int_seed in [11,5,23]:
+            with self.subTest(seed=int_seed):
+                random.seed(int_seed)
+                lst_weights = [1/(i+1) for i in range(50)]
+                lst_occurrences = []
+                for doc_id in range(1,500):
+                    for term in set(random.choices(range(50),weights=lst_weights,k=random.randint(3,20))):
+                        lst_occurrences.append((f"termo{term}",doc_id,random.choice([1,1,2,3,5])))
+                hash_index = HashIndex()
+                for term,doc_id,freq in random.sample(lst_occurrences,len(lst_occurrences)):
+                    hash_index.index(term,doc_id,freq)
+                file_index = self.new_file_index()
+                for term,doc_id,freq in lst_occurrences:
+                    file_index.index(term,doc_id,freq)
+                file_index.finish_indexing()
+                lst_queries = [["termo0","termo1","termo2"],["termo0","termo10","termo25","termo49"],["termo3","termo3","termo30"]]
+                with FileIndexReader(file_index) as reader:
+                    for index in [hash_index,file_index,reader]:
+                        precomp = IndexPreComputedVals(index)
+                        for lst_query in lst_queries:
+                            map_query = {}
+                            for term in lst_query:
+                                map_query[term] = TermOccurrence(None,None,map_query[term].term_freq+1 if term in map_query else 1)
+                            map_occurrences = {term:index.get_occurrence_list(term) for term in map_query}
+                            lst_expected, expected_weights = BM25RankingModel(precomp).get_ordered_docs(map_query,map_occurrences)
+                            for k in [1,5,20,len(lst_expected)+1]:
+                                lst_response, doc_weights = BM25RankingModel(precomp,dynamic_pruning=True).get_ordered_docs(map_query,map_occurrences,k)
+                                self.assertListEqual(lst_response,lst_expected[:k],msg=f"Top {k} inesperado para a consulta {lst_query}")
+                                self.assertDictEqual(doc_weights,{doc_id:expected_weights[doc_id] for doc_id in lst_expected[:k]})
+
+    @unittest.skipIf(np is None, "NumPy não está instalado")
+    def test_vector_model_numpy(self):
+        #o cálculo com NumPy deve obter exatamente os mesmos pesos e a mesma ordem do cálculo em Python
+        lst_occurrences = [(f"termo{(doc_id*7+i)%13}",doc_id,(doc_id+i)%5+1) for doc_id in range(1,80) for i in range(doc_id%9+1)]
+        index = HashIndex()
+        for term,doc_id,freq in lst_occurrences:
+            index.index(term,doc_id,freq)
+        precomp = IndexPreComputedVals(index)
+        python_precomp = IndexPreComputedVals(index,use_numpy=False)
+        self.assertDictEqual(precomp.document_norm,python_precomp.document_norm)
+        self.assertDictEqual(precomp.document_length,python_precomp.document_length)
+
+        lst_queries = [{"termo1":TermOccurrence(None,1,1),"termo5":TermOccurrence(None,1,2)},
+                       {"termo0":TermOccurrence(None,1,1),"termo3":TermOccurrence(None,1,1),"termo12":TermOccurrence(None,1,3)}]
+        for map_query in lst_queries:
+            map_occurrences = {term:index.get_occurrence_list(term) for term in map_query}
+            lst_response, doc_weights = VectorRankingModel(precomp).get_ordered_docs(map_query,map_occurrences)
+            lst_expected, expected_weights = VectorRankingModel(precomp,use_numpy=False).get_ordered_docs(map_query,map_occurrences)
+            self.assertListEqual(lst_response,lst_expected)
+            self.assertDictEqual(doc_weights,expected_weights)
+
+        #top-k: os mesmos k primeiros documentos (e pesos) da ordenação completa
+        for map_query in lst_queries:
+            map_occurrences = {term:index.get_occurrence_list(term) for term in map_query}
+            lst_expected, expected_weights = VectorRankingModel(precomp,use_numpy=False).get_ordered_docs(map_query,map_occurrences)
+            for k in [1,5,10,len(lst_expected)+1]:
+                for use_numpy in [False,True]:
+                    lst_response, doc_weights = VectorRankingModel(precomp,use_numpy=use_numpy).get_ordered_docs(map_query,map_occurrences,k)
+                    self.assertListEqual(lst_response,lst_expected[:k])
+                    self.assertDictEqual(doc_weights,{doc_id:expected_weights[doc_id] for doc_id in lst_expected[:k]})
+
+        #também sobre as ocorrências mapeadas em memória
+        file_index = self.new_file_index()
+        for term,doc_id,freq in lst_occurrences:
+            file_index.index(term,doc_id,freq)
+        file_index.finish_indexing()
+        with FileIndexReader(file_index) as reader:
+            map_query = lst_queries[1]
+            map_occurrences = {term:reader.get_occurrence_list(term) for term in map_query}
+            lst_response,_ = VectorRankingModel(precomp).get_ordered_docs(map_query,map_occurrences)
+            self.assertListEqual(lst_response,lst_expected)
+            for occurrences in map_occurrences.values():
+                occurrences.release()
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
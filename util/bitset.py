@@ -0,0 +1,48 @@
+class BitSet:
+    """
+        Conjunto de inteiros não negativos representado por um bytearray (um bit por inteiro)
+    """
+    def __init__(self, data:bytes=b""):
+        self.bits = bytearray(data)
+        self.count = int.from_bytes(self.bits, "little").bit_count()
+
+    def add(self, value:int):
+        int_byte = value >> 3
+        if int_byte >= len(self.bits):
+            self.bits.extend(bytes(int_byte-len(self.bits)+1))
+        int_mask = 1 << (value & 7)
+        if not self.bits[int_byte] & int_mask:
+            self.bits[int_byte] |= int_mask
+            self.count += 1
+
+    def discard(self, value:int):
+        if value in self:
+            self.bits[value >> 3] &= ~(1 << (value & 7)) & 0xff
+            self.count -= 1
+
+    def clear(self):
+        self.bits = bytearray()
+        self.count = 0
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.bits)
+
+    def __contains__(self, value:int) -> bool:
+        int_byte = value >> 3
+        return 0 <= int_byte < len(self.bits) and (self.bits[int_byte] >> (value & 7)) & 1 == 1
+
+    def __iter__(self):
+        for int_byte, byte in enumerate(self.bits):
+            if byte:
+                for i in range(8):
+                    if (byte >> i) & 1:
+                        yield (int_byte << 3)+i
+
+    def __len__(self):
+        return self.count
+
+    def __str__(self):
+        return "{"+", ".join(str(value) for value in self)+"}"
+
+    def __repr__(self):
+        return str(self)
@@ -0,0 +1,52 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+        Dicionário com no máximo max_size itens: ao exceder o tamanho, o item
+        usado há mais tempo é descartado. Conta os acertos (hits) e as falhas (misses)
+    """
+    def __init__(self, max_size:int):
+        self.max_size = max_size
+        self.dic_items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key in self.dic_items:
+            self.hits += 1
+            self.dic_items.move_to_end(key)
+            return self.dic_items[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        self.dic_items[key] = value
+        self.dic_items.move_to_end(key)
+        if len(self.dic_items) > self.max_size:
+            self.dic_items.popitem(last=False)
+
+    def items(self):
+        """
+            Itens do usado há mais tempo ao usado mais recentemente
+        """
+        return self.dic_items.items()
+
+    def clear(self):
+        self.dic_items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key) -> bool:
+        return key in self.dic_items
+
+    def __len__(self):
+        return len(self.dic_items)
+
+    def __str__(self):
+        return f"LRUCache({len(self)}/{self.max_size} itens, hits: {self.hits}, misses: {self.misses})"
+
+    def __repr__(self):
+        return str(self)